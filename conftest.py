@@ -1,9 +1,25 @@
 import pytest
-from utils.data_loader import DataLoader
+import allure
+import json
+from utils.data_loader import DataLoader, TestCase
 from utils.http_client import HTTPClient
-from typing import Dict, Any
+from utils.async_http_client import run_concurrently, execute_keyword_case
+from utils.connection_pool import keep_connections, pool_stats
+from utils.prewarm import prewarm_case_files, iter_urls
+from utils.timing import timing_aggregator
+from utils.scheduler import DURATIONS_FILE, DurationStore, case_key, lpt_schedule_units, parse_shard
+from utils.dependency import CaseGraph, DependencyError, run_graph
+from utils.progress import EventLog
+from utils.fingerprint import RESULTS_FILE, ResultStore, case_fingerprint
+from utils import cassette
+from utils.base_url import set_override, remove_override
+from utils.loopback_server import start_httpbin
+from utils.circuit_breaker import host_health, configure as configure_http
+from utils import rate_limiter
+from typing import Dict, Any, List
 import os
 import sys
+import logging
 import warnings
 from pathlib import Path
 
@@ -11,6 +27,96 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+logger = logging.getLogger(__name__)
+
+def pytest_addoption(parser):
+    """注册命令行参数"""
+    parser.addoption(
+        "--concurrency",
+        type=int,
+        default=0,
+        help="数据驱动用例的并发数，0表示逐个串行执行"
+    )
+    parser.addoption(
+        "--prewarm",
+        action="store_true",
+        default=os.environ.get("QA_PREWARM") == "1",
+        help="在第一个测试执行前预解析DNS并预建连接，也可以通过环境变量QA_PREWARM=1开启"
+    )
+    parser.addoption(
+        "--prewarm-connections",
+        type=int,
+        default=1,
+        help="预热时每个主机建立的连接数"
+    )
+    parser.addoption(
+        "--shard",
+        default=None,
+        help="只执行按历史耗时(LPT)分配到该分片的用例，格式 I/N，I从0开始"
+    )
+    parser.addoption(
+        "--state-snapshot",
+        default=None,
+        help="从该目录下的快照读取历史耗时和执行结果，用于分片和--changed-only的选择；"
+             "多进程执行时由TestRunner统一生成，保证各分片的选择一致"
+    )
+    parser.addoption(
+        "--event-log",
+        default=None,
+        help="把执行事件以JSON Lines格式实时写入该文件"
+    )
+    parser.addoption(
+        "--changed-only",
+        action="store_true",
+        help="只执行指纹（用例条目/关键字实现/HTTPClient版本）变化或上次未通过的用例"
+    )
+    parser.addoption(
+        "--http-mode",
+        choices=cassette.MODES,
+        default=None,
+        help="live直接请求；record请求并录制到磁带；replay只从磁带回放，不访问网络"
+    )
+    parser.addoption(
+        "--http-timeout",
+        type=float,
+        default=None,
+        help="单次请求超时（秒），默认10，也可以通过环境变量QA_HTTP_TIMEOUT设置"
+    )
+    parser.addoption(
+        "--retries",
+        type=int,
+        default=None,
+        help="幂等请求连接失败后的重试次数，默认2，也可以通过环境变量QA_HTTP_RETRIES设置"
+    )
+    parser.addoption(
+        "--breaker-threshold",
+        type=int,
+        default=None,
+        help="同一主机连续连接失败多少次后熔断，0表示不熔断，默认5"
+    )
+    parser.addoption(
+        "--breaker-reset",
+        type=float,
+        default=None,
+        help="熔断后多少秒放行一个探测请求，默认30"
+    )
+    parser.addoption(
+        "--rate-limits",
+        default=os.environ.get("QA_RATE_LIMITS"),
+        help="按主机/路由限流的配置文件（YAML或JSON），也可以通过环境变量QA_RATE_LIMITS设置"
+    )
+    parser.addoption(
+        "--local-httpbin",
+        action="store_true",
+        default=os.environ.get("QA_LOCAL_HTTPBIN") == "1",
+        help="启动本地httpbin服务，把https://httpbin.org的请求改写到本地"
+    )
+    parser.addoption(
+        "--cassette-dir",
+        default=None,
+        help="磁带目录，每个用例文件对应一个磁带，默认 test_cases/cassettes"
+    )
+
 # 过滤警告
 def pytest_configure(config):
     """配置pytest的全局设置"""
@@ -29,18 +135,75 @@ def pytest_configure(config):
         "markers",
         "api: API测试用例"
     )
+    
+    if config.getoption("--http-mode") or config.getoption("--cassette-dir"):
+        cassette.configure(config.getoption("--http-mode"), config.getoption("--cassette-dir"))
+    
+    configure_http(config.getoption("--http-timeout"), config.getoption("--retries"),
+                   config.getoption("--breaker-threshold"), config.getoption("--breaker-reset"))
+    # 进程内多次执行时不沿用上一次的熔断状态
+    host_health.reset()
+    # 每次执行重新加载限流配置，令牌桶状态在缓存目录中跨进程共享
+    rate_limiter.configure(config.getoption("--rate-limits"))
+    
+    global _event_log
+    path = config.getoption("--event-log")
+    if path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        _event_log = EventLog(path)
+        _event_log.emit("session_start", args=config.invocation_params.args)
 
 def pytest_generate_tests(metafunc):
     if "test_case" in metafunc.fixturenames:
-        # 获取测试用例文件路径
+        # 获取测试用例文件路径：测试模块同名的YAML，不存在时使用test_data目录下的同名文件
         test_file = metafunc.module.__file__
         case_file = test_file.replace('.py', '.yaml')
+        if not os.path.exists(case_file):
+            data_file = os.path.join(os.path.dirname(test_file), "test_data", os.path.basename(case_file))
+            case_file = data_file if os.path.exists(data_file) else case_file
         
-        # 加载测试用例
+        # 加载测试用例，按extract和模板变量构建依赖图，循环依赖或缺少生产者时在收集阶段报错
         test_cases = DataLoader.load_yaml(case_file)
+        graph = CaseGraph(test_cases)
         
-        # 参数化测试用例
-        metafunc.parametrize("test_case", test_cases)
+        # 参数化测试用例，按依赖顺序排列
+        metafunc.parametrize("test_case", graph.ordered_cases())
+
+
+def pytest_terminal_summary(terminalreporter):
+    """输出按接口汇总的请求耗时、发生过连接失败的主机的熔断状态，以及共享连接池的新建/复用统计"""
+    breakers = host_health.summary(only_unhealthy=True)
+    if breakers:
+        terminalreporter.section("主机熔断状态")
+        for host, state in breakers.items():
+            terminalreporter.write_line(
+                f"  {host}: {state['state']}，连续失败 {state['consecutive_failures']}，"
+                f"熔断 {state['opened']} 次，快速失败 {state['rejected']} 个请求"
+                + (f"，最近错误: {state['last_error']}" if state['last_error'] else "")
+            )
+    
+    limiter = rate_limiter.rate_limiter
+    if limiter is not None and limiter.limited:
+        terminalreporter.section("限流")
+        terminalreporter.write_line(
+            f"  {limiter.limited} 个请求因限流等待，共等待 {limiter.waited:.1f}s"
+        )
+    
+    table = timing_aggregator.format_table()
+    if table:
+        terminalreporter.section("接口耗时分解(ms，平均值)")
+        for line in table.splitlines():
+            terminalreporter.write_line(line)
+    
+    stats = pool_stats()
+    if not stats['requests']:
+        return
+    terminalreporter.section("连接池统计")
+    terminalreporter.write_line(
+        f"请求 {stats['requests']}，新建连接 {stats['opened']}，复用连接 {stats['reused']}"
+    )
+    for host, counters in stats['hosts'].items():
+        terminalreporter.write_line(f"  {host}: 新建 {counters['opened']}，复用 {counters['reused']}")
 
 
 # def pytest_collection_modifyitems(items):
@@ -48,6 +211,340 @@ def pytest_generate_tests(metafunc):
 #         item.name = item.name.encode("utf-8").decode("unicode_escape")
 #         item._nodeid = item.nodeid.encode("utf-8").decode("unicode_escape")
 
+def pytest_collection_modifyitems(config, items):
+    """
+    记录每个用例的记录键；
+    指定 --changed-only 时计算全部用例的指纹，只保留指纹变化或上次未通过的用例，以及它们按依赖图依赖的上游用例；
+    指定 --shard 时按历史耗时做LPT分片，只保留分到本分片的用例，并让最慢的用例最先执行
+
+    未指定 --changed-only 时指纹在用例setup之后才计算，只计算实际执行的用例，
+    JSONL用例直接使用fixture读取的条目，收集阶段不解析用例
+    """
+    config._case_keys = {item.nodeid: case_key(item) for item in items}
+    config._fingerprints = {}
+    # 多个分片进程都要基于同一份历史记录选择用例，不能读取其他分片执行结束时会更新的文件
+    snapshot = config.getoption("--state-snapshot")
+    if config.getoption("--changed-only"):
+        config._fingerprints = {item.nodeid: case_fingerprint(item) for item in items}
+        store = ResultStore(os.path.join(snapshot, RESULTS_FILE) if snapshot else None)
+        _select(config, items, _with_upstream(items, [
+            item for item in items
+            if store.needs_run(config._case_keys[item.nodeid], config._fingerprints[item.nodeid])
+        ]))
+    spec = config.getoption("--shard")
+    if spec:
+        index, count = parse_shard(spec)
+        store = DurationStore(os.path.join(snapshot, DURATIONS_FILE) if snapshot else None)
+        estimates = store.estimates([config._case_keys[item.nodeid] for item in items])
+        assigned = lpt_schedule_units(_chain_units(items), estimates, count)[index]
+        _select(config, items, [items[i] for i in assigned])
+
+def _case_groups(items) -> Dict[Any, list]:
+    """同一测试函数按同一用例文件参数化的接口用例属于一个依赖图，返回 {(文件, 测试函数): [下标]}"""
+    groups: Dict[Any, list] = {}
+    for i, item in enumerate(items):
+        callspec = getattr(item, "callspec", None)
+        test_case = callspec.params.get("test_case") if callspec else None
+        if isinstance(test_case, dict) and "url" in test_case:
+            groups.setdefault((str(item.path), item.originalname), []).append(i)
+    return groups
+
+def _chain_units(items) -> List[List[int]]:
+    """
+    分片调度单元：依赖图中互相关联的接口用例（一条链）作为一个单元，分到同一分片并保持收集顺序（拓扑顺序），
+    其他用例各自为一个单元；依赖关系不完整时整个依赖图作为一个单元
+    """
+    grouped = set()
+    units = []
+    for group in _case_groups(items).values():
+        grouped.update(group)
+        try:
+            graph = CaseGraph([items[i].callspec.params["test_case"] for i in group])
+        except DependencyError as e:
+            logger.warning(f"{items[group[0]].path} 依赖关系不完整，整组分到同一分片: {e}")
+            units.append(group)
+            continue
+        units.extend([group[j] for j in chain] for chain in graph.chains)
+    units.extend([i] for i in range(len(items)) if i not in grouped)
+    return units
+
+def _with_upstream(items, selected):
+    """
+    把选中的接口用例依赖的上游用例（提取变量的生产者，递归）一并选中，保持收集顺序
+    """
+    groups = [[items[i] for i in group] for group in _case_groups(items).values()]
+    chosen = set(id(item) for item in selected)
+    for group in groups:
+        try:
+            graph = CaseGraph([item.callspec.params["test_case"] for item in group])
+        except DependencyError as e:
+            logger.warning(f"{group[0].path} 依赖关系不完整，不补充上游用例: {e}")
+            continue
+        pending = [i for i, item in enumerate(group) if id(item) in chosen]
+        while pending:
+            for dep in graph.nodes[pending.pop()].depends:
+                if id(group[dep]) not in chosen:
+                    chosen.add(id(group[dep]))
+                    pending.append(dep)
+    return [item for item in items if id(item) in chosen]
+
+def _select(config, items, selected):
+    """只保留selected中的用例，其余标记为deselected"""
+    chosen = set(id(item) for item in selected)
+    deselected = [item for item in items if id(item) not in chosen]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+    items[:] = selected
+
+# 本次执行中每个用例的耗时（秒），按nodeid累计
+_case_durations: Dict[str, float] = {}
+
+# 本次执行中每个用例的结果，任一阶段失败即为failed
+_case_outcomes: Dict[str, str] = {}
+
+# --event-log 指定的事件流
+_event_log = None
+
+def pytest_collection_finish(session):
+    if _event_log is not None:
+        _event_log.emit("collected", total=len(session.items))
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_setup(item):
+    """用例setup之后计算指纹，此时间接参数化的用例条目已由fixture读取"""
+    yield
+    fingerprints = getattr(item.config, "_fingerprints", None)
+    if fingerprints is None or item.nodeid in fingerprints:
+        return
+    try:
+        fingerprints[item.nodeid] = case_fingerprint(item)
+    except Exception as e:
+        # 用例条目无法读取时setup已经报错，不记录该用例的结果，下次照常执行
+        logger.warning(f"计算用例指纹失败: {item.nodeid}，{str(e)}")
+
+def pytest_runtest_logreport(report):
+    """累计每个用例各阶段的耗时，并发预执行的用例额外加上预执行耗时"""
+    # 每个用例上报一次结果：call阶段，或setup阶段失败/跳过，或teardown阶段失败
+    if _event_log is not None and (report.when == "call" or (report.when == "setup" and not report.passed)
+                                   or (report.when == "teardown" and report.failed)):
+        _event_log.emit(
+            "test", nodeid=report.nodeid, when=report.when,
+            outcome="error" if report.failed and report.when != "call" else report.outcome,
+            duration=round(report.duration, 3),
+            message=report.longreprtext[-2000:] if report.failed else None
+        )
+    if report.failed:
+        _case_outcomes[report.nodeid] = "failed"
+    elif report.skipped:
+        _case_outcomes.setdefault(report.nodeid, "skipped")
+    elif report.when == "call":
+        _case_outcomes.setdefault(report.nodeid, "passed")
+    if report.skipped:
+        return
+    seconds = report.duration
+    if report.when == "call":
+        seconds += sum(v for k, v in report.user_properties if k == "case_duration")
+    _case_durations[report.nodeid] = _case_durations.get(report.nodeid, 0.0) + seconds
+
+def pytest_sessionfinish(session, exitstatus):
+    """把本次执行的用例耗时合并到历史耗时记录，保存用例结果、指纹和录制的磁带"""
+    global _event_log
+    cassette.close_all()
+    if _event_log is not None:
+        _event_log.emit("session_finish", exitstatus=int(exitstatus),
+                        testsfailed=session.testsfailed, testscollected=session.testscollected,
+                        circuit_breakers=host_health.summary(only_unhealthy=True))
+        _event_log.close()
+        _event_log = None
+    keys = getattr(session.config, "_case_keys", {})
+    durations = {keys[nodeid]: seconds for nodeid, seconds in _case_durations.items() if nodeid in keys}
+    DurationStore().update(durations)
+    fingerprints = getattr(session.config, "_fingerprints", {})
+    ResultStore().update({
+        keys[nodeid]: {"fingerprint": fingerprints[nodeid], "outcome": outcome}
+        for nodeid, outcome in _case_outcomes.items() if nodeid in keys and nodeid in fingerprints
+    })
+    # 进程内多次执行（--in-process/守护进程）时不累计上一次的结果
+    _case_durations.clear()
+    _case_outcomes.clear()
+
 @pytest.fixture(scope="session")
 def http_client():
-    return HTTPClient() 
\ No newline at end of file
+    return HTTPClient()
+
+@pytest.fixture(scope="session", autouse=True)
+def local_httpbin(request):
+    """
+    指定 --local-httpbin（或环境变量 QA_LOCAL_HTTPBIN=1）时在本机启动httpbin服务，
+    会话期间发往httpbin.org的请求都改写到本地服务
+
+    Returns:
+        本地服务的基础地址，未启用时为None
+    """
+    if not request.config.getoption("--local-httpbin"):
+        yield None
+        return
+    server = start_httpbin()
+    originals = ("https://httpbin.org", "http://httpbin.org")
+    for original in originals:
+        set_override(original, server.base_url)
+    try:
+        yield server.base_url
+    finally:
+        for original in originals:
+            remove_override(original)
+        server.stop()
+
+@pytest.fixture(scope="session", autouse=True)
+def shared_connections():
+    """测试会话期间保留共享连接池中的keep-alive连接，用例各自的会话回收后连接仍可复用，会话结束时释放"""
+    with keep_connections():
+        yield
+
+@pytest.fixture(scope="session", autouse=True)
+def prewarm_connections(request, local_httpbin, shared_connections):
+    """
+    指定 --prewarm 时，在第一个测试执行前扫描用例数据和测试参数中的目标主机，
+    预解析DNS并建立keep-alive连接，避免首个用例承担握手开销
+
+    默认关闭，回放模式下不访问网络，也不预热
+    """
+    if not request.config.getoption("--prewarm") or cassette.http_mode() == "replay":
+        return {}
+    params = [item.callspec.params for item in request.session.items if hasattr(item, "callspec")]
+    return prewarm_case_files(
+        extra_urls=iter_urls(params),
+        connections_per_host=request.config.getoption("--prewarm-connections")
+    )
+
+@pytest.fixture(autouse=True)
+def request_timings(request):
+    """
+    把测试中每个请求的耗时分解（DNS/建连/TLS/首字节/下载）附加到allure报告
+
+    只在生成allure结果（--alluredir）时捕获，测试中没有发出请求时不附加
+    """
+    if not request.config.getoption("--alluredir", default=None):
+        yield
+        return
+    timing_aggregator.begin_capture()
+    try:
+        yield
+    finally:
+        records = timing_aggregator.end_capture()
+    if records:
+        allure.attach(
+            json.dumps(records, ensure_ascii=False, indent=2),
+            name="请求耗时分解",
+            attachment_type=allure.attachment_type.JSON
+        )
+
+@pytest.fixture(autouse=True)
+def active_cassette(request):
+    """录制/回放模式下，每个测试使用所在用例文件对应的磁带"""
+    with cassette.use_cassette(request.node.path.stem):
+        yield
+
+@pytest.fixture(scope="session")
+def prefetched_cases(request, local_httpbin):
+    """
+    并发预执行本次会话中所有关键字驱动的数据用例
+
+    仅在指定 --concurrency 时生效，结果按用例nodeid保存，
+    每个测试函数仍然单独断言并上报pytest/allure
+    """
+    concurrency = request.config.getoption("--concurrency")
+    if concurrency <= 0:
+        return {}
+    
+    items: Dict[str, list] = {}
+    graphs: Dict[str, list] = {}
+    for item in request.session.items:
+        callspec = getattr(item, "callspec", None)
+        params = callspec.params if callspec else {}
+        test_data = params.get("test_data")
+        test_case = params.get("test_case")
+        if isinstance(test_data, TestCase) or (isinstance(test_data, dict) and "keyword" in test_data):
+            items.setdefault(str(item.path), []).append((item.nodeid, test_data))
+        elif isinstance(test_case, dict) and "url" in test_case:
+            graphs.setdefault(str(item.path), []).append((item.nodeid, test_case))
+    
+    # 按测试文件分组执行，录制/回放时使用各自的磁带
+    prefetched = {}
+    for path, cases in items.items():
+        with cassette.use_cassette(Path(path).stem):
+            results = run_concurrently([data for _, data in cases], concurrency, keywords=True)
+        prefetched.update({nodeid: result for (nodeid, _), result in zip(cases, results)})
+    
+    # 带extract/模板变量的接口用例按依赖图执行：独立的用例链并行，链内按依赖顺序串行
+    for path, cases in graphs.items():
+        try:
+            graph = CaseGraph([case for _, case in cases])
+        except DependencyError as e:
+            # 部分用例被筛选掉时依赖可能不完整，回退为串行执行
+            logger.warning(f"{path} 依赖关系不完整，不并发预执行: {e}")
+            continue
+        with cassette.use_cassette(Path(path).stem):
+            results = run_graph(graph, concurrency)
+        prefetched.update({nodeid: result for (nodeid, _), result in zip(cases, results)})
+    return prefetched
+
+@pytest.fixture
+def run_case(request, prefetched_cases):
+    """
+    执行关键字驱动的数据用例，优先使用并发预执行的结果
+    
+    同一用例再次执行时（如repeat）重新发送请求
+    
+    Returns:
+        Callable[[Any], Response]: 接收用例字典或TestCase，返回响应对象
+    """
+    pending = [prefetched_cases.get(request.node.nodeid)]
+    
+    def _run(test_data: Any):
+        result = pending.pop() if pending else None
+        if result is None:
+            return execute_keyword_case(test_data)
+        request.node.user_properties.append(("case_duration", result.elapsed))
+        allure.attach(
+            f"{result.elapsed * 1000:.1f} ms",
+            name="并发执行耗时",
+            attachment_type=allure.attachment_type.TEXT
+        )
+        if result.error is not None:
+            raise result.error
+        timing = getattr(result.response, "timing", None)
+        if timing is not None:
+            allure.attach(
+                json.dumps(timing.to_dict(), ensure_ascii=False, indent=2),
+                name="请求耗时分解",
+                attachment_type=allure.attachment_type.JSON
+            )
+        return result.response
+    return _run
+
+@pytest.fixture
+def send_case(request, http_client, prefetched_cases):
+    """
+    发送接口用例请求，优先使用按依赖图并发预执行的结果
+    
+    同一用例再次发送时（如repeat）使用预执行时的上下文快照重新请求
+    
+    Returns:
+        Callable[[Dict], Response]: 接收用例字典，返回响应对象
+    """
+    result = prefetched_cases.get(request.node.nodeid)
+    if result is None:
+        return http_client.send_request
+    pending = [result]
+    
+    def _send(test_case: Dict[str, Any]):
+        if not pending:
+            client = HTTPClient(session=http_client.session, context=dict(result.context or {}))
+            return client.send_request(test_case)
+        pending.clear()
+        request.node.user_properties.append(("case_duration", result.elapsed))
+        if result.error is not None:
+            raise result.error
+        return result.response
+    return _send
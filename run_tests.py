@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import argparse
+import json
 import logging
+import os
 import sys
 from pathlib import Path
 from utils.test_runner import TestRunner
@@ -27,6 +29,97 @@ def setup_logging(debug: bool = False):
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
+def run_load_test(args):
+    """
+    压测模式：以开环方式按目标RPS回放用例文件中的请求，输出耗时分位数、错误率和吞吐量
+    
+    Args:
+        args: 命令行参数
+    """
+    from utils.load_test import LoadRunner, load_cases, parse_duration, format_report
+    
+    # 压测时逐条请求日志过多，只保留警告以上级别
+    logging.getLogger("utils.http_client").setLevel(logging.WARNING)
+    
+    server = None
+    if args.local_httpbin:
+        from utils.base_url import set_override
+        from utils.loopback_server import start_httpbin
+        server = start_httpbin()
+        set_override("https://httpbin.org", server.base_url)
+        set_override("http://httpbin.org", server.base_url)
+    
+    if args.rate_limits:
+        from utils import rate_limiter
+        rate_limiter.configure(args.rate_limits)
+    
+    try:
+        cases = load_cases([args.test_path or "test_cases/test_data"])
+        runner = LoadRunner(cases, args.rps, parse_duration(args.duration))
+        report = runner.run()
+    except KeyboardInterrupt:
+        logger.info("用户中断压测")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"压测失败: {e}", exc_info=args.debug)
+        sys.exit(1)
+    finally:
+        if server is not None:
+            server.stop()
+    
+    logger.info("压测结果:\n" + format_report(report))
+    if args.load_report:
+        Path(args.load_report).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.load_report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"压测报告已保存: {args.load_report}")
+
+def run_via_daemon(args) -> Path:
+    """
+    把本次执行交给常驻守护进程，返回allure结果目录
+
+    执行选项和QA_开头的环境变量随请求转发，输出逐行转发并显示进度
+    
+    Args:
+        args: 命令行参数
+    """
+    from utils.progress import ProgressTracker
+    from utils.worker_daemon import forwarded_env, send_request
+    
+    test_path = str(Path(args.test_path).resolve()) if args.test_path else None
+    tracker = ProgressTracker()
+    
+    def on_output(text):
+        for line in text.splitlines(keepends=True):
+            tracker.feed(line)
+    
+    response = send_request({
+        "command": "run",
+        "test_path": test_path,
+        "markers": args.markers,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "http_mode": args.http_mode,
+        "changed_only": args.changed_only,
+        "env": forwarded_env(),
+    }, on_output=on_output)
+    if "error" in response:
+        raise RuntimeError(f"守护进程执行失败: {response['error']}")
+    tracker.finish()
+    logger.info(f"守护进程执行完成，耗时 {response['elapsed']}s，退出码 {response['exit_code']}")
+    if not response["ok"]:
+        raise RuntimeError(f"测试执行失败，退出码: {response['exit_code']}")
+    return Path(response["result_path"])
+
+def list_runs(runner: TestRunner):
+    """打印全部历史执行，已归档的执行只读取归档索引"""
+    for run in runner.result_store.runs():
+        if run["archived"]:
+            statuses = ", ".join(f"{k} {v}" for k, v in sorted(run["statuses"].items()))
+            print(f"{run['name']}  已归档  {run['size'] / 1024:.1f} KB  用例 {run['tests']}  {statuses}")
+        else:
+            print(f"{run['name']}  目录")
+
 def main():
     """
     主函数，处理命令行参数并执行测试
@@ -39,11 +132,44 @@ def main():
     --clean: 清理旧报告
     --max-reports: 保留的报告数量
     --debug: 启用调试日志
+    --concurrency: 数据驱动用例的并发数
+    --load: 压测模式，按目标RPS回放用例文件中的请求
+    --rps: 压测目标每秒请求数
+    --duration: 压测时长，如 60s、2m
+    --load-report: 压测报告JSON的输出路径
+    --in-process: 在当前进程中执行pytest
+    --daemon: 启动常驻的测试执行守护进程
+    --via-daemon: 把本次执行交给已启动的守护进程
+    --changed-only: 只执行指纹变化或上次未通过的用例
+    --watch: 监视用例数据目录，文件变化后自动增量执行
+    --allure-html: 另外在后台生成完整的Allure HTML报告（需要allure命令行）
+    --archive-max-age: 归档结果的最长保留天数（配合--clean）
+    --archive-max-size: 归档结果的总大小上限，单位MB（配合--clean）
+    --list-runs: 列出全部历史执行（包括已归档的）
+    --open-run: 还原并查看指定的历史执行
+    --http-mode: live/record/replay，录制请求到磁带或从磁带回放（不访问网络）
+    --local-httpbin: 启动本地httpbin服务，发往httpbin.org的请求改写到本地
+    --prewarm: 执行前预解析DNS并预建连接
+    --rate-limits: 按主机/路由限流的配置文件，多个worker进程共享同一组令牌桶
     
     使用示例：
     python run_tests.py --test-path test_cases/test_httpbin_pytest.py
     python run_tests.py --markers smoke
     python run_tests.py --clean --max-reports 3
+    python run_tests.py --clean --max-reports 3 --archive-max-age 30 --archive-max-size 500
+    python run_tests.py --list-runs
+    python run_tests.py --http-mode record --no-serve
+    python run_tests.py --http-mode replay --no-serve
+    python run_tests.py --local-httpbin --no-serve
+    python run_tests.py --load --local-httpbin --rps 2000 --duration 10s --test-path test_cases/test_data
+    python run_tests.py --open-run 20240101_120000
+    python run_tests.py --workers 4 --rate-limits rate_limits.yaml --no-serve
+    python run_tests.py --load --rps 500 --duration 60s --test-path test_cases/test_data
+    python run_tests.py --changed-only --no-serve
+    python run_tests.py --watch
+    python run_tests.py --allure-html --no-serve
+    python run_tests.py --daemon &
+    python run_tests.py --via-daemon --test-path test_cases/test_user_api.py --no-serve
     """
     parser = argparse.ArgumentParser(description="测试运行器")
     parser.add_argument("--test-path", help="测试文件或目录路径")
@@ -52,13 +178,55 @@ def main():
     parser.add_argument("--no-serve", action="store_true", help="不启动报告服务")
     parser.add_argument("--clean", action="store_true", help="清理旧报告")
     parser.add_argument("--max-reports", type=int, default=5, help="保留的报告数量")
+    parser.add_argument("--archive-max-age", type=float, help="归档结果的最长保留天数")
+    parser.add_argument("--archive-max-size", type=float, help="归档结果的总大小上限（MB）")
+    parser.add_argument("--list-runs", action="store_true", help="列出全部历史执行")
+    parser.add_argument("--open-run", help="还原并查看指定的历史执行")
     parser.add_argument("--debug", action="store_true", help="启用调试日志")
+    parser.add_argument("--concurrency", type=int, default=0, help="数据驱动用例的并发数，0表示串行")
+    parser.add_argument("--workers", type=int, default=0, help="并行的pytest进程数，按历史耗时分配用例")
+    parser.add_argument("--in-process", action="store_true", help="在当前进程中执行pytest，不启动子进程")
+    parser.add_argument("--daemon", action="store_true", help="启动常驻的测试执行守护进程")
+    parser.add_argument("--via-daemon", action="store_true", help="通过已启动的守护进程执行测试")
+    parser.add_argument("--changed-only", action="store_true", help="只执行指纹变化或上次未通过的用例")
+    parser.add_argument("--watch", action="store_true", help="监视用例数据目录，变化后自动增量执行")
+    parser.add_argument("--http-mode", choices=["live", "record", "replay"], help="录制或回放HTTP请求")
+    parser.add_argument("--local-httpbin", action="store_true", help="请求改写到本地httpbin服务")
+    parser.add_argument("--prewarm", action="store_true", help="执行前预解析DNS并预建连接")
+    parser.add_argument("--rate-limits", help="按主机/路由限流的配置文件（YAML或JSON）")
+    parser.add_argument("--allure-html", action="store_true", help="在后台生成完整的Allure HTML报告")
+    parser.add_argument("--load", action="store_true", help="压测模式，按目标RPS回放用例")
+    parser.add_argument("--rps", type=float, default=10, help="压测目标每秒请求数")
+    parser.add_argument("--duration", default="60s", help="压测时长，如 60s、2m")
+    parser.add_argument("--load-report", help="压测报告JSON的输出路径")
     
     args = parser.parse_args()
     
     # 设置日志级别
     setup_logging(args.debug)
     
+    # 通过环境变量传给pytest和压测（子进程、分片进程都会读取），使用绝对路径避免工作目录不同
+    if args.rate_limits:
+        os.environ["QA_RATE_LIMITS"] = os.path.abspath(args.rate_limits)
+    
+    if args.load:
+        run_load_test(args)
+        return
+    
+    if args.daemon:
+        from utils.worker_daemon import WorkerDaemon
+        try:
+            WorkerDaemon().serve_forever()
+        except KeyboardInterrupt:
+            logger.info("守护进程已停止")
+        return
+    
+    # 通过环境变量传给pytest（子进程和进程内执行都会读取）
+    if args.local_httpbin:
+        os.environ["QA_LOCAL_HTTPBIN"] = "1"
+    if args.prewarm:
+        os.environ["QA_PREWARM"] = "1"
+    
     try:
         logger.info("开始执行测试...")
         runner = TestRunner()
@@ -66,15 +234,40 @@ def main():
         # 清理旧报告
         if args.clean:
             logger.info("清理旧报告...")
-            runner.clean_old_results(args.max_reports)
+            runner.clean_old_results(args.max_reports, args.archive_max_age, args.archive_max_size)
+        
+        if args.list_runs:
+            list_runs(runner)
+            return
+        
+        if args.open_run:
+            result_path = runner.result_store.restore(args.open_run)
+            report_path = runner.generate_report(result_path, allure_html=args.allure_html)
+            logger.info(f"报告已生成: {report_path}")
+            if not args.no_serve:
+                runner.serve_report(result_path, args.port)
+            return
+        
+        # 监视模式：文件变化后自动增量执行，不生成报告
+        if args.watch:
+            runner.watch(args.test_path, args.markers, args.concurrency)
+            return
         
         # 运行测试
         logger.info(f"运行测试: {args.test_path or '所有测试'}")
-        result_path = runner.run_tests(args.test_path, args.markers)
+        if args.via_daemon:
+            result_path = run_via_daemon(args)
+        else:
+            result_path = runner.run_tests(args.test_path, args.markers, args.concurrency, args.workers,
+                                           in_process=args.in_process, changed_only=args.changed_only,
+                                           http_mode=args.http_mode)
+        
+        # 相同内容的附件只保留一份
+        runner.result_store.dedup(result_path)
         
         # 生成报告
         logger.info("生成测试报告...")
-        report_path = runner.generate_report(result_path)
+        report_path = runner.generate_report(result_path, allure_html=args.allure_html)
         logger.info(f"报告已生成: {report_path}")
         
         # 启动报告服务
@@ -1,49 +1,74 @@
+import os
 import pytest
 import logging
-from typing import Dict, Any
+from typing import Dict
 from utils.data_loader import DataLoader, TestCase
-from utils.keywords import Keywords
-from ddt import ddt, data, file_data
+from utils.keywords import Keywords, keyword_method
+from utils.latency import LATENCY_KEYS, run_repeated
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@ddt
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data')
+
+def _cases(file_name: str):
+    """
+    加载数据驱动用例，参数名为test_data，指定 --concurrency 时由run_case使用并发预执行的结果
+    
+    JSONL用例在收集阶段只读取偏移索引中的case_name，执行时由test_data fixture按序号读取单个用例，
+    各xdist worker和--shard分片的收集结果一致，且只解析自己执行的用例（未指定--changed-only时）
+    """
+    path = os.path.join(DATA_DIR, file_name)
+    if file_name.endswith('.jsonl'):
+        return pytest.mark.parametrize("test_data", DataLoader.case_refs(path),
+                                       ids=DataLoader.case_names(path), indirect=True)
+    cases = list(DataLoader.iter_test_cases(path))
+    return pytest.mark.parametrize("test_data", cases, ids=[case.case_name for case in cases])
+
+
+@pytest.fixture
+def test_data(request):
+    """间接参数化的JSONL用例，参数为CaseRef"""
+    return DataLoader.load_case(request.param.file_path, request.param.index)
+
+
 class TestHttpbin:
     def setup_class(self):
         self.keywords = Keywords()
     
-    @data(*DataLoader.load_test_cases("test_data/test_httpbin_api.json"))
-    def test_json_cases(self, test_case: TestCase):
+    @_cases("test_httpbin_api.json")
+    def test_json_cases(self, test_data: TestCase, run_case):
         """测试JSON文件中的用例"""
-        self._execute_test_case(test_case)
+        self._execute_test_case(test_data, run_case)
     
-    @data(*DataLoader.load_test_cases("test_data/test_httpbin_api.csv"))
-    def test_csv_cases(self, test_case: TestCase):
+    @_cases("test_httpbin_api.csv")
+    def test_csv_cases(self, test_data: TestCase, run_case):
         """测试CSV文件中的用例"""
-        self._execute_test_case(test_case)
+        self._execute_test_case(test_data, run_case)
+    
+    @_cases("test_httpbin_api.jsonl")
+    def test_jsonl_cases(self, test_data: TestCase, run_case):
+        """测试JSONL文件中的用例"""
+        self._execute_test_case(test_data, run_case)
     
-    def _execute_test_case(self, test_case: TestCase):
+    def _execute_test_case(self, test_case: TestCase, run_case):
         """执行测试用例"""
         logger.info(f"开始执行测试用例: {test_case.case_name}")
         logger.info(f"测试描述: {test_case.description}")
         
-        # 获取关键字方法
-        keyword_func = getattr(self.keywords, test_case.keyword)
-        
-        # 执行关键字
-        response = keyword_func(**test_case.params)
+        # 执行关键字，期望结果中指定repeat时重复执行
+        method = keyword_method(test_case.keyword) or ''
+        response, latencies = run_repeated(lambda: run_case(test_case), test_case.expected, method)
         
         # 验证结果
-        self._verify_response(response, test_case.expected)
+        self._verify_response(response, test_case.expected, latencies, test_case.case_name)
         
-    def _verify_response(self, response, expected: Dict):
+    def _verify_response(self, response, expected: Dict, latencies=None, case_name: str = None):
         """验证响应结果"""
-        # 验证状态码
-        if 'status_code' in expected:
-            self.keywords.verify_status_code(response, expected['status_code'])
+        # 验证状态码和响应字段
+        self.keywords.verify_expected(response, expected, case_name)
         
-        # 验证响应字段
-        for field, value in expected.items():
-            if field != 'status_code':
-                self.keywords.verify_response_field(response, field, value) 
\ No newline at end of file
+        # 验证耗时
+        if latencies and LATENCY_KEYS & expected.keys():
+            self.keywords.verify_latency(latencies, expected) 
+
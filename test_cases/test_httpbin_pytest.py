@@ -3,9 +3,6 @@ import logging
 from typing import Dict, Any
 from utils.data_loader import DataLoader
 from utils.keywords import Keywords
-import json
-import yaml
-import csv
 from pathlib import Path
 import allure
 from utils.ssl_helper import disable_ssl_warnings
@@ -48,9 +45,7 @@ class TestHttpbinPytest:
         Returns:
             List[Dict]: 测试数据列表
         """
-        yaml_file = Path(__file__).parent / "test_data/httpbin_data.yaml"
-        with open(yaml_file, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+        return DataLoader.load_raw(str(Path(__file__).parent / "test_data/httpbin_data.yaml"))
     
     def get_json_data():
         """
@@ -59,9 +54,7 @@ class TestHttpbinPytest:
         Returns:
             List[Dict]: 测试数据列表
         """
-        json_file = Path(__file__).parent / "test_data/httpbin_data.json"
-        with open(json_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return DataLoader.load_raw(str(Path(__file__).parent / "test_data/httpbin_data.json"))
     
     def get_csv_data():
         """
@@ -70,21 +63,7 @@ class TestHttpbinPytest:
         Returns:
             List[Dict]: 测试数据列表，包含解析后的JSON字段
         """
-        csv_file = Path(__file__).parent / "test_data/httpbin_data.csv"
-        test_data = []
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    # 解析CSV中的JSON字符串字段
-                    row['params'] = json.loads(row['params'])
-                    row['expected'] = json.loads(row['expected'])
-                    test_data.append(row)
-                except json.JSONDecodeError as e:
-                    logger.error(f"解析JSON数据失败: {row}")
-                    logger.error(f"错误信息: {str(e)}")
-                    raise
-        return test_data
+        return DataLoader.load_raw(str(Path(__file__).parent / "test_data/httpbin_data.csv"))
     
     # 测试方法
     @allure.story("参数化GET请求")
@@ -131,33 +110,30 @@ class TestHttpbinPytest:
     @allure.title("使用YAML数据测试接口")
     @pytest.mark.api
     @pytest.mark.parametrize("test_data", get_yaml_data(), ids=lambda x: f"YAML数据测试-{x['case_name']}")
-    def test_with_yaml_data(self, test_data: Dict):
+    def test_with_yaml_data(self, test_data: Dict, run_case):
         """使用YAML数据参数化测试"""
         with allure.step(f"执行{test_data['keyword']}请求"):
-            keyword_func = getattr(self.keywords, test_data["keyword"])
-            response = keyword_func(**test_data["params"])
+            response = run_case(test_data)
             
         with allure.step(f"验证响应状态码为 {test_data['expected']['status_code']}"):
             assert response.status_code == test_data["expected"]["status_code"]
     
     @pytest.mark.api
     @pytest.mark.parametrize("test_data", get_json_data(), ids=lambda x: f"JSON数据测试-{x['case_name']}")
-    def test_with_json_data(self, test_data: Dict):
+    def test_with_json_data(self, test_data: Dict, run_case):
         """使用JSON数据参数化测试"""
         with allure.step(f"执行{test_data['keyword']}请求"):
-            keyword_func = getattr(self.keywords, test_data["keyword"])
-            response = keyword_func(**test_data["params"])
+            response = run_case(test_data)
             
         with allure.step(f"验证响应状态码为 {test_data['expected']['status_code']}"):
             assert response.status_code == test_data["expected"]["status_code"]
     
     @pytest.mark.api
     @pytest.mark.parametrize("test_data", get_csv_data(), ids=lambda x: f"CSV数据测试-{x['case_name']}")
-    def test_with_csv_data(self, test_data: Dict):
+    def test_with_csv_data(self, test_data: Dict, run_case):
         """使用CSV数据参数化测试"""
         with allure.step(f"执行{test_data['keyword']}请求"):
-            keyword_func = getattr(self.keywords, test_data["keyword"])
-            response = keyword_func(**test_data["params"])
+            response = run_case(test_data)
             
         with allure.step(f"验证响应状态码为 {test_data['expected']['status_code']}"):
             assert response.status_code == test_data["expected"]["status_code"]
@@ -208,9 +184,11 @@ def main():
     --allure: 生成Allure报告的目录
     --no-warnings: 禁用警告信息
     --serve: 运行完成后启动报告服务
+    --allure-html: 另外在后台生成完整的Allure HTML报告
     
     示例：
     python test_httpbin_pytest.py --allure reports/allure-results
+    python test_httpbin_pytest.py --allure reports/allure-results --allure-html
     python test_httpbin_pytest.py -m smoke --allure reports/allure-results --serve
     """
     import sys
@@ -225,6 +203,7 @@ def main():
     parser.add_argument("--allure", help="生成Allure报告的目录")
     parser.add_argument("--no-warnings", action="store_true", help="禁用警告信息")
     parser.add_argument("--serve", action="store_true", help="运行完成后启动报告服务")
+    parser.add_argument("--allure-html", action="store_true", help="在后台生成完整的Allure HTML报告")
     
     # 解析命令行参数
     args = parser.parse_args()
@@ -262,36 +241,33 @@ def main():
         exit_code = pytest.main(pytest_args)
         logger.info(f"测试执行完成，退出码: {exit_code}")
         
-        # 如果生成了allure报告，则生成HTML报告
+        # 如果生成了allure结果，则汇总为轻量报告
         if result_dir and Path(result_dir).exists():
-            try:
-                logger.info("正在生成Allure HTML报告...")
+            from utils.report_aggregator import aggregate, start_allure_generate
+            
+            summary_dir = f"{args.allure}/summary/{timestamp}"
+            aggregate(result_dir, summary_dir)
+            logger.info(f"汇总报告: {summary_dir}/index.html")
+            
+            if args.allure_html:
                 report_dir = f"{args.allure}/html/{timestamp}"
-                subprocess.run(
-                    ["allure", "generate", result_dir, "-o", report_dir, "--clean"],
-                    check=True
-                )
-                logger.info(f"报告已生成: {report_dir}")
-                
-                # 如果指定了serve参数，则启动报告服务
-                if args.serve:
-                    logger.info("启动报告服务...")
-                    try:
-                        subprocess.run(["allure", "serve", result_dir])
-                    except KeyboardInterrupt:
-                        logger.info("报告服务已停止")
-                else:
-                    logger.info(f"可以使用以下命令查看报告:")
-                    logger.info(f"allure serve {result_dir}")
-                    logger.info(f"或者打开HTML报告: {report_dir}/index.html")
-                    
-            except subprocess.CalledProcessError as e:
-                logger.error(f"生成报告失败: {e}")
-            except FileNotFoundError:
-                logger.error("未找到allure命令，请确保已安装allure")
-                logger.info("可以使用以下命令安装allure:")
-                logger.info("Mac: brew install allure")
-                logger.info("Windows: scoop install allure")
+                if start_allure_generate(result_dir, report_dir) is None:
+                    logger.info("可以使用以下命令安装allure:")
+                    logger.info("Mac: brew install allure")
+                    logger.info("Windows: scoop install allure")
+            
+            # 如果指定了serve参数，则启动报告服务
+            if args.serve:
+                logger.info("启动报告服务...")
+                try:
+                    subprocess.run(["allure", "serve", result_dir])
+                except KeyboardInterrupt:
+                    logger.info("报告服务已停止")
+                except FileNotFoundError:
+                    logger.error("未找到allure命令，请直接打开汇总报告")
+            else:
+                logger.info(f"可以使用以下命令查看完整报告:")
+                logger.info(f"allure serve {result_dir}")
                 
     except KeyboardInterrupt:
         logger.info("测试执行被用户中断")
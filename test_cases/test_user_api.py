@@ -1,19 +1,23 @@
 import pytest
 from typing import Dict, Any
+from utils.assertion import assert_response
+from utils.latency import run_repeated, check_latency
 
-def test_api(test_case: Dict[str, Any], http_client):
+def test_api(test_case: Dict[str, Any], send_case):
     """执行API测试用例"""
-    # 发送请求
-    response = http_client.send_request(test_case)
-    
-    # 验证响应
+    # 期望结果
     expected = test_case['expected_response']
     
-    # 验证状态码
-    assert response.status_code == expected['status_code']
+    # 发送请求，期望结果中指定repeat时重复执行
+    response, latencies = run_repeated(lambda: send_case(test_case), expected, test_case['method'])
+    
+    # 验证状态码、响应体和schema
+    checks = {'status_code': expected['status_code']}
+    checks.update({f"body.{key}": value for key, value in expected.get('body', {}).items()})
+    if 'schema' in expected:
+        checks['schema'] = expected['schema']
+    assert_response(response, checks, test_case.get('case_name'))
     
-    # 验证响应体
-    if 'body' in expected:
-        response_json = response.json()
-        for key, value in expected['body'].items():
-            assert response_json[key] == value 
\ No newline at end of file
+    # 验证耗时
+    errors = check_latency(latencies, expected)
+    assert not errors, "耗时不满足要求: " + "；".join(errors)
@@ -0,0 +1,116 @@
+import json
+
+import pytest
+import requests
+
+from utils.assertion import assert_response, compile_expected
+
+BODY = {
+    "args": {"name": "张三", "age": "25"},
+    "items": [{"id": 1, "tags": ["a"]}, {"id": 2, "tags": []}],
+    "count": 2,
+    "ok": True,
+    "origin": "127.0.0.1",
+    "headers": {"Host": "httpbin.org"},
+}
+
+
+def make_response(body=BODY, status=200, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = requests.structures.CaseInsensitiveDict(
+        headers or {"Content-Type": "application/json; charset=utf-8"})
+    response._content = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    response.encoding = "utf-8"
+    return response
+
+
+def errors_of(expected, response=None):
+    return compile_expected(expected).errors(response or make_response())
+
+
+@pytest.mark.parametrize("expected", [
+    {"status_code": 200},
+    {"response.args.name": "张三", "body.args.age": "25", "count": 2},
+    {"items.1.id": 2, "items.0.tags": ["a"]},
+    {"count": {"$gt": 1, "$le": 2}, "ok": {"$type": "boolean"}, "count ": {"$exists": False}},
+    {"origin": {"$regex": r"^\d+\.\d+"}, "items": {"$len": 2}, "items.0.tags": {"$contains": "a"}},
+    {"args.name": {"$ne": "李四"}, "missing": {"$exists": False}, "items.1.tags": {"$eq": []}},
+    {"response.headers.Host": "httpbin.org"},
+    {"$.body.items[1].id": 2, "$.body.items[*].id": {"$eq": 1}},
+])
+def test_passing_expectations(expected):
+    assert errors_of(expected) == []
+
+
+@pytest.mark.parametrize("expected, message", [
+    ({"status_code": 201}, "status_code: 期望 201，实际 200"),
+    ({"count": {"$lt": 2}}, "count: 期望 < 2，实际 2"),
+    ({"count": {"$type": "boolean"}}, "count: 期望类型 boolean，实际 2"),
+    ({"ok": {"$type": "integer"}}, "ok: 期望类型 integer，实际 true"),
+    ({"origin": {"$regex": "^10\\."}}, 'origin: 期望匹配正则 ^10\\.，实际 "127.0.0.1"'),
+    ({"args.name": {"$exists": False}}, 'args.name: 期望字段不存在，实际 "张三"'),
+    ({"items": {"$len": 3}}, "items: 期望长度 3"),
+    ({"count": {"$contains": 1}}, "count: 期望包含 1，实际 2"),
+])
+def test_operator_failures(expected, message):
+    errors = errors_of(expected)
+    assert len(errors) == 1 and errors[0].startswith(message)
+
+
+def test_unknown_operator_and_type():
+    with pytest.raises(ValueError):
+        compile_expected({"count": {"$between": [1, 2]}})
+    with pytest.raises(ValueError):
+        compile_expected({"count": {"$type": "decimal"}})
+
+
+def test_missing_path_reports_every_field_below_it():
+    errors = errors_of({"user.name": "a", "user.id": 1, "user.extra": {"$exists": False}, "args.name": "张三"})
+    assert sorted(errors) == ["user.id: 字段不存在", "user.name: 字段不存在"]
+    # 简单JSONPath与字段路径在同一棵树中校验
+    assert sorted(errors_of({"items.5.id": 1, "$.body.items[5].id": 1})) == [
+        "$.body.items[5].id: 字段不存在", "items.5.id: 字段不存在"]
+
+
+def test_response_headers_are_case_insensitive():
+    assert errors_of({"headers.content-type": {"$regex": "application/json"}}) == []
+    assert errors_of({"headers.X-Trace-Id": {"$exists": True}}) == ["headers.X-Trace-Id: 字段不存在"]
+
+
+def test_all_mismatches_are_reported_together():
+    with pytest.raises(AssertionError) as info:
+        assert_response(make_response(status=500), {"status_code": 200, "count": 3, "args.name": "李四"}, "创建用户")
+    message = str(info.value)
+    assert message.startswith("用例 创建用户 响应校验失败（3 项）")
+    assert "status_code" in message and "count" in message and "args.name" in message
+
+
+def test_latency_keys_are_not_response_fields():
+    assert errors_of({"status_code": 200, "max_latency_ms": 1, "p95_latency_ms": 1, "repeat": 1}) == []
+
+
+def test_inline_schema():
+    schema = {"type": "object", "required": ["count"], "properties": {"count": {"type": "string"}}}
+    errors = errors_of({"schema": schema})
+    assert len(errors) == 1 and errors[0].startswith("schema")
+
+
+def test_compile_expected_is_cached_by_content():
+    first = compile_expected({"status_code": 200, "count": 2})
+    assert compile_expected({"count": 2, "status_code": 200}) is first
+    assert compile_expected({"count": 3, "status_code": 200}) is not first
+
+
+@pytest.mark.parametrize("expected", [
+    {"status_code": 200, "args.name": "张三"},
+    {"$.body.items[*].id": 1},
+    {"schema": {"type": "object"}},
+])
+def test_non_json_body_fails_as_assertion_naming_the_case(expected):
+    response = make_response(b"<html>502 Bad Gateway</html>", headers={"Content-Type": "text/html"})
+    with pytest.raises(AssertionError) as info:
+        assert_response(response, expected, "查询用户")
+    message = str(info.value)
+    assert message.startswith("用例 查询用户 响应校验失败（1 项）")
+    assert "响应体不是合法的JSON" in message and "502 Bad Gateway" in message
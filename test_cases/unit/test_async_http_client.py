@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from utils import async_http_client
+from utils.async_http_client import AsyncHTTPClient, run_concurrently
+from utils.loopback_server import AsyncHTTPServer, json_response
+
+
+@pytest.fixture
+def server():
+    """按查询参数delay延迟响应，记录同时处理中的请求数的最大值"""
+    state = {"active": 0, "peak": 0}
+
+    async def handler(request):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(float(request.args().get("delay", 0.05)))
+        finally:
+            state["active"] -= 1
+        return json_response({"path": request.path})
+
+    with AsyncHTTPServer(handler) as server:
+        yield server, state
+
+
+def test_concurrency_is_bounded(server):
+    server, state = server
+    cases = [{"method": "GET", "url": f"{server.base_url}/{i}"} for i in range(12)]
+    results = run_concurrently(cases, max_concurrency=3)
+    assert all(result.ok for result in results)
+    assert state["peak"] == 3
+
+
+def test_results_keep_input_order_with_errors(server):
+    server, _ = server
+    # 前面的用例比后面的慢，先完成的结果不能排到前面
+    cases = [{"method": "GET", "url": f"{server.base_url}/{i}?delay={0.2 - i * 0.05}"} for i in range(4)]
+    cases.insert(2, {"method": "GET", "url": "http://{undefined}/x"})
+    results = run_concurrently(cases, max_concurrency=5)
+
+    assert [result.case for result in results] == cases
+    assert [result.ok for result in results] == [True, True, False, True, True]
+    assert results[2].response is None and results[2].error is not None
+    assert [r.response.json()["path"] for r in results if r.ok] == ["/0", "/1", "/2", "/3"]
+
+
+def test_keyword_cases_share_one_keywords_instance(server, monkeypatch):
+    server, _ = server
+    created = []
+    original = async_http_client.Keywords.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created.append(self)
+        original(self, *args, **kwargs)
+    monkeypatch.setattr(async_http_client.Keywords, "__init__", counting_init)
+
+    cases = [{"keyword": "get_request", "params": {"url": f"{server.base_url}/{i}"}} for i in range(6)]
+    results = run_concurrently(cases, max_concurrency=3, keywords=True)
+    assert [result.response.status_code for result in results] == [200] * 6
+    assert len(created) == 1
+
+
+def test_client_keywords_use_client_session(server):
+    server, _ = server
+    client = AsyncHTTPClient(max_concurrency=2)
+    try:
+        assert client.keywords.http_client.session is client.session
+        response = client.execute_keyword_case({"keyword": "get_request", "params": {"url": server.base_url}})
+        assert response.status_code == 200
+    finally:
+        client.close()
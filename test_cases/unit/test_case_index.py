@@ -0,0 +1,38 @@
+import json
+import os
+
+import pytest
+
+from utils.case_index import index_path_for, open_index
+
+
+def write_cases(path, names):
+    path.write_text("".join(json.dumps({"case_name": name, "keyword": "get_request"}) + "\n\n"
+                            for name in names), encoding="utf-8")
+
+
+def test_random_access_by_position_and_name(tmp_path):
+    data_file = tmp_path / "cases.jsonl"
+    write_cases(data_file, ["a", "b", "c"])
+    index = open_index(str(data_file))
+    assert os.path.exists(index_path_for(str(data_file)))
+    assert index.names() == ["a", "b", "c"]
+    assert index.get(1)["case_name"] == "b"
+    assert index.get(-1)["case_name"] == "c"
+    assert index.get("a")["case_name"] == "a"
+    with index.raw("c") as view:
+        assert isinstance(view, memoryview)
+        assert json.loads(view.tobytes())["case_name"] == "c"
+    with pytest.raises(KeyError):
+        index.get("missing")
+    with pytest.raises(IndexError):
+        index.get(3)
+
+
+def test_index_is_rebuilt_when_source_changes(tmp_path):
+    data_file = tmp_path / "cases.jsonl"
+    write_cases(data_file, ["a"])
+    assert open_index(str(data_file)).names() == ["a"]
+    write_cases(data_file, ["a", "bb"])
+    index = open_index(str(data_file))
+    assert len(index) == 2 and index.get("bb")["case_name"] == "bb"
@@ -0,0 +1,40 @@
+import requests
+
+from utils.cassette import Cassette, normalize_request
+
+
+def response(text):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.reason = "OK"
+    resp.url = "http://svc/"
+    resp._content = text.encode("utf-8")
+    return resp
+
+
+def test_record_merges_by_request_key(tmp_path):
+    path = str(tmp_path / "cases.cassette.jsonl")
+    a = normalize_request("GET", "http://svc/a")
+    b = normalize_request("GET", "http://svc/b", params={"q": 1})
+    first = Cassette(path, "record")
+    first.record(a, response("a1"))
+    first.record(b, response("b1"))
+    first.close()
+
+    # 只执行部分用例：重新录制a，b的旧记录保留
+    second = Cassette(path, "record")
+    second.record(a, response("a2"))
+    second.record(a, response("a3"))
+    second.close()
+
+    replay = Cassette(path, "replay")
+    assert len(replay) == 3
+    assert [replay.replay(a).text for _ in range(3)] == ["a2", "a3", "a3"]
+    assert replay.replay(b).text == "b1"
+    replay.close()
+
+
+def test_nothing_is_written_without_recordings(tmp_path):
+    path = tmp_path / "empty.cassette.jsonl"
+    Cassette(str(path), "record").close()
+    assert not path.exists()
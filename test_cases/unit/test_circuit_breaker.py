@@ -0,0 +1,130 @@
+import pytest
+import requests
+
+from utils.circuit_breaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError,
+                                   HostHealth, HttpSettings)
+
+
+@pytest.fixture
+def settings():
+    settings = HttpSettings()
+    settings.breaker_threshold = 2
+    settings.breaker_reset = 0
+    return settings
+
+
+def test_opens_after_consecutive_failures(settings):
+    settings.breaker_reset = 60
+    breaker = CircuitBreaker("h:80", settings)
+    error = requests.exceptions.ConnectionError("refused")
+    breaker.record_failure(error)
+    breaker.record_success()
+    breaker.record_failure(error)
+    assert breaker.state == CLOSED
+    breaker.record_failure(error)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    assert breaker.to_dict()["rejected"] == 1
+
+
+def test_half_open_allows_single_probe(settings):
+    breaker = CircuitBreaker("h:80", settings)
+    for _ in range(2):
+        breaker.record_failure(requests.exceptions.Timeout())
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+
+
+def test_failed_probe_reopens(settings):
+    breaker = CircuitBreaker("h:80", settings)
+    for _ in range(2):
+        breaker.record_failure(requests.exceptions.Timeout())
+    breaker.before_request()
+    breaker.record_failure(requests.exceptions.Timeout())
+    assert breaker.state == OPEN
+    assert breaker.opened_count == 2
+
+
+def test_threshold_zero_never_opens(settings):
+    settings.breaker_threshold = 0
+    breaker = CircuitBreaker("h:80", settings)
+    for _ in range(10):
+        breaker.record_failure(requests.exceptions.Timeout())
+    assert breaker.state == CLOSED
+
+
+def test_attempts_and_backoff(settings):
+    settings.retries = 2
+    assert settings.attempts("get") == 3
+    assert settings.attempts("POST") == 1
+    assert 0 <= settings.backoff_delay(10) <= settings.max_backoff
+
+
+def test_host_health_summary(settings):
+    health = HostHealth(settings)
+    assert health.breaker("a:80") is health.breaker("a:80")
+    health.breaker("b:80").record_failure(requests.exceptions.Timeout())
+    assert list(health.summary(only_unhealthy=True)) == ["b:80"]
+
+
+def test_release_frees_probe_without_changing_state(settings):
+    breaker = CircuitBreaker("h:80", settings)
+    for _ in range(2):
+        breaker.record_failure(requests.exceptions.Timeout())
+    breaker.before_request()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    breaker.before_request()
+
+
+def _open_breaker(monkeypatch, settings, error):
+    from utils import http_client
+
+    health = HostHealth(settings)
+    monkeypatch.setattr(http_client, "host_health", health)
+    monkeypatch.setattr(http_client, "http_settings", settings)
+    breaker = health.breaker("h:80")
+    for _ in range(2):
+        breaker.record_failure(requests.exceptions.Timeout())
+    calls = []
+
+    def send_once(*args):
+        calls.append(args)
+        raise error
+
+    client = http_client.HTTPClient(session=requests.Session())
+    monkeypatch.setattr(client, "_send_once", send_once)
+    return client, breaker, calls
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ChunkedEncodingError("truncated"),
+    requests.exceptions.ContentDecodingError("gzip"),
+    KeyboardInterrupt(),
+])
+def test_probe_slot_released_on_other_errors(monkeypatch, settings, error):
+    client, breaker, _ = _open_breaker(monkeypatch, settings, error)
+    with pytest.raises(type(error)):
+        client._send_with_retry("GET", "http://h:80/a", {}, {}, None)
+    assert breaker.state == HALF_OPEN
+    breaker.before_request()
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.SSLError("bad cert"),
+    requests.exceptions.ProxyError("proxy down"),
+])
+def test_ssl_and_proxy_errors_are_not_retried(monkeypatch, settings, error):
+    settings.retries = 2
+    client, breaker, calls = _open_breaker(monkeypatch, settings, error)
+    with pytest.raises(type(error)):
+        client._send_with_retry("GET", "http://h:80/a", {}, {}, None)
+    assert len(calls) == 1
+    assert breaker.state == HALF_OPEN
+    breaker.before_request()
@@ -0,0 +1,111 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.connection_pool import (configure_pool, create_session, get_pool_config, get_shared_adapter,
+                                   grow_pool, keep_connections, pool_stats, reset_pool_stats, warm_connections)
+from utils.loopback_server import AsyncHTTPServer, json_response
+
+
+@pytest.fixture
+def server():
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return json_response({"path": request.path})
+
+    with AsyncHTTPServer(handler) as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    """每个测试使用新的共享适配器和统计，结束后恢复原配置"""
+    saved = dict(get_pool_config().__dict__)
+    configure_pool()
+    reset_pool_stats()
+    yield
+    configure_pool(**saved)
+
+
+def pools():
+    manager = get_shared_adapter().poolmanager
+    return [manager.pools[key] for key in manager.pools.keys()]
+
+
+def test_sessions_share_keep_alive_connections(server):
+    first, second = create_session(), create_session()
+    for _ in range(3):
+        assert first.get(server.base_url).status_code == 200
+        assert second.get(server.base_url).status_code == 200
+    stats = pool_stats()
+    assert (stats["opened"], stats["reused"]) == (1, 5)
+    first.close()
+    second.close()
+
+
+def test_closing_the_last_session_releases_connections(server):
+    first, second = create_session(), create_session()
+    first.get(server.base_url)
+    first.close()
+    # 另一个会话仍在使用，连接保留
+    second.get(server.base_url)
+    assert pool_stats()["reused"] == 1
+    second.close()
+    assert pools() == []
+
+    session = create_session()
+    session.get(server.base_url)
+    del session
+    assert pools() == []
+    assert pool_stats()["opened"] == 2
+
+
+def test_keep_connections_outlives_sessions(server):
+    with keep_connections():
+        session = create_session()
+        session.get(server.base_url)
+        session.close()
+        assert len(pools()) == 1
+        create_session().get(server.base_url)
+        assert (pool_stats()["opened"], pool_stats()["reused"]) == (1, 1)
+    assert pools() == []
+
+
+def test_grow_replaces_pool_and_keeps_idle_connections(server):
+    configure_pool(pool_maxsize=2)
+    with keep_connections():
+        assert warm_connections(server.base_url, 2) == 2
+        [old] = pools()
+        grow_pool(5)
+        [grown] = pools()
+        assert grown is not old and old.pool is None
+        assert grown.pool.maxsize == 5
+        # 两个预热的连接都移到了新池，再次预热不需要新建
+        assert warm_connections(server.base_url, 2) == 0
+
+        session = create_session()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: session.get(server.base_url), range(2)))
+        assert (pool_stats()["opened"], pool_stats()["reused"]) == (0, 2)
+        session.close()
+
+
+def test_stats_under_concurrent_clients(server):
+    configure_pool(pool_maxsize=4)
+
+    def client(_):
+        session = create_session()
+        try:
+            return [session.get(f"{server.base_url}/{i}").status_code for i in range(10)]
+        finally:
+            session.close()
+
+    with keep_connections():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(client, range(4)))
+    assert results == [[200] * 10] * 4
+    stats = pool_stats()
+    assert stats["requests"] == 40
+    assert 1 <= stats["opened"] <= 4
+    assert stats["hosts"][f"127.0.0.1:{server.port}"] == {"opened": stats["opened"], "reused": stats["reused"]}
@@ -0,0 +1,52 @@
+import pytest
+
+from utils.dependency import CaseGraph, DependencyError
+
+
+def case(name, url="/", extract=None, **fields):
+    data = {"case_name": name, "method": "GET", "url": url, **fields}
+    if extract:
+        data["extract"] = {variable: f"$.body.{variable}" for variable in extract}
+    return data
+
+
+def test_order_and_chains():
+    graph = CaseGraph([
+        case("detail", "/users/{user_id}"),
+        case("create", "/users", extract=["user_id"]),
+        case("health", "/health"),
+        case("orders", "/orders", params={"user": "{user_id}", "token": "{token}"}),
+        case("login", "/login", extract=["token"]),
+    ])
+    assert graph.nodes[0].depends == {1}
+    assert graph.nodes[3].depends == {1, 4}
+    assert graph.order == [1, 0, 2, 4, 3]
+    assert sorted(map(sorted, graph.chains)) == [[0, 1, 3, 4], [2]]
+    position = {index: i for chain in graph.chains for i, index in enumerate(chain)}
+    assert position[1] < position[0] and position[4] < position[3]
+
+
+def test_nearest_previous_producer_wins():
+    graph = CaseGraph([
+        case("first", extract=["id"]),
+        case("second", extract=["id"]),
+        case("use", "/items/{id}"),
+    ])
+    assert graph.nodes[2].depends == {1}
+
+
+def test_initial_context_satisfies_variables():
+    graph = CaseGraph([case("use", "/items/{id}")], {"id": 1})
+    assert graph.order == [0]
+
+
+def test_missing_producer_and_cycle():
+    with pytest.raises(DependencyError) as info:
+        CaseGraph([case("use", "/items/{id}")])
+    assert info.value.missing == [("use", "id")]
+    with pytest.raises(DependencyError) as info:
+        CaseGraph([
+            case("a", "/{b}", extract=["a"]),
+            case("b", "/{a}", extract=["b"]),
+        ])
+    assert info.value.cycles == [["a", "b"]]
@@ -0,0 +1,111 @@
+import socket
+
+import pytest
+import requests
+
+from utils import dns_cache as dns_cache_module
+from utils.connection_pool import create_session
+from utils.dns_cache import DNSCache, dns_cache
+from utils.loopback_server import AsyncHTTPServer, json_response
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """按主机名返回预设的地址，记录每次实际解析"""
+    table = {}
+    calls = []
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, port, family=0, type=0, *args):
+        if host not in table:
+            # IP地址由系统直接返回，不访问网络
+            return real_getaddrinfo(host, port, family, type, *args)
+        calls.append(host)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port)) for address in table[host]]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    return table, calls
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dns_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_ttl_expiry_resolves_again(lookups, clock):
+    table, calls = lookups
+    table["svc.test"] = ["10.0.0.1"]
+    cache = DNSCache(ttl=30)
+    assert cache.resolve("svc.test", 80) == ["10.0.0.1"]
+    clock[0] += 29
+    table["svc.test"] = ["10.0.0.2"]
+    assert cache.resolve("svc.test", 80) == ["10.0.0.1"]
+    clock[0] += 2
+    assert cache.resolve("svc.test", 80) == ["10.0.0.2"]
+    assert calls == ["svc.test", "svc.test"]
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+
+def test_keeps_every_address_in_order_without_duplicates(lookups, clock):
+    table, _ = lookups
+    table["svc.test"] = ["10.0.0.2", "10.0.0.1", "10.0.0.2"]
+    assert DNSCache().resolve("svc.test", 443) == ["10.0.0.2", "10.0.0.1"]
+
+
+def test_ip_and_disabled_cache_bypass_lookup(lookups, clock):
+    table, calls = lookups
+    table["svc.test"] = ["10.0.0.1"]
+    assert DNSCache().resolve("127.0.0.1", 80) == ["127.0.0.1"]
+    assert DNSCache().resolve("[::1]", 80) == ["[::1]"]
+    assert DNSCache(ttl=0).resolve("svc.test", 80) == ["svc.test"]
+    assert calls == []
+
+
+def test_invalidate_by_host_and_port(lookups, clock):
+    table, calls = lookups
+    table["svc.test"] = ["10.0.0.1"]
+    cache = DNSCache()
+    cache.resolve("svc.test", 80)
+    cache.resolve("svc.test", 443)
+    cache.invalidate("svc.test", 80)
+    assert cache.stats()["entries"] == 1
+    cache.invalidate("svc.test")
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.fixture
+def server():
+    with AsyncHTTPServer(lambda request: json_response({"ok": True})) as server:
+        yield server
+
+
+def test_connection_falls_back_to_next_address(lookups, server):
+    table, _ = lookups
+    # 127.0.0.2 上没有监听，连接被拒绝后改用下一个地址
+    table["fallback.test"] = ["127.0.0.2", "127.0.0.1"]
+    dns_cache.invalidate("fallback.test")
+    session = create_session()
+    try:
+        assert session.get(f"http://fallback.test:{server.port}/").json() == {"ok": True}
+    finally:
+        session.close()
+        dns_cache.invalidate("fallback.test")
+
+
+def test_all_addresses_failing_invalidates_entry(lookups, server):
+    table, calls = lookups
+    table["down.test"] = ["127.0.0.2", "127.0.0.3"]
+    dns_cache.invalidate("down.test")
+    session = create_session()
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get(f"http://down.test:{server.port}/")
+        assert calls == ["down.test"]
+        # 缓存的地址全部失效，下次请求重新解析
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get(f"http://down.test:{server.port}/")
+        assert calls == ["down.test", "down.test"]
+    finally:
+        session.close()
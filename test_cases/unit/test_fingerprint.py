@@ -0,0 +1,88 @@
+import json
+from types import SimpleNamespace
+
+from utils.data_loader import CaseRef, DataLoader
+from utils.fingerprint import ResultStore, _utils_imports, case_fingerprint, http_client_version, keyword_version
+
+
+def run_api(test_data):
+    pass
+
+
+def make_item(funcargs=None, **params):
+    return SimpleNamespace(callspec=SimpleNamespace(params=params), function=run_api, funcargs=funcargs or {})
+
+
+def write_cases(path, *cases):
+    path.write_text("".join(json.dumps(case, ensure_ascii=False) + "\n" for case in cases), encoding="utf-8")
+
+
+def jsonl_case(name, status=200, **expected):
+    return {"case_name": name, "keyword": "get_request", "params": {"url": "http://svc/a"},
+            "expected": {"status_code": status, **expected}}
+
+
+def test_fingerprint_changes_with_entry_only():
+    entry = {"case_name": "a", "url": "http://svc/a", "method": "GET"}
+    assert case_fingerprint(make_item(test_case=entry)) == case_fingerprint(make_item(test_case=dict(entry)))
+    assert case_fingerprint(make_item(test_case=entry)) != case_fingerprint(make_item(test_case={**entry, "method": "POST"}))
+
+
+def test_case_ref_uses_current_content_and_matches_loaded_case(tmp_path):
+    path = tmp_path / "cases.jsonl"
+    write_cases(path, jsonl_case("a"), jsonl_case("b"))
+    ref = CaseRef(str(path), 1)
+    before = case_fingerprint(make_item(test_data=ref))
+    # setup之后使用fixture读取的条目，结果与按引用读取一致
+    loaded = make_item({"test_data": DataLoader.load_case(str(path), 1)}, test_data=ref)
+    assert case_fingerprint(loaded) == before
+
+    write_cases(path, jsonl_case("a"), jsonl_case("b", status=201))
+    assert case_fingerprint(make_item(test_data=ref)) != before
+
+
+def test_schema_file_content_is_part_of_fingerprint(tmp_path):
+    schema = tmp_path / "schema.json"
+    schema.write_text('{"type": "object"}', encoding="utf-8")
+    item = make_item(test_case={"url": "/a", "method": "GET", "expected_response": {"schema": str(schema)}})
+    before = case_fingerprint(item)
+    schema.write_text('{"type": "array"}', encoding="utf-8")
+    assert case_fingerprint(item) != before
+
+
+def test_code_versions():
+    assert {"template", "cassette", "circuit_breaker"} <= _utils_imports("http_client")
+    assert http_client_version() == http_client_version()
+    assert keyword_version("get_request") and keyword_version("get_request") != keyword_version("post_request")
+    assert keyword_version("no_such_keyword") == ""
+
+
+def test_result_store_needs_run(tmp_path):
+    store = ResultStore(str(tmp_path / "results.json"))
+    assert store.needs_run("a", "f1")
+    store.update({"a": {"fingerprint": "f1", "outcome": "passed"},
+                  "b": {"fingerprint": "f1", "outcome": "failed"},
+                  "c": {"fingerprint": "f1", "outcome": "skipped"}})
+    assert not store.needs_run("a", "f1")
+    assert store.needs_run("a", "f2")
+    assert store.needs_run("b", "f1")
+    assert store.needs_run("c", "f1")
+
+
+def test_result_store_merges_updates_from_other_processes(tmp_path):
+    path = str(tmp_path / "results.json")
+    first, second = ResultStore(path), ResultStore(path)
+    first.update({"a": {"fingerprint": "f1", "outcome": "passed"}})
+    second.update({"b": {"fingerprint": "f2", "outcome": "failed"}})
+    records = ResultStore(path).records
+    assert sorted(records) == ["a", "b"]
+    assert records["b"]["outcome"] == "failed" and "time" in records["b"]
+    # 再次执行通过后覆盖上次的失败记录
+    first.update({"b": {"fingerprint": "f2", "outcome": "passed"}})
+    assert not ResultStore(path).needs_run("b", "f2")
+
+
+def test_result_store_ignores_corrupt_file(tmp_path):
+    path = tmp_path / "results.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert ResultStore(str(path)).records == {}
@@ -0,0 +1,28 @@
+import pytest
+
+from utils.http_client import HTTPClient
+from utils.loopback_server import start_httpbin
+
+
+@pytest.fixture(scope="module")
+def httpbin():
+    server = start_httpbin()
+    yield server.base_url
+    server.stop()
+
+
+def test_form_body_is_sent_as_form(httpbin):
+    response = HTTPClient().send_request({
+        "method": "POST",
+        "url": f"{httpbin}/post",
+        "headers": {"content-type": "application/x-www-form-urlencoded"},
+        "body": {"username": "张三", "password": "test123"},
+    })
+    data = response.json()
+    assert data["form"] == {"username": "张三", "password": "test123"}
+    assert data["json"] is None
+
+
+def test_json_body_by_default(httpbin):
+    response = HTTPClient().send_request({"method": "PUT", "url": f"{httpbin}/put", "body": {"a": [1, 2]}})
+    assert response.json()["json"] == {"a": [1, 2]}
@@ -0,0 +1,37 @@
+import pytest
+
+from utils.response_view import _JsonPath, _SimplePath, compile_jsonpath
+
+DATA = {
+    "body": {"args": {"name": "a"}, "items": [{"id": 1}, {"id": 2}], "0": "key"},
+    "status_code": 200,
+}
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("$.body.args.name", ["a"]),
+    ("$.body.items[1].id", [2]),
+    ("$.status_code", [200]),
+    ("$.body.missing", []),
+    ("$.body.items[5].id", []),
+    ("$.body.args[0]", []),
+    ("$.body.items.id", []),
+])
+def test_simple_path_matches_jsonpath_ng(expr, expected):
+    compiled = compile_jsonpath(expr)
+    assert isinstance(compiled, _SimplePath)
+    assert compiled.find(DATA) == expected
+    assert _JsonPath(expr).find(DATA) == expected
+
+
+def test_complex_expressions_use_jsonpath_ng():
+    compiled = compile_jsonpath("$.body.items[*].id")
+    assert isinstance(compiled, _JsonPath)
+    assert compiled.find(DATA) == [1, 2]
+    assert compiled.fields == ("body", "headers", "status_code")
+    assert compile_jsonpath("$.body.items[0:1]").fields == ("body",)
+
+
+def test_compiled_paths_are_cached():
+    assert compile_jsonpath("$.body.args.name") is compile_jsonpath("$.body.args.name")
+    assert compile_jsonpath("$.body.args.name").root_field == "body"
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.load_test import LatencyHistogram, LoadRunner, load_cases, parse_duration
+from utils.loopback_server import AsyncHTTPServer
+
+
+def test_histogram_buckets_bound_every_value():
+    histogram = LatencyHistogram(precision_bits=7)
+    for value in (0, 1, 63, 127, 128, 129, 1000, 123_456, 10_000_000):
+        index = histogram._index(value)
+        lower, upper = histogram._lower_bound(index), histogram._upper_bound(index)
+        assert lower <= value <= upper
+        # 相对误差不超过 1/2^(precision_bits-1)
+        assert upper - lower <= max(0, lower) / 64
+    # 小于2^precision_bits的值每个值一个桶
+    assert [histogram._index(v) for v in range(128)] == list(range(128))
+
+
+def test_histogram_percentiles_and_summary():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    for q, expected in ((50, 500), (90, 900), (99, 990), (99.9, 999)):
+        assert histogram.percentile(q) == pytest.approx(expected, rel=1 / 64)
+    summary = histogram.summary()
+    assert summary["min"] == 1.0 and summary["max"] == 1000.0
+    assert summary["mean"] == pytest.approx(500.5)
+    assert set(summary) == {"p50", "p90", "p99", "p99.9", "min", "max", "mean"}
+    assert LatencyHistogram().percentile(50) == 0.0
+
+
+def test_histogram_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(0.001)
+    second.record(0.5)
+    first.merge(second)
+    assert first.count == 2 and first.max == 500_000
+    assert first.percentile(100) == pytest.approx(500, rel=1 / 64)
+    with pytest.raises(ValueError):
+        first.merge(LatencyHistogram(precision_bits=5))
+
+
+def test_parse_duration():
+    assert parse_duration("500ms") == 0.5
+    assert parse_duration("2m") == 120
+    assert parse_duration("3") == 3
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+
+def test_keyword_method_comes_from_keyword_metadata(tmp_path):
+    (tmp_path / "cases.yaml").write_text(
+        "- case_name: get\n"
+        "  keyword: get_request\n"
+        "  params: {url: 'http://svc/a'}\n"
+        "- case_name: verify\n"
+        "  keyword: verify_status_code\n"
+        "  params: {expected_code: 200}\n"
+        "- case_name: put\n"
+        "  keyword: put_request\n"
+        "  params: {url: 'http://svc/b', data: {a: 1}}\n",
+        encoding="utf-8",
+    )
+    cases = load_cases([str(tmp_path)])
+    assert [(case.name, case.endpoint) for case in cases] == [
+        ("cases.yaml::get", "GET http://svc/a"), ("cases.yaml::put", "PUT http://svc/b")]
+
+
+@pytest.fixture
+def slow_server():
+    arrivals = []
+
+    async def handler(request):
+        arrivals.append(time.perf_counter())
+        await asyncio.sleep(0.1)
+        return 200, {"Content-Type": "application/json"}, b"{}"
+
+    with AsyncHTTPServer(handler) as server:
+        yield server, arrivals
+
+
+def slow_cases(server, tmp_path):
+    (tmp_path / "slow.yaml").write_text(
+        f"- case_name: slow\n  method: GET\n  url: '{server.base_url}/slow'\n"
+        "  expected_response: {status_code: 200}\n",
+        encoding="utf-8",
+    )
+    return load_cases([str(tmp_path / "slow.yaml")])
+
+
+def test_open_loop_arrivals_keep_schedule_when_target_is_slow(slow_server, tmp_path):
+    server, arrivals = slow_server
+    report = LoadRunner(slow_cases(server, tmp_path), rps=20, duration=0.5, max_workers=20).run()
+    assert report["total"]["requests"] == 10 and report["total"]["errors"] == 0
+    # 每个请求耗时100ms，闭环执行需要1s；开环时按50ms的间隔发出
+    assert arrivals[-1] - arrivals[0] < 0.7
+    assert report["total"]["latency_ms"]["min"] >= 100
+
+
+def test_queueing_delay_counts_from_scheduled_time(slow_server, tmp_path):
+    server, _ = slow_server
+    report = LoadRunner(slow_cases(server, tmp_path), rps=20, duration=0.5, max_workers=1).run()
+    # 只有一个worker时请求排队，最后一个请求计划在450ms发出，实际约在900ms之后才发出
+    assert report["total"]["latency_ms"]["max"] >= 500
@@ -0,0 +1,18 @@
+import socket
+
+import pytest
+
+from utils.loopback_server import AsyncHTTPServer
+
+
+def test_start_raises_when_port_is_in_use():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        server = AsyncHTTPServer(lambda request: (200, {}, b""), port=sock.getsockname()[1])
+        with pytest.raises(OSError):
+            server.start()
+    # 端口释放后同一个实例可以重新启动
+    server.port = 0
+    with server:
+        assert server.port
@@ -0,0 +1,71 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from utils.parse_cache import ParseCache
+
+
+def test_entries_are_stored_as_json_and_reused(tmp_path):
+    data_file = tmp_path / "cases.json"
+    data_file.write_text(json.dumps([{"case_name": "a"}]), encoding="utf-8")
+    first = ParseCache(str(tmp_path / "cache"))
+    result = first.load(str(data_file), json.loads, kind=".json")
+    result[0]["case_name"] = "changed"
+    assert first.load(str(data_file), json.loads, kind=".json") == [{"case_name": "a"}]
+
+    names = os.listdir(first.cache_dir)
+    assert len(names) == 1 and names[0].endswith(".json")
+
+    second = ParseCache(str(tmp_path / "cache"))
+    assert second.load(str(data_file), json.loads, kind=".json") == [{"case_name": "a"}]
+    assert second.stats()["misses"] == 0
+
+
+def test_corrupted_entry_is_reparsed(tmp_path):
+    data_file = tmp_path / "cases.json"
+    data_file.write_text("[1]", encoding="utf-8")
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.load(str(data_file), json.loads)
+    entry = os.path.join(cache.cache_dir, os.listdir(cache.cache_dir)[0])
+    with open(entry, "a", encoding="utf-8") as f:
+        f.write("garbage")
+    assert ParseCache(str(tmp_path / "cache")).load(str(data_file), json.loads) == [1]
+
+
+def test_non_json_results_are_cached_in_memory_only(tmp_path):
+    data_file = tmp_path / "cases.yaml"
+    data_file.write_text("- {1: 2020-01-01}\n", encoding="utf-8")
+    cache = ParseCache(str(tmp_path / "cache"))
+    result = cache.load(str(data_file), yaml.safe_load)
+    assert list(result[0]) == [1]
+    assert cache.load(str(data_file), yaml.safe_load) == result
+    assert cache.stats()["misses"] == 1
+    assert not os.path.isdir(cache.cache_dir) or not os.listdir(cache.cache_dir)
+
+
+def test_counters_are_exact_under_concurrent_loads(tmp_path):
+    data_file = tmp_path / "cases.json"
+    data_file.write_text("[1]", encoding="utf-8")
+    cache = ParseCache(str(tmp_path / "cache"))
+
+    def load(_):
+        for _ in range(200):
+            cache.load(str(data_file), json.loads)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(load, range(8)))
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 1600
+    assert stats["misses"] >= 1
+
+
+def test_clear_removes_memory_and_disk_entries(tmp_path):
+    data_file = tmp_path / "cases.json"
+    data_file.write_text("[1]", encoding="utf-8")
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.load(str(data_file), json.loads)
+    cache.clear()
+    assert os.listdir(cache.cache_dir) == []
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,73 @@
+import socket
+
+import pytest
+
+from utils.base_url import remove_override, set_override
+from utils.loopback_server import AsyncHTTPServer, json_response
+from utils.prewarm import collect_origins, iter_urls, origin_of, prewarm, prewarm_case_files
+
+
+def test_iter_urls_finds_nested_url_fields():
+    data = [
+        {"url": "https://a.test/x", "params": {"url": "http://b.test"}},
+        {"keyword": "get_request", "params": {"url": "http://c.test:8080/y"}},
+        {"url": 1, "steps": ({"url": "http://d.test"},)},
+    ]
+    assert list(iter_urls(data)) == ["https://a.test/x", "http://b.test", "http://c.test:8080/y", "http://d.test"]
+
+
+def test_origin_of():
+    assert origin_of("https://a.test/path?q=1") == "https://a.test"
+    assert origin_of("http://c.test:8080/y") == "http://c.test:8080"
+    # 主机名中有模板变量、相对路径和非HTTP协议的地址都不预热
+    assert origin_of("https://{host}/users") == ""
+    assert origin_of("/users") == ""
+    assert origin_of("ftp://a.test/file") == ""
+
+
+def test_origin_of_applies_base_url_overrides():
+    set_override("https://svc.test", "http://127.0.0.1:9")
+    try:
+        assert origin_of("https://svc.test/users/1") == "http://127.0.0.1:9"
+    finally:
+        remove_override("https://svc.test")
+
+
+def test_collect_origins_scans_directories(tmp_path):
+    (tmp_path / "cases.yaml").write_text(
+        "- case_name: a\n  method: GET\n  url: https://a.test/x\n"
+        "- case_name: b\n  keyword: get_request\n  params: {url: 'http://b.test/y'}\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "more.json").write_text('[{"url": "https://a.test/z"}]', encoding="utf-8")
+    (tmp_path / "broken.yaml").write_text("- [unclosed", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("url: http://ignored.test", encoding="utf-8")
+    assert collect_origins([str(tmp_path)]) == ["http://b.test", "https://a.test"]
+
+
+@pytest.fixture
+def server():
+    with AsyncHTTPServer(lambda request: json_response({})) as server:
+        yield server
+
+
+def test_prewarm_opens_connections_and_reports_failures(server):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed_port = sock.getsockname()[1]
+    closed = f"http://127.0.0.1:{closed_port}"
+
+    results = prewarm([server.base_url, closed], connections_per_host=2)
+    assert results[server.base_url]["connections"] == 2
+    assert "error" not in results[server.base_url]
+    assert results[closed]["connections"] == 0 and results[closed]["error"]
+    # 连接已在池中，再次预热不需要新建
+    assert prewarm([server.base_url], connections_per_host=2)[server.base_url]["connections"] == 0
+
+
+def test_prewarm_case_files_includes_extra_urls(server, tmp_path):
+    (tmp_path / "cases.yaml").write_text(f"- url: '{server.base_url}/a'\n", encoding="utf-8")
+    results = prewarm_case_files([str(tmp_path)], extra_urls=[f"{server.base_url}/b", "/relative"])
+    assert list(results) == [server.base_url]
+    assert prewarm([]) == {}
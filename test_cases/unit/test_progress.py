@@ -0,0 +1,74 @@
+import io
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from utils import progress
+from utils.progress import EventLog, ProgressTracker, stream_process
+
+
+def feed(tracker, text):
+    for line in text.splitlines(keepends=True):
+        tracker.feed(line)
+
+
+def test_tracker_counts_collection_and_outcomes():
+    stream = io.StringIO()
+    tracker = ProgressTracker(stream)
+    feed(tracker, (
+        "collected 10 items / 4 deselected / 6 selected\n"
+        "test_a.py::test_x[case-1] PASSED                     [ 16%]\n"
+        "test_a.py::test_x[case-2] \n"
+        "2024-01-01 00:00:00 [INFO] 请求URL: http://svc/PASSED\n"
+        "FAILED                                               [ 33%]\n"
+        "test_a.py::test_y SKIPPED (no data)                  [ 50%]\n"
+        "test_a.py::test_z XFAIL\n"
+        "test_a.py::test_w ERROR\n"
+        "==== 1 failed, 1 passed in 0.1s ====\n"
+    ))
+    snapshot = tracker.snapshot()
+    assert snapshot["total"] == 6
+    assert (snapshot["passed"], snapshot["failed"], snapshot["skipped"], snapshot["error"]) == (1, 1, 1, 1)
+    assert snapshot["remaining"] == 2
+    # 非终端输出时原样转发每一行，不插入进度行
+    assert stream.getvalue().count("\n") == 9 and "进度" not in stream.getvalue()
+
+
+def test_tracker_totals_without_selection_and_across_shards():
+    tracker = ProgressTracker(io.StringIO())
+    tracker.feed("collected 5 items\n")
+    tracker.feed("collected 3 items / 1 deselected\n")
+    assert tracker.total == 7
+    assert tracker.snapshot()["eta"] is None
+    assert tracker.render().startswith("进度 0/7")
+
+
+def test_stream_process_returns_code_and_bounded_tail(monkeypatch):
+    monkeypatch.setattr(progress, "TAIL_LINES", 3)
+    stream = io.StringIO()
+    code = "import sys\nfor i in range(10): print(i)\nprint('err', file=sys.stderr)\nsys.exit(2)"
+    returncode, tail = stream_process([sys.executable, "-c", code], ProgressTracker(stream))
+    assert returncode == 2
+    assert tail == "8\n9\nerr\n"
+    # 全部输出都已逐行转发
+    assert stream.getvalue().splitlines() == [str(i) for i in range(10)] + ["err"]
+
+
+def test_event_log_writes_one_json_object_per_line(tmp_path):
+    path = tmp_path / "events.jsonl"
+    log = EventLog(str(path))
+    log.emit("session_start", total=2)
+    log.emit("test_finish", nodeid="test_a.py::test_x[用例]", outcome="passed", path=Path("/tmp/x"))
+    # 写入后立即可读，不需要等到关闭
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    log.close()
+    log.emit("ignored_after_close")
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    events = [json.loads(line) for line in lines]
+    assert [event["event"] for event in events] == ["session_start", "test_finish"]
+    assert events[0]["total"] == 2
+    assert events[1]["path"] == "/tmp/x"
+    assert "用例" in lines[1]
+    datetime.fromisoformat(events[0]["time"])
@@ -0,0 +1,57 @@
+import os
+import time
+
+import pytest
+
+from utils.rate_limiter import RateLimiter, TokenBucket
+
+
+def test_bucket_allows_burst_then_paces(tmp_path):
+    bucket = TokenBucket(str(tmp_path / "b.bucket"), rate=10, burst=2)
+    assert bucket._reserve() == 0.0
+    assert bucket._reserve() == 0.0
+    assert bucket._reserve() == pytest.approx(0.1, abs=0.02)
+    # 第二个等待者排在第一个之后
+    assert bucket._reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_bucket_refills_over_time(tmp_path):
+    bucket = TokenBucket(str(tmp_path / "b.bucket"), rate=50, burst=1)
+    assert bucket._reserve() == 0.0
+    time.sleep(0.05)
+    assert bucket._reserve() == pytest.approx(0.0, abs=0.01)
+
+
+def test_bucket_state_is_shared_through_file(tmp_path):
+    path = str(tmp_path / "b.bucket")
+    assert TokenBucket(path, rate=1, burst=1)._reserve() == 0.0
+    assert TokenBucket(path, rate=1, burst=1)._reserve() > 0.9
+
+
+def test_invalid_rate(tmp_path):
+    with pytest.raises(ValueError):
+        TokenBucket(str(tmp_path / "b.bucket"), rate=0, burst=1)
+
+
+def test_rule_matching(tmp_path):
+    limiter = RateLimiter.from_config({"rules": [
+        {"host": "api.example.com", "route": "/orders/*", "methods": ["post"], "rate": 1},
+        {"host": "*.example.com", "rate": 5},
+    ]}, str(tmp_path))
+    orders = limiter.bucket_for("POST", "https://api.example.com/orders/1")
+    assert orders.rate == 1
+    assert limiter.bucket_for("GET", "https://api.example.com/orders/1").rate == 5
+    assert limiter.bucket_for("GET", "http://localhost/orders/1") is None
+    # 同一规则下每个主机单独计数
+    assert limiter.bucket_for("GET", "https://a.example.com/") is not limiter.bucket_for("GET", "https://b.example.com/")
+    assert limiter.bucket_for("POST", "https://api.example.com/orders/2") is orders
+    with pytest.raises(ValueError):
+        RateLimiter.from_config({"rules": [{"host": "x"}]})
+
+
+def test_state_is_per_process_without_file_locks(tmp_path, monkeypatch):
+    from utils import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "LOCKING_SUPPORTED", False)
+    limiter = RateLimiter([], str(tmp_path))
+    assert limiter.state_dir == str(tmp_path / f"pid-{os.getpid()}")
@@ -0,0 +1,62 @@
+import json
+import os
+
+from utils import report_aggregator
+from utils.report_aggregator import ReportAggregator
+
+
+def write_result(directory, name, status="passed", mtime_ns=None, content=None):
+    path = directory / f"{name}-result.json"
+    path.write_text(content if content is not None else json.dumps(
+        {"name": name, "status": status, "start": 0, "stop": 10}), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_incremental_update_keeps_only_a_watermark(tmp_path):
+    results = tmp_path / "results"
+    results.mkdir()
+    write_result(results, "a", mtime_ns=1_000)
+    write_result(results, "b", "failed", mtime_ns=2_000)
+    aggregator = ReportAggregator(results, tmp_path / "summary")
+    assert aggregator.update() == 2
+    assert aggregator.summary["watermark"] == {"mtime_ns": 2_000, "names": ["b-result.json"]}
+
+    # 与高水位同一时间写入的新文件也会被处理
+    write_result(results, "c", mtime_ns=2_000)
+    write_result(results, "d", "broken", mtime_ns=3_000)
+    aggregator = ReportAggregator(results, tmp_path / "summary")
+    assert aggregator.update() == 2
+    assert aggregator.update() == 0
+    summary = ReportAggregator(results, tmp_path / "summary").summary
+    assert summary["total"] == 4
+    assert summary["statuses"]["failed"] == 1 and summary["statuses"]["broken"] == 1
+    assert "processed" not in summary
+
+
+def test_incomplete_file_blocks_watermark_until_written(tmp_path, monkeypatch):
+    results = tmp_path / "results"
+    results.mkdir()
+    write_result(results, "a", mtime_ns=1_000)
+    partial = write_result(results, "b", mtime_ns=2_000, content='{"name": ')
+    write_result(results, "c", mtime_ns=3_000)
+    monkeypatch.setattr(report_aggregator.time, "time_ns", lambda: 2_500)
+    aggregator = ReportAggregator(results, tmp_path / "summary")
+    assert aggregator.update() == 1
+    assert aggregator.summary["watermark"]["mtime_ns"] == 1_000
+
+    write_result(results, "b", mtime_ns=2_000)
+    assert aggregator.update() == 2
+    assert aggregator.summary["total"] == 3
+    assert partial.exists()
+
+
+def test_stale_invalid_file_is_skipped(tmp_path):
+    results = tmp_path / "results"
+    results.mkdir()
+    write_result(results, "a", mtime_ns=1_000, content="not json")
+    write_result(results, "b", mtime_ns=2_000)
+    aggregator = ReportAggregator(results, tmp_path / "summary")
+    assert aggregator.update() == 1
+    assert aggregator.summary["total"] == 1
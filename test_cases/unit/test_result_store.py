@@ -0,0 +1,47 @@
+import json
+import os
+
+from utils.result_store import ResultStore
+
+
+def make_run(results_dir, name, attachment, mtime):
+    run_dir = results_dir / name
+    run_dir.mkdir(parents=True)
+    (run_dir / f"{name}-result.json").write_text(json.dumps({"name": name, "status": "passed"}), encoding="utf-8")
+    (run_dir / f"{name}-attachment.txt").write_bytes(attachment)
+    os.utime(run_dir, (mtime, mtime))
+    return run_dir
+
+
+def test_size_retention_ignores_blobs_still_linked_from_run_dirs(tmp_path):
+    results = tmp_path / "allure-results"
+    shared = os.urandom(64 * 1024)
+    for i, attachment in enumerate([os.urandom(64 * 1024), os.urandom(64 * 1024), shared, shared]):
+        make_run(results, f"run{i}", attachment, 1_000_000 + i)
+    store = ResultStore(results, tmp_path / "store")
+    store.dedup(results / "run2")
+    store.dedup(results / "run3")
+    store.apply_retention(keep=2)
+    index = store._read_index()
+    assert sorted(index) == ["run0", "run1"]
+
+    # 两个归档加上各自独占的附件约130KB；run2/run3目录中的附件仍被硬链接，不计入也不回收
+    store.apply_retention(keep=2, max_size_mb=0.1)
+    assert sorted(store._read_index()) == ["run1"]
+    assert len(list(store.blobs_dir.glob("*/*"))) == 2
+    assert (results / "run3" / "run3-attachment.txt").read_bytes() == shared
+
+    store.apply_retention(keep=2, max_size_mb=0)
+    assert store._read_index() == {}
+    assert len(list(store.blobs_dir.glob("*/*"))) == 1
+
+
+def test_archive_can_be_restored(tmp_path):
+    results = tmp_path / "allure-results"
+    make_run(results, "run0", b"body", 1_000_000)
+    make_run(results, "run1", b"body", 1_000_001)
+    store = ResultStore(results, tmp_path / "store")
+    store.apply_retention(keep=1)
+    restored = store.restore("run0", tmp_path / "restored")
+    assert (restored / "run0-attachment.txt").read_bytes() == b"body"
+    assert [run["name"] for run in store.runs()] == ["run1", "run0"]
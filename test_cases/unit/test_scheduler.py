@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.dependency import CaseGraph
+from utils.scheduler import DurationStore, case_key, lpt_schedule, lpt_schedule_units, parse_shard
+
+
+def test_lpt_assigns_longest_first_to_least_loaded():
+    estimates = [5, 4, 3, 3, 2, 1]
+    assignment = lpt_schedule(estimates, 2)
+    assert sorted(i for shard in assignment for i in shard) == list(range(len(estimates)))
+    loads = [sum(estimates[i] for i in shard) for shard in assignment]
+    assert sorted(loads) == [9, 9]
+    for shard in assignment:
+        assert [estimates[i] for i in shard] == sorted((estimates[i] for i in shard), reverse=True)
+
+
+def test_lpt_is_deterministic_and_handles_more_workers_than_cases():
+    assert lpt_schedule([1, 1, 1], 2) == lpt_schedule([1, 1, 1], 2) == [[0, 2], [1]]
+    assert lpt_schedule([2], 3) == [[0], [], []]
+    with pytest.raises(ValueError):
+        lpt_schedule([1], 0)
+
+
+def test_dependency_chain_stays_in_one_shard_in_order():
+    graph = CaseGraph([
+        {"case_name": "login", "method": "GET", "url": "/login", "extract": {"token": "$.body.token"}},
+        {"case_name": "slow", "method": "GET", "url": "/delay/5"},
+        {"case_name": "profile", "method": "GET", "url": "/profile?t={token}"},
+        {"case_name": "orders", "method": "GET", "url": "/orders?t={token}"},
+    ])
+    estimates = [0.1, 5.0, 3.0, 2.0]
+    # 逐个调度时消费者会和生产者分到不同分片，且生产者排在最后
+    plain = lpt_schedule(estimates, 2)
+    assert not any({0, 2} <= set(shard) for shard in plain)
+    assignment = lpt_schedule_units(graph.chains, estimates, 2)
+    assert sorted(assignment) == [[0, 2, 3], [1]]
+    assert sorted(i for shard in assignment for i in shard) == list(range(4))
+
+
+def test_parse_shard():
+    assert parse_shard("1/3") == (1, 3)
+    for spec in ("3/3", "-1/2", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_duration_store(tmp_path):
+    path = str(tmp_path / "durations.json")
+    store = DurationStore(path)
+    assert store.estimates(["a", "b"]) == [1.0, 1.0]
+    store.update({"a": 2.0, "b": 4.0, "c": 6.0})
+    store.update({"a": 4.0})
+    reloaded = DurationStore(path)
+    assert reloaded.records["a"] == {"avg": 3.0, "last": 4.0, "runs": 2}
+    # 没有记录的用例取已知耗时的中位数
+    assert reloaded.estimates(["a", "b", "new"]) == [3.0, 4.0, 4.0]
+
+
+def test_case_key_separates_test_functions():
+    def item(function, case_name):
+        return SimpleNamespace(nodeid=f"test_a.py::TestA::{function}[{case_name}]",
+                               callspec=SimpleNamespace(params={"test_data": {"case_name": case_name}}))
+
+    assert case_key(item("test_json", "get")) == "test_a.py::TestA::test_json::get"
+    assert case_key(item("test_json", "get")) != case_key(item("test_csv", "get"))
@@ -0,0 +1,148 @@
+import json
+import os
+
+import pytest
+
+from utils.data_loader import DataLoader
+from utils.schema_validator import SchemaError, compile_schema, schema_errors
+
+
+def errors_of(schema, instance):
+    return schema_errors(compile_schema(schema), instance)
+
+
+@pytest.mark.parametrize("schema, valid, invalid", [
+    ({"type": "integer"}, [1, -3], [1.5, True, "1", None]),
+    ({"type": "number"}, [1, 1.5], [False, "1"]),
+    ({"type": "boolean"}, [True, False], [0, 1]),
+    ({"type": ["string", "null"]}, ["a", None], [0, []]),
+])
+def test_type(schema, valid, invalid):
+    for value in valid:
+        assert errors_of(schema, value) == []
+    for value in invalid:
+        assert errors_of(schema, value), value
+
+
+def test_enum_and_const_distinguish_booleans_from_numbers():
+    assert errors_of({"enum": [1, 0]}, True)
+    assert errors_of({"enum": [1, 0]}, False)
+    assert errors_of({"enum": [True]}, 1)
+    assert errors_of({"const": 1}, True)
+    assert errors_of({"const": False}, 0)
+    assert errors_of({"enum": [1, "a", None]}, 1) == []
+    assert errors_of({"enum": [1]}, 1.0) == []
+    assert errors_of({"const": {"a": [1, True]}}, {"a": [1.0, True]}) == []
+    assert errors_of({"const": {"a": [1, True]}}, {"a": [True, True]})
+
+
+def test_unique_items_distinguishes_booleans_from_numbers():
+    schema = {"type": "array", "uniqueItems": True}
+    assert errors_of(schema, [1, True, 0, False]) == []
+    assert errors_of(schema, [1, 1.0]) == ["/1: 元素重复"]
+
+
+def test_object_keywords():
+    schema = {
+        "type": "object",
+        "required": ["id"],
+        "properties": {"id": {"type": "integer"}},
+        "patternProperties": {"^x-": {"type": "string"}},
+        "additionalProperties": False,
+    }
+    assert errors_of(schema, {"id": 1, "x-tag": "a"}) == []
+    errors = errors_of(schema, {"x-tag": 1, "other": 2})
+    assert "/id: 缺少必需字段" in errors
+    assert any(e.startswith("/x-tag:") for e in errors)
+    assert "/other: 不允许出现该值" in errors
+
+
+def test_scalar_bounds_and_strings():
+    assert errors_of({"minimum": 1, "exclusiveMaximum": 3}, 2) == []
+    assert errors_of({"minimum": 1}, 0)
+    assert errors_of({"exclusiveMaximum": 3}, 3)
+    assert errors_of({"minLength": 2, "pattern": "^a"}, "ab") == []
+    assert errors_of({"minLength": 2}, "a")
+    assert errors_of({"pattern": "^a"}, "ba")
+
+
+def test_combinators():
+    one_of = {"oneOf": [{"type": "integer"}, {"minimum": 0}]}
+    assert errors_of(one_of, -1) == []
+    assert errors_of(one_of, 1)
+    assert errors_of({"anyOf": [{"type": "string"}, {"type": "null"}]}, 1)
+    assert errors_of({"not": {"type": "string"}}, "a")
+    assert errors_of({"allOf": [{"type": "integer"}, {"minimum": 5}]}, 6) == []
+
+
+def test_local_and_file_refs(tmp_path):
+    (tmp_path / "common.json").write_text(json.dumps({
+        "definitions": {"id": {"type": "integer", "minimum": 1}}
+    }), encoding="utf-8")
+    schema = {
+        "type": "object",
+        "properties": {
+            "id": {"$ref": "common.json#/definitions/id"},
+            "children": {"type": "array", "items": {"$ref": "#"}},
+        },
+    }
+    validator = compile_schema(schema, str(tmp_path))
+    assert schema_errors(validator, {"id": 1, "children": [{"id": 2, "children": []}]}) == []
+    assert schema_errors(validator, {"id": 1, "children": [{"id": 0}]})
+
+
+def test_invalid_schema():
+    with pytest.raises(SchemaError):
+        compile_schema({"type": "decimal"})
+
+
+def test_streaming_array_matches_decoded_validation():
+    validator = compile_schema({"type": "array", "items": {"type": "integer"}, "maxItems": 3})
+    assert hasattr(validator, "stream")
+    text = json.dumps([1, "a", 3, 4])
+    assert sorted(schema_errors(validator, text=text)) == sorted(schema_errors(validator, json.loads(text)))
+
+
+def test_max_errors_stops_early():
+    validator = compile_schema({"type": "array", "items": {"type": "string"}})
+    errors = schema_errors(validator, list(range(100)), max_errors=5)
+    assert len(errors) == 6
+
+
+def _write(path, schema, mtime_ns):
+    path.write_text(json.dumps(schema), encoding="utf-8")
+    # 同一时间片内连续写入时修改时间可能不变，显式设置
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_edited_schema_file_is_recompiled(tmp_path):
+    schema_file = tmp_path / "user.json"
+    _write(schema_file, {"type": "integer"}, 1_000_000_000)
+    assert schema_errors(compile_schema(str(schema_file)), "a")
+
+    _write(schema_file, {"type": "string"}, 2_000_000_000)
+    assert schema_errors(compile_schema(str(schema_file)), "a") == []
+
+
+def test_edited_referenced_file_invalidates_referencing_schema(tmp_path):
+    _write(tmp_path / "common.json", {"definitions": {"id": {"type": "integer"}}}, 1_000_000_000)
+    _write(tmp_path / "user.json", {"properties": {"id": {"$ref": "common.json#/definitions/id"}}}, 1_000_000_000)
+    inline = {"properties": {"id": {"$ref": "common.json#/definitions/id"}}}
+    assert schema_errors(compile_schema(str(tmp_path / "user.json")), {"id": "a"})
+    assert schema_errors(compile_schema(inline, str(tmp_path)), {"id": "a"})
+
+    _write(tmp_path / "common.json", {"definitions": {"id": {"type": "string"}}}, 2_000_000_000)
+    assert schema_errors(compile_schema(str(tmp_path / "user.json")), {"id": "a"}) == []
+    assert schema_errors(compile_schema(inline, str(tmp_path)), {"id": "a"}) == []
+
+
+def test_unchanged_schema_file_reuses_compiled_validator(tmp_path):
+    _write(tmp_path / "user.json", {"type": "object"}, 1_000_000_000)
+    assert compile_schema(str(tmp_path / "user.json")) is compile_schema(str(tmp_path / "user.json"))
+
+
+def test_load_schema_returns_a_new_object_each_time(tmp_path):
+    _write(tmp_path / "user.json", {"type": "object", "required": ["id"]}, 1_000_000_000)
+    schema = DataLoader.load_schema(str(tmp_path / "user.json"))
+    schema["required"].append("name")
+    assert DataLoader.load_schema(str(tmp_path / "user.json")) == {"type": "object", "required": ["id"]}
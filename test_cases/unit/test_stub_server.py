@@ -0,0 +1,96 @@
+import json
+
+from utils.loopback_server import Request
+from utils.stub_server import RouteTable, compile_routes
+
+
+def body_of(response):
+    return json.loads(response[2])
+
+
+def test_exact_and_template_routes():
+    table = RouteTable()
+    table.add("GET", "http://svc/users", {}, (200, {}, b'{"list": true}'))
+    table.add("GET", "http://svc/users/{id}", {}, (200, {}, b'{"user": 1}'))
+    table.add("GET", "http://svc/users/me", {}, (200, {}, b'{"me": 1}'))
+    assert body_of(table.match("GET", "/users", "")) == {"list": True}
+    assert body_of(table.match("GET", "/users/42", "")) == {"user": 1}
+    assert body_of(table.match("GET", "/users/me", "")) == {"me": 1}
+    assert body_of(table.match("HEAD", "/users", "")) == {"list": True}
+    assert table.match("POST", "/users", "") is None
+    assert table.match("GET", "/orders", "") is None
+    assert table.hosts == {"http://svc"}
+
+
+def test_query_parameters_select_route():
+    table = RouteTable()
+    table.add("GET", "http://svc/search?q=a", {}, (200, {}, b'{"q": "a"}'))
+    table.add("GET", "http://svc/search", {"q": "b", "page": 1}, (200, {}, b'{"q": "b"}'))
+    assert body_of(table.match("GET", "/search", "q=a")) == {"q": "a"}
+    assert body_of(table.match("GET", "/search", "page=1&q=b")) == {"q": "b"}
+    assert table.match("GET", "/search", "q=c") is None
+
+
+def test_query_fallback_is_opt_in():
+    for fallback, expected in ((False, None), (True, {"q": "a"})):
+        table = RouteTable(query_fallback=fallback)
+        table.add("GET", "http://svc/search?q=a", {}, (200, {}, b'{"q": "a"}'))
+        response = table.match("GET", "/search", "q=other")
+        assert (response and body_of(response)) == expected
+
+
+def test_template_query_value_matches_any_value():
+    table = RouteTable()
+    table.add("GET", "http://svc/users", {"id": "{user_id}"}, (200, {}, b'{"user": 1}'))
+    assert body_of(table.match("GET", "/users", "id=7")) == {"user": 1}
+    assert table.match("GET", "/users", "") is None
+
+
+def test_routes_are_keyed_by_host():
+    table = RouteTable()
+    table.add("GET", "http://users-svc/users", {}, (200, {}, b'{"svc": "users"}'))
+    table.add("GET", "http://admin-svc:8080/users", {}, (200, {}, b'{"svc": "admin"}'))
+    table.add("GET", "http://admin-svc:8080/audit", {}, (200, {}, b'{"svc": "audit"}'))
+    assert body_of(table.match("GET", "/users", "", "users-svc")) == {"svc": "users"}
+    assert body_of(table.match("GET", "/users", "", "admin-svc:8080")) == {"svc": "admin"}
+    # 无法确定主机时只返回唯一的匹配
+    assert table.match("GET", "/users", "") is None
+    assert body_of(table.match("GET", "/audit", "")) == {"svc": "audit"}
+
+    overrides = table.overrides("http://127.0.0.1:9000/")
+    assert overrides == {
+        "http://admin-svc:8080": "http://127.0.0.1:9000/_host/admin-svc:8080",
+        "http://users-svc": "http://127.0.0.1:9000/_host/users-svc",
+    }
+    by_prefix = Request("GET", "/_host/admin-svc:8080/users", {"Host": "127.0.0.1:9000"}, b"", "")
+    by_header = Request("GET", "/users", {"Host": "users-svc"}, b"", "")
+    assert body_of(table(by_prefix)) == {"svc": "admin"}
+    assert body_of(table(by_header)) == {"svc": "users"}
+    assert table(Request("GET", "/users", {"Host": "127.0.0.1:9000"}, b"", ""))[0] == 404
+
+
+def test_duplicates_keep_first_described_response():
+    table = RouteTable()
+    table.add("GET", "/a", {}, (200, {}, b'{}'))
+    table.add("GET", "/a", {}, (200, {}, b'{"x": 1}'))
+    table.add("GET", "/a", {}, (200, {}, b'{"x": 2}'))
+    assert body_of(table.match("GET", "/a", "")) == {"x": 1}
+    assert (table.count, table.duplicates) == (1, 2)
+
+
+def test_compile_routes_from_case_file(tmp_path):
+    (tmp_path / "cases.yaml").write_text(
+        "- case_name: get\n"
+        "  method: GET\n"
+        "  url: http://svc/users/{id}\n"
+        "  expected_response:\n"
+        "    status_code: 201\n"
+        "    body:\n"
+        "      user.name: {$type: string}\n"
+        "      count: {$gt: 1}\n",
+        encoding="utf-8",
+    )
+    table = compile_routes([str(tmp_path)])
+    status, headers, body = table.match("GET", "/users/1", "")
+    assert status == 201
+    assert json.loads(body) == {"user": {"name": ""}, "count": 2}
@@ -0,0 +1,63 @@
+import pytest
+
+from utils.template import TemplateError, compile_template, render_template, template_variables
+
+
+def test_render_string():
+    assert render_template("/users/{user-id}/{user.name}", {"user-id": 1, "user.name": "a"}) == "/users/1/a"
+    assert render_template("{a}{b}", {"a": 1, "b": 2}) == "12"
+
+
+def test_string_without_variables_is_not_compiled():
+    assert compile_template("/users") is None
+    assert compile_template("{}") is None
+    assert render_template({"a": [1, "b"]}, {}) == {"a": [1, "b"]}
+
+
+def test_render_nested_structures_keeps_types():
+    template = {"id": "{id}", "tags": ["x", "{tag}"], "pair": ("{id}", 2), "count": 3}
+    result = render_template(template, {"id": 7, "tag": "t"})
+    assert result == {"id": "7", "tags": ["x", "t"], "pair": ("7", 2), "count": 3}
+    assert template["id"] == "{id}"
+
+
+def test_template_variables():
+    assert template_variables({"a": "{x}", "b": ["{y}", {"c": "{x}"}]}) == {"x", "y"}
+    assert template_variables("plain") == frozenset()
+
+
+def test_missing_variable():
+    with pytest.raises(TemplateError) as info:
+        render_template({"url": "/users/{id}"}, {})
+    assert info.value.missing == ["id"]
+
+
+def test_modified_template_is_recompiled():
+    template = {"url": "/users/{id}"}
+    assert render_template(template, {"id": 1, "name": "a"}) == {"url": "/users/1"}
+    template["url"] = "/users/{name}"
+    assert render_template(template, {"id": 1, "name": "a"}) == {"url": "/users/a"}
+    template["params"] = {"q": "{id}"}
+    assert template_variables(template) == {"name", "id"}
+
+
+def test_static_fields_are_rendered_from_live_template():
+    template = {"url": "/users/{id}", "flag": 1, "ratio": 1, "body": {"a": [1]}}
+    assert render_template(template, {"id": 1})["flag"] == 1
+    compiled = compile_template(template)
+    # 与原值相等但类型不同的修改也要生效
+    template["flag"] = True
+    template["ratio"] = 1.0
+    template["body"]["a"].append(2)
+    result = render_template(template, {"id": 2})
+    assert result["flag"] is True and type(result["ratio"]) is float
+    assert result == {"url": "/users/2", "flag": True, "ratio": 1.0, "body": {"a": [1, 2]}}
+    assert compile_template(template) is compiled
+
+
+def test_nested_placeholder_replacement_is_recompiled():
+    template = {"params": {"q": "{a}", "page": 1}, "tags": ["{a}"]}
+    assert render_template(template, {"a": "x", "b": "y"}) == {"params": {"q": "x", "page": 1}, "tags": ["x"]}
+    template["params"]["q"] = "{b}"
+    template["tags"][0] = 5
+    assert render_template(template, {"a": "x", "b": "y"}) == {"params": {"q": "y", "page": 1}, "tags": [5]}
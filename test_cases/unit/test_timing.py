@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.http_client import HTTPClient
+from utils.loopback_server import AsyncHTTPServer, json_response
+from utils.timing import (PHASES, RequestTiming, TimingAggregator, endpoint_of, start_timing, stop_timing,
+                          timed_phase, timing_aggregator)
+
+
+def test_timed_phase_accumulates_into_current_timing():
+    with timed_phase("dns"):
+        pass
+    timing = start_timing()
+    try:
+        with timed_phase("connect"):
+            pass
+        timing.add("connect", 0.002)
+    finally:
+        stop_timing()
+    assert timing.connect >= 2.0 and timing.dns == 0.0
+    assert timing.reused is False
+    assert RequestTiming().reused is True
+
+
+def test_endpoint_of_drops_query_and_normalizes_method():
+    assert endpoint_of("get", "http://svc/users/1?x=1#f") == "GET http://svc/users/1"
+
+
+def test_aggregator_average_max_and_capture():
+    aggregator = TimingAggregator()
+    captured = aggregator.begin_capture()
+    aggregator.record("GET http://svc/a", RequestTiming(ttfb=10, total=12))
+    aggregator.record("GET http://svc/a", RequestTiming(connect=4, ttfb=20, total=30, reused=False))
+
+    # 其他线程的记录不进入当前线程的捕获
+    thread = threading.Thread(target=aggregator.record, args=("GET http://svc/b", RequestTiming(total=5)))
+    thread.start()
+    thread.join()
+    assert [entry["endpoint"] for entry in aggregator.end_capture()] == ["GET http://svc/a"] * 2
+    assert captured[1]["connect"] == 4
+
+    summary = aggregator.summary()
+    assert summary["GET http://svc/a"]["count"] == 2
+    assert summary["GET http://svc/a"]["reused"] == 1
+    assert summary["GET http://svc/a"]["avg"]["total"] == 21.0
+    assert summary["GET http://svc/a"]["max"]["connect"] == 4.0
+    table = aggregator.format_table().splitlines()
+    assert len(table) == 3 and table[1].startswith("GET http://svc/a")
+
+
+@pytest.fixture
+def server():
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return json_response({"path": request.path})
+
+    with AsyncHTTPServer(handler) as server:
+        yield server
+
+
+def test_breakdown_adds_up_against_loopback_server(server):
+    client = HTTPClient()
+    try:
+        first = client.send_request({"method": "GET", "url": f"{server.base_url}/slow"}).timing
+        second = client.send_request({"method": "GET", "url": f"{server.base_url}/slow"}).timing
+    finally:
+        client.session.close()
+
+    assert first.reused is False and first.connect > 0
+    assert second.reused is True and second.dns == second.connect == 0.0
+    for timing in (first, second):
+        assert timing.tls == 0.0
+        # 服务端延迟50ms才返回响应头，全部计入首字节耗时
+        assert timing.ttfb >= 45
+        phases = timing.dns + timing.connect + timing.tls + timing.ttfb + timing.download
+        assert phases == pytest.approx(timing.total, abs=0.01)
+    summary = timing_aggregator.summary()[f"GET {server.base_url}/slow"]
+    assert summary["count"] == 2 and summary["reused"] == 1
+    assert set(summary["avg"]) == set(PHASES)
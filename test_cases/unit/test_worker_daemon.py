@@ -0,0 +1,85 @@
+import os
+import subprocess
+import threading
+
+import pytest
+
+from utils.worker_daemon import WorkerDaemon, forwarded_env, is_running, send_request
+
+
+class _Runner:
+    """代替TestRunner记录执行参数，输出第一行后等待客户端收到再继续"""
+
+    def __init__(self):
+        self.calls = []
+        self.received = threading.Event()
+        self.streamed = None
+
+    def run_tests(self, test_path, markers, concurrency, in_process, changed_only, http_mode):
+        self.calls.append({
+            'test_path': test_path, 'markers': markers, 'concurrency': concurrency,
+            'in_process': in_process, 'changed_only': changed_only, 'http_mode': http_mode,
+            'local_httpbin': os.environ.get('QA_LOCAL_HTTPBIN'),
+        })
+        print("test_a.py::test_x PASSED")
+        # 输出缓存到执行结束才返回时，客户端在这里收不到第一行
+        self.streamed = self.received.wait(5)
+        print("test_a.py::test_y FAILED")
+        print("末尾没有换行", end="")
+        raise subprocess.CalledProcessError(1, ["pytest"])
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.delenv('QA_LOCAL_HTTPBIN', raising=False)
+    worker = WorkerDaemon(str(tmp_path / 'worker.sock'))
+    worker.preload = lambda: None
+    worker.runner = _Runner()
+    thread = threading.Thread(target=worker.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if is_running(worker.address):
+            break
+        threading.Event().wait(0.05)
+    yield worker
+    send_request({'command': 'shutdown'}, worker.address, timeout=5)
+    thread.join(5)
+
+
+def test_run_streams_output_and_forwards_options(daemon):
+    chunks = []
+
+    def on_output(text):
+        chunks.append(text)
+        daemon.runner.received.set()
+
+    env = {**forwarded_env(), 'QA_LOCAL_HTTPBIN': '1'}
+    response = send_request({'command': 'run', 'test_path': '/tmp/x', 'markers': 'smoke', 'concurrency': 4,
+                             'http_mode': 'replay', 'changed_only': True, 'env': env},
+                            daemon.address, timeout=10, on_output=on_output)
+
+    assert daemon.runner.streamed is True
+    assert ''.join(chunks) == "test_a.py::test_x PASSED\ntest_a.py::test_y FAILED\n末尾没有换行"
+    assert response['ok'] is False and response['exit_code'] == 1
+    assert 'output' not in response
+    assert daemon.runner.calls == [{'test_path': '/tmp/x', 'markers': 'smoke', 'concurrency': 4,
+                                    'in_process': True, 'changed_only': True, 'http_mode': 'replay',
+                                    'local_httpbin': '1'}]
+    # 转发的环境变量只在本次执行期间生效
+    assert 'QA_LOCAL_HTTPBIN' not in os.environ
+
+
+def test_http_mode_defaults_to_live_each_run(daemon):
+    daemon.runner.received.set()
+    send_request({'command': 'run', 'env': forwarded_env()}, daemon.address, timeout=10)
+    assert daemon.runner.calls[0]['http_mode'] == 'live'
+
+
+def test_rejects_what_the_daemon_cannot_honour(daemon):
+    response = send_request({'command': 'run', 'workers': 4, 'env': forwarded_env()}, daemon.address, timeout=10)
+    assert response['ok'] is False and '--workers' in response['error']
+
+    env = {**forwarded_env(), 'QA_HTTP_TIMEOUT': '1'}
+    response = send_request({'command': 'run', 'env': env}, daemon.address, timeout=10)
+    assert response['ok'] is False and 'QA_HTTP_TIMEOUT' in response['error']
+    assert daemon.runner.calls == []
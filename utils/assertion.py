@@ -0,0 +1,311 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from utils.latency import LATENCY_KEYS
+from utils.response_view import ResponseView, compile_jsonpath, VIEW_FIELDS
+from utils.schema_validator import compile_schema, schema_errors
+
+# 字段路径前缀与响应视图字段的对应关系，未写前缀的路径视为响应体字段
+_PATH_PREFIXES = {'response': 'body', 'body': 'body', 'headers': 'headers'}
+
+_TYPES = {
+    'string': str, 'str': str,
+    'number': (int, float), 'float': float,
+    'integer': int, 'int': int,
+    'boolean': bool, 'bool': bool,
+    'array': list, 'list': list,
+    'object': dict, 'dict': dict,
+    'null': type(None),
+}
+
+_MISSING = object()
+
+
+def _describe(value: Any) -> str:
+    return '<不存在>' if value is _MISSING else json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _type_check(name: str) -> Callable[[Any], Optional[str]]:
+    if name not in _TYPES:
+        raise ValueError(f"不支持的类型: {name}，可选: {', '.join(_TYPES)}")
+    expected_type = _TYPES[name]
+
+    def check(actual):
+        # bool是int的子类，数值类型校验时排除布尔值
+        is_bool = isinstance(actual, bool)
+        if actual is _MISSING or not isinstance(actual, expected_type) or (is_bool and expected_type is not bool):
+            return f"期望类型 {name}，实际 {_describe(actual)}"
+    return check
+
+
+def _compile_operator(op: str, arg: Any) -> Callable[[Any], Optional[str]]:
+    """把 {"$op": arg} 形式的期望编译为校验函数，返回None表示通过"""
+    if op == '$eq':
+        return lambda actual: None if actual == arg else f"期望 {_describe(arg)}，实际 {_describe(actual)}"
+    if op == '$ne':
+        return lambda actual: None if actual != arg else f"期望不等于 {_describe(arg)}"
+    if op == '$regex':
+        pattern = re.compile(arg)
+        return lambda actual: None if isinstance(actual, str) and pattern.search(actual) \
+            else f"期望匹配正则 {arg}，实际 {_describe(actual)}"
+    if op == '$type':
+        return _type_check(arg)
+    if op == '$exists':
+        return lambda actual: None if (actual is not _MISSING) == bool(arg) \
+            else ("字段不存在" if arg else f"期望字段不存在，实际 {_describe(actual)}")
+    if op == '$contains':
+        def contains(actual):
+            try:
+                if actual is not _MISSING and arg in actual:
+                    return None
+            except TypeError:
+                pass
+            return f"期望包含 {_describe(arg)}，实际 {_describe(actual)}"
+        return contains
+    if op == '$len':
+        def length(actual):
+            try:
+                if actual is not _MISSING and len(actual) == arg:
+                    return None
+            except TypeError:
+                pass
+            return f"期望长度 {arg}，实际 {_describe(actual)}"
+        return length
+    if op in ('$gt', '$ge', '$lt', '$le'):
+        compare = {'$gt': lambda a: a > arg, '$ge': lambda a: a >= arg,
+                   '$lt': lambda a: a < arg, '$le': lambda a: a <= arg}[op]
+        symbol = {'$gt': '>', '$ge': '>=', '$lt': '<', '$le': '<='}[op]
+
+        def ordered(actual):
+            try:
+                if actual is not _MISSING and compare(actual):
+                    return None
+            except TypeError:
+                pass
+            return f"期望 {symbol} {_describe(arg)}，实际 {_describe(actual)}"
+        return ordered
+    raise ValueError(f"不支持的断言操作符: {op}")
+
+
+def _compile_check(value: Any) -> Tuple[List[Callable[[Any], Optional[str]]], bool]:
+    """
+    编译单个字段的期望值
+
+    Returns:
+        (校验函数列表, 字段不存在时是否仍需校验)
+    """
+    if isinstance(value, dict) and value and all(isinstance(k, str) and k.startswith('$') for k in value):
+        checks = [_compile_operator(op, arg) for op, arg in value.items()]
+        return checks, '$exists' in value
+    return [_compile_operator('$eq', value)], False
+
+
+def _decode_error(response: requests.Response, error: Exception) -> str:
+    return f"响应体不是合法的JSON: {str(error)}，响应体: {response.text[:200]!r}"
+
+
+class _Node:
+    """路径前缀树的节点"""
+    __slots__ = ('children', 'checks', 'labels', 'allow_missing')
+
+    def __init__(self):
+        self.children: Dict[Any, '_Node'] = {}
+        # (原始字段名, 校验函数列表, 字段不存在时是否仍需校验)
+        self.checks: List[Tuple[str, List[Callable], bool]] = []
+        # 子树中的全部字段名，路径缺失时统一报告
+        self.labels: List[str] = []
+        # 子树中是否有字段在路径缺失时仍需校验（$exists）
+        self.allow_missing = False
+
+    def finalize(self):
+        """树构建完成后预先计算子树信息，校验时不再重复遍历"""
+        self.labels = [label for label, _, _ in self.checks]
+        self.allow_missing = any(allow for _, _, allow in self.checks)
+        for child in self.children.values():
+            child.finalize()
+            self.labels.extend(child.labels)
+            self.allow_missing = self.allow_missing or child.allow_missing
+
+
+def _split_path(field: str) -> Optional[Tuple[Any, ...]]:
+    """
+    把字段名拆分为从响应视图根开始的路径
+
+    - status_code
+    - response.args.name / body.args.name / args.name -> 响应体字段
+    - headers.Content-Type -> 响应头
+    - $.body.items[0].id -> 简单JSONPath
+    复杂的JSONPath返回None，单独求值
+    """
+    if field == 'status_code':
+        return ('status_code',)
+    if field.startswith('$'):
+        compiled = compile_jsonpath(field)
+        steps = getattr(compiled, 'steps', None)
+        if steps is None or steps[0] not in VIEW_FIELDS:
+            return None
+        return steps
+    head, _, rest = field.partition('.')
+    if head in _PATH_PREFIXES and rest:
+        root = _PATH_PREFIXES[head]
+        # 响应头名称本身可能包含点号，不再继续拆分
+        return (root, rest) if root == 'headers' else (root,) + tuple(rest.split('.'))
+    return ('body',) + tuple(field.split('.'))
+
+
+class ResponseValidator:
+    """
+    由期望结果编译得到的校验器
+
+    普通字段按路径组织成前缀树，在一次遍历中完成全部校验；
+    复杂JSONPath单独求值。所有不匹配项一并报告
+    """
+
+    def __init__(self, expected: Dict[str, Any]):
+        self.root = _Node()
+        self.jsonpaths: List[Tuple[str, Any, List[Callable], bool]] = []
+        self.schema = None
+        for field, value in expected.items():
+            if field in LATENCY_KEYS:
+                continue
+            if field == 'schema':
+                # schema文件路径（由DataLoader解析为绝对路径）或内联schema
+                self.schema = compile_schema(value)
+                continue
+            checks, allow_missing = _compile_check(value)
+            path = _split_path(field)
+            if path is None:
+                self.jsonpaths.append((field, compile_jsonpath(field), checks, allow_missing))
+                continue
+            node = self.root
+            for step in path:
+                node = node.children.setdefault(step, _Node())
+            node.checks.append((field, checks, allow_missing))
+        self.root.finalize()
+
+    @staticmethod
+    def _child(data: Any, step: Any) -> Any:
+        if isinstance(data, dict):
+            return data.get(step, _MISSING)
+        if isinstance(data, list):
+            index = step if isinstance(step, int) else int(step) if str(step).isdigit() else None
+            if index is not None and index < len(data):
+                return data[index]
+            return _MISSING
+        if isinstance(data, CaseInsensitiveDict):
+            return data.get(step, _MISSING)
+        return _MISSING
+
+    def _walk(self, node: _Node, data: Any, errors: List[str]):
+        for label, checks, allow_missing in node.checks:
+            for check in checks:
+                message = check(data)
+                if message:
+                    errors.append(f"{label}: {message}")
+        for step, child in node.children.items():
+            value = self._child(data, step) if data is not _MISSING else _MISSING
+            if value is _MISSING and not child.allow_missing:
+                # 整个子树都依赖该路径存在，统一报告缺失，不再向下遍历
+                errors.extend(f"{label}: 字段不存在" for label in child.labels)
+                continue
+            self._walk(child, value, errors)
+
+    def errors(self, response: requests.Response) -> List[str]:
+        """返回全部不匹配项，全部通过时为空列表；响应体不是合法JSON时作为一项报告，依赖响应体的校验跳过"""
+        view = ResponseView.of(response)
+        errors: List[str] = []
+        decode_errors: List[str] = []
+        for step, child in self.root.children.items():
+            if step == 'headers':
+                value = response.headers
+            else:
+                try:
+                    value = getattr(view, step)
+                except ValueError as e:
+                    decode_errors.append(_decode_error(response, e))
+                    continue
+            self._walk(child, value, errors)
+        if self.schema is not None and not decode_errors:
+            try:
+                # 其他校验不需要解码响应体时，直接在原始文本上流式校验
+                if view.body_loaded or 'body' in self.root.children or self.jsonpaths:
+                    found = schema_errors(self.schema, instance=view.body)
+                else:
+                    found = schema_errors(self.schema, text=response.text)
+            except ValueError as e:
+                decode_errors.append(_decode_error(response, e))
+            else:
+                errors.extend(f"schema{error}" for error in found)
+        for field, compiled, checks, allow_missing in self.jsonpaths:
+            try:
+                matches = view.find(field)
+            except ValueError as e:
+                if not decode_errors:
+                    decode_errors.append(_decode_error(response, e))
+                continue
+            actual = matches[0] if matches else _MISSING
+            if actual is _MISSING and not allow_missing:
+                errors.append(f"{field}: 字段不存在")
+                continue
+            for check in checks:
+                message = check(actual)
+                if message:
+                    errors.append(f"{field}: {message}")
+        return decode_errors + errors
+
+    def validate(self, response: requests.Response, case_name: Optional[str] = None):
+        """
+        校验响应
+
+        Args:
+            response: 响应对象
+            case_name: 用例名称，失败消息中注明
+
+        Raises:
+            AssertionError: 存在不匹配项时抛出，消息中列出全部不匹配项
+        """
+        errors = self.errors(response)
+        if errors:
+            prefix = f"用例 {case_name} " if case_name else ""
+            raise AssertionError(f"{prefix}响应校验失败（{len(errors)} 项）:\n" + "\n".join(errors))
+
+
+@lru_cache(maxsize=1024)
+def _compile_cached(key: str) -> ResponseValidator:
+    return ResponseValidator(json.loads(key))
+
+
+def compile_expected(expected: Dict[str, Any]) -> ResponseValidator:
+    """
+    编译期望结果，相同内容的期望只编译一次
+
+    字段名支持：
+        - status_code
+        - response.xxx / body.xxx / xxx：响应体字段（response.headers.Host 是响应体中的headers字段，
+          httpbin会把请求头回显在响应体中，并不是响应头）
+        - headers.xxx：响应头，名称不区分大小写
+        - $.body.xxx：JSONPath
+    字段值支持：
+        - 普通值：相等比较（字典、列表整体比较）
+        - 操作符字典：$eq/$ne/$regex/$type/$exists/$contains/$len/$gt/$ge/$lt/$le
+    另外支持 schema 键：schema文件路径或内联JSON Schema，用于校验整个响应体
+
+    示例:
+        {
+            "status_code": 200,
+            "response.args.name": "张三",
+            "headers.Content-Type": {"$regex": "application/json"},
+            "$.body.origin": {"$type": "string"}
+        }
+    """
+    return _compile_cached(json.dumps(expected, sort_keys=True, ensure_ascii=False, default=str))
+
+
+def assert_response(response: requests.Response, expected: Dict[str, Any], case_name: Optional[str] = None):
+    """按期望结果校验响应，全部不匹配项一并报告，case_name会写入失败消息"""
+    compile_expected(expected).validate(response, case_name)
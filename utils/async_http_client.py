@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import requests
+
+from utils.http_client import HTTPClient
+from utils.connection_pool import create_session, grow_pool
+from utils.keywords import Keywords
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CaseResult:
+    """
+    单个用例的执行结果
+
+    属性:
+        case: 原始用例（字典或TestCase）
+        response: 响应对象，执行失败时为None
+        error: 执行过程中抛出的异常，成功时为None
+        elapsed: 执行耗时（秒）
+        context: 执行前的变量上下文，按依赖图执行时记录，用于重复执行
+    """
+    case: Any
+    response: Optional[requests.Response] = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+    context: Optional[Dict[str, Any]] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def execute_keyword_case(case: Any, keywords: Keywords = None) -> requests.Response:
+    """
+    执行一个关键字驱动的用例（DataLoader加载的TestCase或等价字典）
+
+    Args:
+        keywords: 执行关键字的实例，批量执行时传入同一个实例复用会话；为空时新建
+    """
+    if isinstance(case, dict):
+        keyword, params = case['keyword'], case.get('params', {})
+    else:
+        keyword, params = case.keyword, case.params
+    keyword_func = getattr(keywords if keywords is not None else Keywords(), keyword)
+    return keyword_func(**params)
+
+
+class AsyncHTTPClient:
+    """
+    异步HTTP客户端，与HTTPClient使用相同的用例字典约定
+    （url/method/headers/params/body/extract）
+
+    请求本身仍由HTTPClient.send_request完成，在有界线程池中执行，
+    由asyncio.Semaphore控制并发数，因此模板处理、数据提取等行为与同步客户端完全一致。
+
+    属性:
+        max_concurrency (int): 最大并发请求数
+        session (requests.Session): 所有请求共享的会话，挂载进程内共享连接池
+        context (dict): 提取的变量，每个请求开始时复制一份，结束后合并回来
+        keywords (Keywords): 执行关键字驱动用例的实例，使用同一个会话，各用例共用
+    """
+
+    def __init__(self, max_concurrency: int = 10, session: requests.Session = None):
+        if max_concurrency < 1:
+            raise ValueError(f"并发数必须大于0: {max_concurrency}")
+        self.max_concurrency = max_concurrency
+        if session is None:
+            # 原地扩容共享连接池以匹配并发数，已预热的连接继续复用
+            grow_pool(max_concurrency)
+            session = create_session()
+        self.session = session
+        self.context = {}
+        self.keywords = Keywords(HTTPClient(session=self.session))
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="async-http")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """关闭线程池和会话"""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def _send_sync(self, case: Dict[str, Any]) -> requests.Response:
+        client = HTTPClient(session=self.session, context=dict(self.context))
+        response = client.send_request(case)
+        if 'extract' in case:
+            self.context.update({key: client.context[key] for key in case['extract'] if key in client.context})
+        return response
+
+    def execute_keyword_case(self, case: Any) -> requests.Response:
+        """同步执行一个关键字驱动的用例，可以作为run_cases的execute参数"""
+        return execute_keyword_case(case, self.keywords)
+
+    async def _run_in_executor(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def send_request(self, case: Dict[str, Any]) -> requests.Response:
+        """
+        异步发送HTTP请求
+
+        Args:
+            case: 测试用例字典，字段同HTTPClient.send_request
+
+        Returns:
+            requests.Response: 响应对象
+        """
+        return await self._run_in_executor(self._send_sync, case)
+
+    async def run_cases(self, cases: Iterable[Any],
+                        execute: Callable[[Any], requests.Response] = None) -> List[CaseResult]:
+        """
+        以有界并发执行一组相互独立的用例
+
+        单个用例失败不会中断其余用例，异常记录在对应的CaseResult中
+
+        Args:
+            cases: 用例列表
+            execute: 同步执行函数，默认按用例字典发送请求
+
+        Returns:
+            List[CaseResult]: 与输入顺序一致的执行结果
+        """
+        execute = execute or self._send_sync
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(case):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await self._run_in_executor(execute, case)
+                    return CaseResult(case, response=response, elapsed=time.perf_counter() - start)
+                except Exception as e:
+                    logger.error(f"用例执行失败: {e}")
+                    return CaseResult(case, error=e, elapsed=time.perf_counter() - start)
+
+        return await asyncio.gather(*(run_one(case) for case in cases))
+
+
+def run_concurrently(cases: Iterable[Any], max_concurrency: int = 10,
+                     execute: Callable[[Any], requests.Response] = None,
+                     keywords: bool = False) -> List[CaseResult]:
+    """
+    同步入口：并发执行一组用例并等待全部完成
+
+    Args:
+        cases: 用例列表
+        max_concurrency: 最大并发数
+        execute: 同步执行函数，默认按用例字典发送请求
+        keywords: 用例为关键字驱动的用例，由客户端的Keywords实例执行，忽略execute
+
+    Returns:
+        List[CaseResult]: 与输入顺序一致的执行结果
+    """
+    cases = list(cases)
+    if not cases:
+        return []
+
+    async def main():
+        async with AsyncHTTPClient(max_concurrency=max_concurrency) as client:
+            return await client.run_cases(cases, client.execute_keyword_case if keywords else execute)
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    logger.info(f"并发执行 {len(cases)} 个用例完成，并发数 {max_concurrency}，"
+                f"总耗时 {time.perf_counter() - start:.3f}s")
+    return results
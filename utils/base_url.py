@@ -0,0 +1,50 @@
+import os
+import threading
+from typing import Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+_overrides: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def _parse(spec: str) -> Dict[str, str]:
+    """解析 "原地址=新地址,原地址=新地址" 形式的配置"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        original, sep, target = item.partition('=')
+        if not sep or not original or not target:
+            raise ValueError(f"基础地址替换格式应为 原地址=新地址: {item}")
+        overrides[original.rstrip('/')] = target.rstrip('/')
+    return overrides
+
+
+def set_override(original: str, target: str):
+    """把以original开头的请求地址替换为target开头，例如 https://httpbin.org -> http://127.0.0.1:8000"""
+    with _lock:
+        _overrides[original.rstrip('/')] = target.rstrip('/')
+    logger.info(f"基础地址替换: {original} -> {target}")
+
+
+def remove_override(original: str):
+    with _lock:
+        _overrides.pop(original.rstrip('/'), None)
+
+
+def overrides() -> Dict[str, str]:
+    return dict(_overrides)
+
+
+def rewrite_url(url: str) -> str:
+    """按基础地址替换规则改写url，没有匹配的规则时原样返回"""
+    if not _overrides:
+        return url
+    for original, target in _overrides.items():
+        if url.startswith(original) and url[len(original):len(original) + 1] in ('', '/', '?', '#'):
+            return target + url[len(original):]
+    return url
+
+
+# 环境变量 QA_BASE_URL_OVERRIDES 可以预先配置替换规则
+_overrides.update(_parse(os.environ.get('QA_BASE_URL_OVERRIDES', '')))
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Union
+import logging
+
+from utils.parse_cache import cache_root
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.idx'
+
+# 索引文件格式：魔数 | 源文件大小、修改时间、用例数 | (用例数+1)个uint64偏移 | case_name列表(JSON)
+_MAGIC = b'QAIDX001'
+_HEADER = struct.Struct('<8sQqQ')
+
+
+def index_path_for(file_path: str) -> str:
+    """用例文件对应的索引文件路径，与用例文件放在同一目录"""
+    return file_path + INDEX_SUFFIX
+
+
+def _fallback_index_path(file_path: str) -> str:
+    """用例文件所在目录不可写时，索引放到缓存目录"""
+    base = cache_root()
+    name = hashlib.sha1(file_path.encode('utf-8')).hexdigest() + INDEX_SUFFIX
+    return os.path.join(base, 'index', name)
+
+
+def build_index(file_path: str, index_path: str) -> int:
+    """
+    扫描JSONL文件生成偏移索引，每个非空行为一个用例
+
+    Returns:
+        int: 用例数
+    """
+    offsets: List[int] = []
+    names: List[str] = []
+    st = os.stat(file_path)
+    with open(file_path, 'rb') as f:
+        position = 0
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    case = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{file_path} 第 {line_no} 行不是合法的JSON: {str(e)}") from e
+                offsets.append(position)
+                names.append(case.get('case_name', '') if isinstance(case, dict) else '')
+            position += len(line)
+    # 每个用例的结束位置取下一个用例的起始位置，最后一个用例到文件末尾
+    offsets.append(position)
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    tmp = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, st.st_size, st.st_mtime_ns, len(names)))
+        f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+        f.write(json.dumps(names, ensure_ascii=False).encode('utf-8'))
+    os.replace(tmp, index_path)
+    logger.info(f"已生成用例索引: {index_path}，共 {len(names)} 条")
+    return len(names)
+
+
+class CaseIndex:
+    """
+    JSONL用例文件的随机访问视图
+
+    首次打开时生成旁路索引文件（<用例文件>.idx），之后源文件未变化时直接复用；
+    用例文件和索引文件都通过mmap访问，按序号或case_name读取单个用例时只解析该行。
+
+    不提供按连续区间切分文件的接口：--shard和xdist在收集之后按用例选择（分片时同一依赖链的用例必须在一起，
+    按耗时均衡也不是连续区间），收集阶段只读取索引中的case_name，各进程执行时按序号读取分到的用例
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = os.path.abspath(file_path)
+        self.index_path = self._ensure_index()
+        self._index_file = open(self.index_path, 'rb')
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, _, self.count = _HEADER.unpack_from(self._index, 0)
+        names_start = _HEADER.size + (self.count + 1) * 8
+        # 偏移数组直接映射为uint64视图，不复制
+        self._offsets = memoryview(self._index)[_HEADER.size:names_start].cast('Q')
+        self._names_start = names_start
+        self._by_name: Optional[Dict[str, int]] = None
+        self._data_file = open(self.file_path, 'rb')
+        size = os.fstat(self._data_file.fileno()).st_size
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    @staticmethod
+    def _is_current(file_path: str, index_path: str) -> bool:
+        try:
+            st = os.stat(file_path)
+            with open(index_path, 'rb') as f:
+                magic, size, mtime_ns, _ = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return magic == _MAGIC and size == st.st_size and mtime_ns == st.st_mtime_ns
+
+    def _ensure_index(self) -> str:
+        for index_path in (index_path_for(self.file_path), _fallback_index_path(self.file_path)):
+            if self._is_current(self.file_path, index_path):
+                return index_path
+        try:
+            index_path = index_path_for(self.file_path)
+            build_index(self.file_path, index_path)
+        except OSError:
+            index_path = _fallback_index_path(self.file_path)
+            build_index(self.file_path, index_path)
+        return index_path
+
+    def __len__(self) -> int:
+        return self.count
+
+    def names(self) -> List[str]:
+        """全部用例的case_name，按文件中的顺序"""
+        return json.loads(self._index[self._names_start:])
+
+    def position(self, key: Union[int, str]) -> int:
+        """把序号或case_name转换为序号"""
+        if isinstance(key, int):
+            if not -self.count <= key < self.count:
+                raise IndexError(f"用例序号超出范围: {key}，共 {self.count} 条")
+            return key % self.count
+        if self._by_name is None:
+            self._by_name = {name: i for i, name in enumerate(self.names())}
+        if key not in self._by_name:
+            raise KeyError(f"用例不存在: {key}")
+        return self._by_name[key]
+
+    def raw(self, key: Union[int, str]) -> memoryview:
+        """
+        返回单个用例原始JSON字节的只读视图，直接引用映射的文件内容，不复制
+
+        视图在索引关闭前有效，用完后应调用release()（或用with语句），否则索引无法关闭
+        """
+        i = self.position(key)
+        return memoryview(self._data)[self._offsets[i]:self._offsets[i + 1]]
+
+    def get(self, key: Union[int, str]) -> Dict[str, Any]:
+        """按序号或case_name读取单个用例的原始字典"""
+        with self.raw(key) as view:
+            # 直接从映射内容解码为字符串，不经过中间的bytes副本
+            return json.loads(str(view, 'utf-8'))
+
+    def close(self):
+        self._offsets.release()
+        self._index.close()
+        self._index_file.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data_file.close()
+
+
+_indexes: Dict[str, CaseIndex] = {}
+_lock = threading.Lock()
+
+
+def open_index(file_path: str) -> CaseIndex:
+    """打开用例文件的索引，同一文件在进程内只打开一次；源文件变化后重新生成"""
+    path = os.path.abspath(file_path)
+    with _lock:
+        index = _indexes.get(path)
+        if index is not None and not CaseIndex._is_current(path, index.index_path):
+            index.close()
+            index = None
+        if index is None:
+            index = _indexes[path] = CaseIndex(path)
+        return index
+
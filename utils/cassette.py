@@ -0,0 +1,341 @@
+import atexit
+import base64
+import difflib
+import hashlib
+import json
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+import logging
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+# live: 直接请求；record: 请求并录制到磁带；replay: 只从磁带回放，不访问网络
+MODES = ('live', 'record', 'replay')
+
+CASSETTE_SUFFIX = '.cassette.jsonl'
+DEFAULT_CASSETTE = 'default'
+
+# 回放未命中时最多比较的已录制请求数
+MAX_DIFF_CANDIDATES = 200
+
+
+class CassetteMismatch(requests.exceptions.RequestException):
+    """回放模式下请求在磁带中没有匹配的录制记录"""
+
+    def __init__(self, message: str, diff: str = ''):
+        self.diff = diff
+        super().__init__(f"{message}\n{diff}" if diff else message)
+
+
+def _query_pairs(params: Any) -> List[Tuple[str, str]]:
+    if not params:
+        return []
+    items = params.items() if isinstance(params, dict) else params
+    pairs = []
+    for key, value in items:
+        for v in value if isinstance(value, (list, tuple)) else (value,):
+            if v is not None:
+                pairs.append((str(key), str(v)))
+    return pairs
+
+
+def normalize_request(method: str, url: str, params: Any = None, body: Any = None,
+                      headers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    规范化请求：URL中的查询参数与params合并后排序，请求体为空时记为None
+
+    请求头不参与匹配，只随记录保存用于差异比较
+    """
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True) + _query_pairs(params))
+    return {
+        'method': method.upper(),
+        'url': urlunsplit((parts.scheme, parts.netloc, parts.path, '', '')),
+        'query': [list(pair) for pair in query],
+        'body': body if body else None,
+        'headers': {str(k): str(v) for k, v in (headers or {}).items() if v is not None},
+    }
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """规范化请求的哈希，作为磁带索引的键"""
+    matched = {k: request[k] for k in ('method', 'url', 'query', 'body')}
+    raw = json.dumps(matched, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _encode_body(content: bytes) -> Dict[str, str]:
+    try:
+        return {'text': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(content).decode('ascii')}
+
+
+def _decode_body(body: Dict[str, str]) -> bytes:
+    if 'base64' in body:
+        return base64.b64decode(body['base64'])
+    return body.get('text', '').encode('utf-8')
+
+
+class Cassette:
+    """
+    一个用例文件对应的录制磁带，JSON Lines格式，每行一次请求/响应
+
+    打开时扫描一遍建立 请求哈希 -> 行偏移 的索引，回放时按哈希定位到行再解析；
+    同一请求录制了多次时按录制顺序依次回放，用完后重复最后一次。
+
+    录制时按请求哈希合并：本次录制到的请求替换磁带中同一请求的旧记录，其余请求的旧记录保留，
+    只执行部分用例时不会丢失其他用例的录制
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"不支持的HTTP模式: {mode}，可选 {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._data = b''
+        # 本次录制的记录（已序列化的行），按请求哈希分组，保存时合并进磁带文件
+        self._recorded: Dict[str, List[str]] = {}
+        self._unsaved = False
+        if mode == 'replay':
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        except FileNotFoundError:
+            logger.warning(f"磁带文件不存在，回放时所有请求都将不匹配: {self.path}")
+            return
+        position = 0
+        while position < len(self._data):
+            end = self._data.find(b'\n', position)
+            end = len(self._data) if end < 0 else end + 1
+            line = self._data[position:end]
+            if line.strip():
+                # 键固定写在每行开头，建立索引时不解析整行
+                if line.startswith(b'{"key":"'):
+                    key = line[8:48].decode('ascii')
+                else:
+                    key = json.loads(line)['key']
+                self._index.setdefault(key, []).append((position, end))
+            position = end
+        logger.info(f"已加载磁带: {self.path}，共 {sum(map(len, self._index.values()))} 条记录")
+
+    def __len__(self) -> int:
+        return sum(map(len, self._index.values()))
+
+    def _entry(self, span: Tuple[int, int]) -> Dict[str, Any]:
+        return json.loads(self._data[span[0]:span[1]])
+
+    def record(self, request: Dict[str, Any], response: requests.Response):
+        """录制一条请求/响应记录，在save()/close()时写入磁带文件"""
+        entry = {
+            'key': request_key(request),
+            'request': request,
+            'response': {
+                'status': response.status_code,
+                'reason': response.reason,
+                'url': response.url,
+                'headers': dict(response.headers),
+                'encoding': response.encoding,
+                'body': _encode_body(response.content),
+            },
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+        with self._lock:
+            if not self._recorded:
+                logger.info(f"开始录制磁带: {self.path}")
+            self._recorded.setdefault(entry['key'], []).append(line)
+            self._unsaved = True
+
+    def save(self):
+        """
+        把本次录制的记录合并进磁带文件
+
+        同一请求以本次录制为准，磁带中其他请求的记录原样保留；先写临时文件再整体替换，
+        并发读取的进程不会看到写了一半的磁带
+        """
+        with self._lock:
+            if not self._unsaved:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with file_lock(self.path):
+                merged: Dict[str, List[str]] = {}
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            line = line.rstrip('\n')
+                            if not line.strip():
+                                continue
+                            key = line[8:48] if line.startswith('{"key":"') else json.loads(line)['key']
+                            if key not in self._recorded:
+                                merged.setdefault(key, []).append(line)
+                except FileNotFoundError:
+                    pass
+                kept = sum(map(len, merged.values()))
+                merged.update(self._recorded)
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    for lines in merged.values():
+                        for line in lines:
+                            f.write(line + '\n')
+                os.replace(tmp, self.path)
+            self._unsaved = False
+            logger.info(f"已保存磁带: {self.path}，本次录制 {sum(map(len, self._recorded.values()))} 条，"
+                        f"保留其他请求的记录 {kept} 条")
+
+    def replay(self, request: Dict[str, Any]) -> requests.Response:
+        """
+        回放请求
+
+        Raises:
+            CassetteMismatch: 磁带中没有相同的请求，异常信息包含与最接近的录制请求的差异
+        """
+        key = request_key(request)
+        with self._lock:
+            spans = self._index.get(key)
+            if not spans:
+                raise CassetteMismatch(
+                    f"磁带中没有匹配的请求: {request['method']} {request['url']}（{self.path}）",
+                    self.diff(request)
+                )
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            entry = self._entry(spans[min(i, len(spans) - 1)])
+        return self._build_response(entry)
+
+    @staticmethod
+    def _build_response(entry: Dict[str, Any]) -> requests.Response:
+        recorded = entry['response']
+        request = entry['request']
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.reason = recorded.get('reason')
+        response.url = recorded.get('url') or request['url']
+        response.headers = CaseInsensitiveDict(recorded.get('headers') or {})
+        response.encoding = recorded.get('encoding')
+        response._content = _decode_body(recorded.get('body') or {})
+        response.elapsed = timedelta(0)
+        response.request = requests.Request(
+            method=request['method'], url=request['url'], params=request['query'],
+            headers=request.get('headers'), json=request.get('body')
+        ).prepare()
+        return response
+
+    def diff(self, request: Dict[str, Any]) -> str:
+        """与磁带中最接近的录制请求的差异（unified diff），磁带为空时返回空字符串"""
+        if not self._index:
+            return ''
+        candidates = []
+        same_endpoint = []
+        for spans in self._index.values():
+            recorded = self._entry(spans[0])['request']
+            candidates.append(recorded)
+            if recorded['method'] == request['method'] and recorded['url'] == request['url']:
+                same_endpoint.append(recorded)
+            if len(candidates) >= MAX_DIFF_CANDIDATES and same_endpoint:
+                break
+        actual = json.dumps(request, sort_keys=True, ensure_ascii=False, indent=2, default=str).splitlines()
+
+        def lines(recorded):
+            return json.dumps(recorded, sort_keys=True, ensure_ascii=False, indent=2, default=str).splitlines()
+
+        closest = max(same_endpoint or candidates,
+                      key=lambda r: difflib.SequenceMatcher(None, lines(r), actual).ratio())
+        return '\n'.join(difflib.unified_diff(lines(closest), actual, '录制的请求', '实际请求', lineterm=''))
+
+    def close(self):
+        self.save()
+        with self._lock:
+            if isinstance(self._data, mmap.mmap):
+                self._data.close()
+                self._data = b''
+
+
+_config = {
+    'mode': os.environ.get('QA_HTTP_MODE', 'live'),
+    'directory': os.environ.get('QA_CASSETTE_DIR', 'test_cases/cassettes'),
+}
+_cassettes: Dict[str, Cassette] = {}
+_active: Optional[str] = None
+_lock = threading.Lock()
+
+
+def configure(mode: Optional[str] = None, directory: Optional[str] = None):
+    """设置HTTP模式和磁带目录，已打开的磁带会被关闭"""
+    global _active
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"不支持的HTTP模式: {mode}，可选 {', '.join(MODES)}")
+    close_all()
+    with _lock:
+        _active = None
+        if mode is not None:
+            _config['mode'] = mode
+        if directory is not None:
+            _config['directory'] = directory
+
+
+@atexit.register
+def close_all():
+    """保存录制的记录并关闭全部已打开的磁带"""
+    with _lock:
+        cassettes = list(_cassettes.values())
+        _cassettes.clear()
+    for cassette in cassettes:
+        try:
+            cassette.close()
+        except OSError as e:
+            logger.error(f"保存磁带失败: {cassette.path}，{str(e)}")
+
+
+def http_mode() -> str:
+    return _config['mode']
+
+
+def cassette_path(name: str) -> str:
+    return os.path.join(_config['directory'], name + CASSETTE_SUFFIX)
+
+
+def activate(name: str):
+    """切换当前使用的磁带，通常为用例文件名（不含扩展名）"""
+    global _active
+    _active = name
+
+
+@contextmanager
+def use_cassette(name: str):
+    global _active
+    previous = _active
+    activate(name)
+    try:
+        yield
+    finally:
+        _active = previous
+
+
+def active_cassette() -> Optional[Cassette]:
+    """当前模式下应使用的磁带，live模式返回None；未切换过磁带时使用default磁带"""
+    mode = _config['mode']
+    if mode == 'live':
+        return None
+    name = _active or DEFAULT_CASSETTE
+    with _lock:
+        cassette = _cassettes.get(name)
+        if cassette is None:
+            cassette = _cassettes[name] = Cassette(cassette_path(name), mode)
+        return cassette
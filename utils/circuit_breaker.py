@@ -0,0 +1,184 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+import logging
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# 可以安全重试的幂等方法
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'})
+
+# 计入熔断的连接级错误：建连失败、连接被重置、超时
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+# 属于连接错误但重试也不会成功的配置类错误：证书校验失败、代理不可用，不重试也不计入熔断
+NON_RETRYABLE_ERRORS = (requests.exceptions.SSLError, requests.exceptions.ProxyError)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """主机处于熔断状态，请求未发出直接失败"""
+
+
+class HttpSettings:
+    """
+    请求超时、重试和熔断参数
+
+    默认值可以通过环境变量设置：QA_HTTP_TIMEOUT、QA_HTTP_RETRIES、QA_HTTP_BACKOFF、
+    QA_BREAKER_THRESHOLD、QA_BREAKER_RESET
+    """
+
+    def __init__(self):
+        self.timeout = float(os.environ.get('QA_HTTP_TIMEOUT', 10))
+        # 幂等请求连接失败后的重试次数
+        self.retries = int(os.environ.get('QA_HTTP_RETRIES', 2))
+        # 退避基数（秒），第n次重试前随机等待 [0, min(max_backoff, backoff * 2^n)]
+        self.backoff = float(os.environ.get('QA_HTTP_BACKOFF', 0.2))
+        self.max_backoff = 5.0
+        # 连续连接失败达到该次数后熔断，0表示不熔断
+        self.breaker_threshold = int(os.environ.get('QA_BREAKER_THRESHOLD', 5))
+        # 熔断后经过该时长（秒）放行一个探测请求
+        self.breaker_reset = float(os.environ.get('QA_BREAKER_RESET', 30))
+
+    def attempts(self, method: str) -> int:
+        """请求最多尝试的次数，非幂等方法不重试"""
+        return 1 + self.retries if method.upper() in IDEMPOTENT_METHODS else 1
+
+    def backoff_delay(self, retry: int) -> float:
+        """第retry次重试（从0开始）前的等待时间，使用full jitter避免多个请求同时重试"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** retry)))
+
+
+http_settings = HttpSettings()
+
+
+class CircuitBreaker:
+    """
+    单个主机的熔断器
+
+    closed: 正常放行，连续连接失败达到阈值时转为open
+    open: 直接拒绝请求，经过breaker_reset秒后转为half_open
+    half_open: 只放行一个探测请求，成功则恢复closed，失败则重新open
+    """
+
+    def __init__(self, host: str, settings: HttpSettings = http_settings):
+        self.host = host
+        self.settings = settings
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self.rejected = 0
+        self.last_error = ''
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """
+        请求前检查
+
+        Raises:
+            CircuitOpenError: 熔断中
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self.opened_at + self.settings.breaker_reset - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                logger.info(f"主机 {self.host} 熔断恢复探测")
+                return
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"主机 {self.host} 已熔断：连续 {self.failures} 次连接失败，"
+                f"最近错误: {self.last_error}；{max(remaining, 0):.0f}s 后放行探测请求"
+            )
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"主机 {self.host} 已恢复，关闭熔断")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """请求因连接错误以外的原因结束（响应读取失败、被中断等），不改变状态，只释放探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+            self._probing = False
+            threshold = self.settings.breaker_threshold
+            if self.state == HALF_OPEN or (self.state == CLOSED and threshold and self.failures >= threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.opened_count += 1
+                logger.warning(f"主机 {self.host} 连续 {self.failures} 次连接失败，开启熔断 "
+                               f"{self.settings.breaker_reset:.0f}s")
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opened': self.opened_count,
+            'rejected': self.rejected,
+            'last_error': self.last_error,
+        }
+
+
+class HostHealth:
+    """按主机（host:port）管理熔断器，线程安全"""
+
+    def __init__(self, settings: HttpSettings = http_settings):
+        self.settings = settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(host, self.settings))
+        return breaker
+
+    def summary(self, only_unhealthy: bool = False) -> Dict[str, Dict[str, Any]]:
+        """各主机的熔断状态，only_unhealthy为True时只返回发生过连接失败的主机"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {
+            b.host: b.to_dict() for b in breakers
+            if not only_unhealthy or b.opened_count or b.failures or b.rejected
+        }
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+host_health = HostHealth()
+
+
+def configure(timeout: Optional[float] = None, retries: Optional[int] = None,
+              breaker_threshold: Optional[int] = None, breaker_reset: Optional[float] = None):
+    """修改全局的超时、重试和熔断参数，None表示保持不变"""
+    for name, value in (('timeout', timeout), ('retries', retries),
+                        ('breaker_threshold', breaker_threshold), ('breaker_reset', breaker_reset)):
+        if value is not None:
+            setattr(http_settings, name, value)
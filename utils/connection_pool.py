@@ -0,0 +1,446 @@
+import queue
+import socket
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+from utils.dns_cache import dns_cache
+from utils.timing import timed_phase, current_timing
+
+logger = logging.getLogger(__name__)
+
+# 可以按主机覆盖的keep-alive配置项
+_KEEPALIVE_FIELDS = frozenset({'keepalive', 'keepalive_idle', 'keepalive_interval', 'keepalive_count'})
+
+
+@dataclass
+class PoolConfig:
+    """
+    共享连接池配置
+
+    属性:
+        pool_connections: 缓存的主机连接池数量
+        pool_maxsize: 每个主机默认保留的最大连接数
+        host_maxsize: 按主机覆盖pool_maxsize，例如 {"httpbin.org": 20}
+        pool_block: 连接数达到上限时是否阻塞等待空闲连接
+        keepalive: 是否开启TCP keep-alive
+        keepalive_idle: 空闲多少秒后开始发送keep-alive探测
+        keepalive_interval: keep-alive探测间隔（秒）
+        keepalive_count: 判定连接失效前的探测次数
+        host_keepalive: 按主机覆盖keep-alive设置，
+            例如 {"api.example.com": {"keepalive_idle": 15}, "legacy.example.com": {"keepalive": False}}
+        dns_cache_ttl: DNS缓存有效期（秒），0表示不缓存
+    """
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+    host_maxsize: Dict[str, int] = field(default_factory=dict)
+    pool_block: bool = False
+    keepalive: bool = True
+    keepalive_idle: int = 60
+    keepalive_interval: int = 10
+    keepalive_count: int = 3
+    host_keepalive: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    dns_cache_ttl: float = 300
+
+    def __post_init__(self):
+        for host, overrides in self.host_keepalive.items():
+            unknown = set(overrides) - _KEEPALIVE_FIELDS
+            if unknown:
+                raise ValueError(f"主机 {host} 的keep-alive配置项无效: {', '.join(sorted(unknown))}")
+
+    def socket_options(self, host: Optional[str] = None):
+        """根据配置生成socket选项，指定host时应用该主机的keep-alive覆盖配置"""
+        settings = {name: getattr(self, name) for name in _KEEPALIVE_FIELDS}
+        if host is not None:
+            settings.update(self.host_keepalive.get(host, {}))
+        options = list(HTTPConnection.default_socket_options)
+        if settings['keepalive']:
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            # 以下选项并非所有平台都支持
+            for name, value in (('TCP_KEEPIDLE', settings['keepalive_idle']),
+                                ('TCP_KEEPINTVL', settings['keepalive_interval']),
+                                ('TCP_KEEPCNT', settings['keepalive_count'])):
+                if hasattr(socket, name):
+                    options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+        return options
+
+
+class PoolStats:
+    """
+    连接池统计，线程安全
+
+    opened: 需要新建TCP（及TLS）连接的请求数
+    reused: 复用已有keep-alive连接的请求数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, host: str, reused: bool):
+        key = 'reused' if reused else 'opened'
+        with self._lock:
+            counters = self._hosts.setdefault(host, {'opened': 0, 'reused': 0})
+            counters[key] += 1
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回统计快照：总计及按主机的明细"""
+        with self._lock:
+            hosts = {host: dict(counters) for host, counters in self._hosts.items()}
+        opened = sum(c['opened'] for c in hosts.values())
+        reused = sum(c['reused'] for c in hosts.values())
+        return {'opened': opened, 'reused': reused, 'requests': opened + reused, 'hosts': hosts}
+
+
+_stats = PoolStats()
+
+
+class _CachedDNSMixin:
+    """
+    建立连接时通过进程内DNS缓存解析主机名，依次尝试解析出的每个地址，
+    TLS的SNI和证书校验仍使用原主机名
+
+    DNS解析和TCP建连的耗时计入当前请求的耗时分解
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        with timed_phase('dns'):
+            addresses = dns_cache.resolve(host, self.port)
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    with timed_phase('connect'):
+                        return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            # 全部地址都连接失败，缓存的地址可能已失效，下次重新解析
+            dns_cache.invalidate(host, self.port)
+            raise error
+        finally:
+            self._dns_host = host
+
+
+class _CachedDNSHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+
+    def connect(self):
+        # connect包含DNS、TCP建连和TLS握手，扣除前两者即为TLS耗时
+        timing = current_timing()
+        before = timing.dns + timing.connect if timing else 0.0
+        start = time.perf_counter()
+        super().connect()
+        if timing is not None:
+            elapsed = (time.perf_counter() - start) * 1000
+            timing.add('tls', max(0.0, elapsed - (timing.dns + timing.connect - before)) / 1000)
+
+
+class _CountingPoolMixin:
+    """在发送请求前判断连接是否已建立，记录新建/复用次数"""
+
+    def _make_request(self, conn, *args, **kwargs):
+        _stats.record(f"{self.host}:{self.port}", getattr(conn, 'sock', None) is not None)
+        return super()._make_request(conn, *args, **kwargs)
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+
+class _SharedPoolManager(PoolManager):
+    """支持按主机设置连接数上限和keep-alive参数的PoolManager"""
+
+    def __init__(self, config: PoolConfig, **kwargs):
+        super().__init__(socket_options=config.socket_options(), **kwargs)
+        self.pool_config = config
+        self.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        # 连接池的键包含maxsize，扩容后仍按原键查找，新建的连接池在这里按当前配置设置上限
+        config = self.pool_config
+        request_context = dict(request_context or self.connection_pool_kw)
+        request_context['maxsize'] = config.host_maxsize.get(host, config.pool_maxsize)
+        if host in config.host_keepalive:
+            request_context['socket_options'] = config.socket_options(host)
+        pool = super()._new_pool(scheme, host, port, dict(request_context))
+        # 扩容时按相同的参数新建连接池
+        pool.creation_args = (scheme, host, port, request_context)
+        return pool
+
+    def grow(self):
+        """
+        已创建的连接池按当前配置的上限扩容，按主机设置了上限的除外
+
+        在管理器的锁内按新上限新建连接池并替换旧池，旧池中空闲的keep-alive连接移到新池；
+        替换期间的请求等待锁，之后都从新池取连接，正在使用的连接归还时随旧池关闭
+        """
+        maxsize = self.pool_config.pool_maxsize
+        with self.pools.lock:
+            for key in self.pools.keys():
+                pool = self.pools[key]
+                if pool.host in self.pool_config.host_maxsize or pool.pool is None or pool.pool.maxsize >= maxsize:
+                    continue
+                grown = self._new_pool(*pool.creation_args)
+                self._move_idle(pool, grown)
+                self.pools[key] = grown
+                pool.close()
+
+    @staticmethod
+    def _move_idle(old, new):
+        """把旧池中空闲的连接移到新池：新池的槽位都是未建立连接的None，先腾出同样多的槽位再放入连接"""
+        idle = []
+        while True:
+            try:
+                conn = old.pool.get(block=False)
+            except queue.Empty:
+                break
+            if conn is not None:
+                idle.append(conn)
+        for _ in idle:
+            new.pool.get(block=False)
+        # 后进先出，先放入的连接最后取出，保持旧池中的顺序
+        for conn in reversed(idle):
+            new.pool.put(conn, block=False)
+
+
+class SharedPoolAdapter(HTTPAdapter):
+    """
+    进程内共享的HTTP适配器
+
+    通过 create_session 创建的会话都使用它的连接池，
+    因而共享底层的keep-alive连接，避免每个测试重新进行TCP/TLS握手。
+    使用中的会话（以及keep_connections）各持有一个引用，引用全部释放后关闭空闲连接
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['pool_config']
+
+    def __init__(self, config: PoolConfig):
+        self.pool_config = config
+        self._users = 0
+        self._users_lock = threading.Lock()
+        super().__init__(pool_connections=config.pool_connections,
+                         pool_maxsize=config.pool_maxsize,
+                         pool_block=config.pool_block)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _SharedPoolManager(
+            self.pool_config,
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            **pool_kwargs,
+        )
+
+    def acquire(self):
+        with self._users_lock:
+            self._users += 1
+
+    def release(self):
+        with self._users_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+        # 没有会话在使用，关闭全部空闲连接，之后的请求重新建立连接
+        logger.debug("共享连接池没有使用者，关闭空闲连接")
+        self.poolmanager.clear()
+
+    def shutdown(self):
+        """关闭共享连接池中的全部连接"""
+        super().close()
+
+
+class _SessionAdapter(HTTPAdapter):
+    """
+    单个会话挂载的适配器，使用共享适配器的连接池
+
+    会话关闭（或被回收）时释放对共享连接池的引用，不关闭其他会话仍在使用的连接
+    """
+
+    def __init__(self, shared: SharedPoolAdapter):
+        self.shared = shared
+        self._closed = False
+        shared.acquire()
+        super().__init__()
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self.poolmanager = self.shared.poolmanager
+
+    def close(self):
+        # 会话对每个挂载前缀都会调用一次close
+        if self._closed:
+            return
+        self._closed = True
+        for proxy in self.proxy_manager.values():
+            proxy.clear()
+        self.shared.release()
+
+
+_lock = threading.Lock()
+_config = PoolConfig()
+_adapter = None
+
+
+def configure_pool(**options) -> PoolConfig:
+    """
+    修改共享连接池配置，已建立的连接会被关闭，之后的请求按新配置建立连接
+
+    应在启动时、创建会话之前调用：已挂载旧适配器的会话不会切换到新适配器。
+    运行中只需要提高连接数上限时使用 grow_pool
+
+    Args:
+        **options: PoolConfig中的字段
+
+    Returns:
+        PoolConfig: 生效的配置
+    """
+    global _config, _adapter
+    with _lock:
+        for key in options:
+            if not hasattr(_config, key):
+                raise ValueError(f"未知的连接池配置项: {key}")
+        _config = PoolConfig(**{**_config.__dict__, **options})
+        dns_cache.ttl = _config.dns_cache_ttl
+        if _adapter is not None:
+            _adapter.shutdown()
+            _adapter = None
+    logger.info(f"连接池配置: {_config}")
+    return _config
+
+
+def grow_pool(maxsize: int) -> PoolConfig:
+    """
+    把默认的每主机连接数上限提高到maxsize（不会降低）
+
+    共享适配器中已创建的连接池替换为更大的连接池，已挂载的会话、空闲的keep-alive连接和连接统计都保持不变
+
+    Returns:
+        PoolConfig: 生效的配置
+    """
+    global _config
+    with _lock:
+        if maxsize <= _config.pool_maxsize:
+            return _config
+        # 适配器持有同一个配置对象，之后新建的主机连接池按新上限创建
+        _config.pool_maxsize = maxsize
+        if _adapter is not None:
+            _adapter.poolmanager.grow()
+    logger.info(f"共享连接池的每主机连接数上限提高到 {maxsize}")
+    return _config
+
+
+def get_pool_config() -> PoolConfig:
+    """返回当前的共享连接池配置"""
+    return _config
+
+
+def get_shared_adapter() -> SharedPoolAdapter:
+    """获取进程内共享的适配器，首次调用时创建"""
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = SharedPoolAdapter(_config)
+        return _adapter
+
+
+def warm_connections(url: str, count: int = 1) -> int:
+    """
+    预先建立到目标主机的keep-alive连接并放回共享连接池
+
+    Args:
+        url: 目标地址，只使用其协议、主机和端口
+        count: 建立的连接数，不超过该主机连接池上限
+
+    Returns:
+        int: 成功建立的连接数
+    """
+    adapter = get_shared_adapter()
+    # 与requests发送请求时使用相同的方式（含环境变量中的证书配置）选取连接池，保证预热的连接会被复用
+    settings = requests.Session().merge_environment_settings(url, {}, None, None, None)
+    if hasattr(adapter, 'get_connection_with_tls_context'):
+        pool = adapter.get_connection_with_tls_context(
+            requests.Request('GET', url).prepare(),
+            verify=settings['verify'],
+            proxies=settings['proxies'],
+            cert=settings['cert'],
+        )
+    else:
+        pool = adapter.get_connection(url, settings['proxies'])
+    count = min(count, pool.pool.maxsize if pool.pool is not None else count)
+    conns, opened = [], 0
+    try:
+        for _ in range(count):
+            conn = pool._get_conn()
+            conns.append(conn)
+            if getattr(conn, 'sock', None) is None:
+                conn.connect()
+                opened += 1
+    finally:
+        for conn in conns:
+            pool._put_conn(conn)
+    return opened
+
+
+def create_session() -> requests.Session:
+    """
+    创建使用共享连接池的会话
+
+    每个会话拥有独立的cookie和默认请求头，只共享底层连接。
+    会话关闭或被回收后不再占用共享连接池，最后一个会话释放时关闭空闲连接
+    """
+    session = requests.Session()
+    adapter = _SessionAdapter(get_shared_adapter())
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # 未显式关闭的会话在回收时释放
+    weakref.finalize(session, adapter.close)
+    return session
+
+
+@contextmanager
+def keep_connections():
+    """在with块内保留共享连接池中的keep-alive连接，即使期间没有会话在使用"""
+    adapter = get_shared_adapter()
+    adapter.acquire()
+    try:
+        yield
+    finally:
+        adapter.release()
+
+
+def pool_stats() -> Dict[str, Any]:
+    """返回连接新建/复用统计"""
+    return _stats.snapshot()
+
+
+def reset_pool_stats():
+    """清空连接统计"""
+    _stats.reset()
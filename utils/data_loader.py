@@ -1,71 +1,230 @@
 import yaml
 import json
 import csv
+import io
 import os
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional, Union
 from dataclasses import dataclass
 import logging
+from functools import partial
+from utils.parse_cache import parse_cache
+from utils.case_index import open_index
 
 logger = logging.getLogger(__name__)
 
+# 优先使用libyaml的C实现
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+_SUPPORTED_EXTENSIONS = ('.yaml', '.yml', '.json', '.jsonl', '.csv')
+
 @dataclass
 class TestCase:
+    # 大规模用例集中会同时存在大量实例，使用__slots__去掉每个实例的__dict__
+    __slots__ = ('case_name', 'description', 'keyword', 'params', 'expected')
     case_name: str
     description: str
     keyword: str
     params: Dict[str, Any]
     expected: Dict[str, Any]
 
+@dataclass(frozen=True)
+class CaseRef:
+    """JSONL用例文件中单个用例的引用，收集阶段只记录位置，执行时再用DataLoader.load_case读取"""
+    file_path: str
+    index: int
+
 class DataLoader:
     @staticmethod
     def load_test_cases(file_path: str) -> List[TestCase]:
         """根据文件扩展名自动选择加载器"""
+        return list(DataLoader.iter_test_cases(file_path))
+    
+    @staticmethod
+    def iter_test_cases(file_path: str) -> Iterator[TestCase]:
+        """
+        逐条读取用例文件，内存占用与文件大小无关
+        
+        - CSV: 逐行读取
+        - JSON Lines(.jsonl): 每行一个用例
+        - YAML: 支持多文档（---分隔），每个文档可以是单个用例或用例列表
+        - JSON: 整个文件为一个用例列表，需要一次性解析，因此走解析缓存，同一文件不会重复解析
+        """
         ext = os.path.splitext(file_path)[1].lower()
+        if ext not in _SUPPORTED_EXTENSIONS:
+            raise ValueError(f"不支持的文件格式: {ext}")
         if ext == '.yaml' or ext == '.yml':
-            return DataLoader._load_yaml(file_path)
+            test_cases = DataLoader._iter_yaml(file_path)
         elif ext == '.json':
-            return DataLoader._load_json(file_path)
-        elif ext == '.csv':
-            return DataLoader._load_csv(file_path)
+            test_cases = map(DataLoader._convert_to_test_case, DataLoader._load_records(file_path))
+        elif ext == '.jsonl':
+            test_cases = DataLoader._iter_jsonl(file_path)
         else:
+            test_cases = DataLoader._iter_csv(file_path)
+        base_dir = os.path.dirname(os.path.abspath(file_path))
+        for test_case in test_cases:
+            DataLoader._resolve_schema(test_case.expected, base_dir)
+            yield test_case
+    
+    @staticmethod
+    def case_names(file_path: str) -> List[str]:
+        """
+        返回JSONL用例文件中全部用例的case_name，只读取索引，不解析用例
+        
+        适合在收集阶段只按名称参数化，执行时再用load_case读取单个用例
+        """
+        return open_index(file_path).names()
+    
+    @staticmethod
+    def case_refs(file_path: str) -> List[CaseRef]:
+        """JSONL用例文件中全部用例的引用，只读取索引"""
+        return [CaseRef(os.path.abspath(file_path), i) for i in range(len(open_index(file_path)))]
+    
+    @staticmethod
+    def load_case(file_path: str, key: Union[int, str]) -> TestCase:
+        """
+        按序号或case_name从JSONL用例文件中读取单个用例
+        
+        首次访问时生成旁路偏移索引（<文件>.idx），之后只解析目标行
+        """
+        test_case = DataLoader._convert_to_test_case(open_index(file_path).get(key))
+        DataLoader._resolve_schema(test_case.expected, os.path.dirname(os.path.abspath(file_path)))
+        return test_case
+    
+    @staticmethod
+    def _resolve_schema(expected: Any, base_dir: str):
+        """把期望结果中schema的相对路径解析为相对于用例文件所在目录的绝对路径"""
+        if not isinstance(expected, dict):
+            return
+        schema = expected.get('schema')
+        if isinstance(schema, str) and not os.path.isabs(schema):
+            expected['schema'] = os.path.join(base_dir, schema)
+    
+    @staticmethod
+    def _resolve_case_schemas(cases: List[Dict[str, Any]], file_path: str) -> List[Dict[str, Any]]:
+        """解析原始用例中 expected / expected_response 里的schema路径"""
+        base_dir = os.path.dirname(os.path.abspath(file_path))
+        for case in cases:
+            if isinstance(case, dict):
+                DataLoader._resolve_schema(case.get('expected'), base_dir)
+                DataLoader._resolve_schema(case.get('expected_response'), base_dir)
+        return cases
+    
+    @staticmethod
+    def load_schema(file_path: str) -> Dict[str, Any]:
+        """
+        加载JSON Schema文件（JSON或YAML）
+        
+        通过解析缓存读取，文件修改后重新解析；返回的对象每次都是新的，
+        需要复用时缓存schema_validator编译后的校验函数
+        
+        Args:
+            file_path: schema文件的绝对路径
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        return parse_cache.load(file_path, partial(DataLoader._parse_schema, ext), kind=f'schema{ext}')
+    
+    @staticmethod
+    def _parse_schema(ext: str, text: str) -> Any:
+        if ext in ('.yaml', '.yml'):
+            return yaml.load(text, Loader=_YAML_LOADER)
+        return json.loads(text)
+    
+    @staticmethod
+    def load_raw(file_path: str) -> List[Dict[str, Any]]:
+        """
+        按原始字典加载用例文件，不转换为TestCase
+        
+        适用于直接描述url/method等请求字段的用例，CSV中的params/expected列会解析为JSON
+        """
+        data = DataLoader._load_records(file_path)
+        if file_path.lower().endswith('.csv'):
+            for row in data:
+                for column in ('params', 'expected'):
+                    if row.get(column):
+                        row[column] = json.loads(row[column].strip())
+        return DataLoader._resolve_case_schemas(data, file_path)
+    
+    @staticmethod
+    def load_yaml(file_path: str) -> List[Dict[str, Any]]:
+        """加载YAML用例文件（支持多文档），返回原始字典列表"""
+        return DataLoader._resolve_case_schemas(DataLoader._load_records(file_path), file_path)
+    
+    @staticmethod
+    def _load_records(file_path: str) -> Any:
+        """通过解析缓存读取文件中的原始记录，返回的对象每次都是新的，可以直接修改"""
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext not in _SUPPORTED_EXTENSIONS:
             raise ValueError(f"不支持的文件格式: {ext}")
+        return parse_cache.load(file_path, partial(DataLoader._parse_records, ext), kind=ext)
     
     @staticmethod
-    def _load_yaml(file_path: str) -> List[TestCase]:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-            return [DataLoader._convert_to_test_case(case) for case in data]
+    def _parse_records(ext: str, text: str) -> Any:
+        """把文件文本解析为原始记录：YAML多文档展开为用例列表，CSV为逐行的字符串字典"""
+        if ext == '.yaml' or ext == '.yml':
+            data = []
+            for document in yaml.load_all(text, Loader=_YAML_LOADER):
+                if isinstance(document, dict):
+                    data.append(document)
+                elif document:
+                    data.extend(document)
+            return data
+        if ext == '.json':
+            return json.loads(text)
+        if ext == '.jsonl':
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        return list(csv.DictReader(io.StringIO(text), dialect='excel'))
     
     @staticmethod
-    def _load_json(file_path: str) -> List[TestCase]:
+    def _iter_yaml(file_path: str) -> Iterator[TestCase]:
         with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return [DataLoader._convert_to_test_case(case) for case in data]
+            for document in yaml.load_all(f, Loader=_YAML_LOADER):
+                if document is None:
+                    continue
+                if isinstance(document, dict):
+                    yield DataLoader._convert_to_test_case(document)
+                else:
+                    for case in document:
+                        yield DataLoader._convert_to_test_case(case)
     
     @staticmethod
-    def _load_csv(file_path: str) -> List[TestCase]:
-        test_cases = []
+    def _iter_jsonl(file_path: str) -> Iterator[TestCase]:
         with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, dialect='excel')
-            for row in reader:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
                 try:
-                    params = json.loads(row['params'].strip())
-                    expected = json.loads(row['expected'].strip())
-                    test_case = TestCase(
-                        case_name=row['case_name'],
-                        description=row['description'],
-                        keyword=row['keyword'],
-                        params=params,
-                        expected=expected
-                    )
-                    test_cases.append(test_case)
+                    case = json.loads(line)
                 except json.JSONDecodeError as e:
-                    logger.error(f"行数据: {row}")
-                    logger.error(f"params: {row['params']}")
-                    logger.error(f"expected: {row['expected']}")
+                    logger.error(f"第 {line_no} 行解析失败: {line}")
                     logger.error(f"错误: {str(e)}")
                     raise
-        return test_cases
+                yield DataLoader._convert_to_test_case(case)
+    
+    @staticmethod
+    def _iter_csv(file_path: str) -> Iterator[TestCase]:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f, dialect='excel'):
+                yield DataLoader._row_to_test_case(row)
+    
+    @staticmethod
+    def _row_to_test_case(row: Dict[str, str]) -> TestCase:
+        try:
+            params = json.loads(row['params'].strip())
+            expected = json.loads(row['expected'].strip())
+        except json.JSONDecodeError as e:
+            logger.error(f"行数据: {row}")
+            logger.error(f"params: {row['params']}")
+            logger.error(f"expected: {row['expected']}")
+            logger.error(f"错误: {str(e)}")
+            raise
+        return TestCase(
+            case_name=row['case_name'],
+            description=row['description'],
+            keyword=row['keyword'],
+            params=params,
+            expected=expected
+        )
     
     @staticmethod
     def _convert_to_test_case(data: Dict) -> TestCase:
@@ -0,0 +1,237 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import logging
+
+import requests
+
+from utils.async_http_client import CaseResult
+from utils.connection_pool import grow_pool
+from utils.http_client import HTTPClient
+from utils.template import template_variables
+
+logger = logging.getLogger(__name__)
+
+# 用例中会做模板替换的字段
+TEMPLATE_FIELDS = ('url', 'headers', 'params', 'body')
+
+
+class DependencyError(ValueError):
+    """用例之间的依赖关系无法满足：存在循环依赖或引用的变量没有用例提取"""
+
+    def __init__(self, cycles: List[List[str]], missing: List[Tuple[str, str]]):
+        self.cycles = cycles
+        self.missing = missing
+        problems = [f"循环依赖: {' -> '.join(cycle + cycle[:1])}" for cycle in cycles]
+        problems += [f"用例 {case} 引用的变量 {variable} 没有用例提取" for case, variable in missing]
+        super().__init__("用例依赖关系错误:\n" + "\n".join(problems))
+
+
+class UpstreamFailed(RuntimeError):
+    """依赖的用例执行失败或未能提取到变量，当前用例未执行"""
+
+
+def case_variables(case: Dict[str, Any]) -> FrozenSet[str]:
+    """用例请求字段中引用的全部模板变量"""
+    variables = frozenset()
+    for name in TEMPLATE_FIELDS:
+        if name in case:
+            variables |= template_variables(case[name])
+    return variables
+
+
+@dataclass
+class CaseNode:
+    """
+    依赖图中的一个用例
+
+    属性:
+        index: 用例在原列表中的下标
+        name: 用例名称，用于报告
+        consumes: 引用的变量
+        produces: extract提取的变量
+        depends: 依赖的用例下标
+    """
+    index: int
+    case: Dict[str, Any]
+    name: str
+    consumes: FrozenSet[str]
+    produces: FrozenSet[str]
+    depends: Set[int] = field(default_factory=set)
+
+
+class CaseGraph:
+    """
+    由extract和模板变量静态构建的用例依赖图
+
+    用例引用变量v时，依赖它之前最近一个提取v的用例；之前没有时依赖之后第一个提取v的用例；
+    都没有且初始上下文中也没有v时视为缺少生产者。
+    构建时即检查循环依赖和缺少生产者，有问题抛出DependencyError
+
+    属性:
+        nodes: 与输入顺序一致的节点
+        order: 拓扑顺序（无依赖约束时保持原顺序）
+        chains: 互不相关的用例链，每条链内按拓扑顺序排列，链之间可以并行执行
+    """
+
+    def __init__(self, cases: Iterable[Dict[str, Any]], initial_context: Optional[Dict[str, Any]] = None):
+        self.cases = list(cases)
+        self.initial = frozenset(initial_context or ())
+        self.nodes = [
+            CaseNode(i, case, str(case.get('case_name') or f"#{i + 1}"),
+                     case_variables(case), frozenset(case.get('extract') or ()))
+            for i, case in enumerate(self.cases)
+        ]
+        missing = self._link()
+        self.order, cycles = self._toposort()
+        if cycles or missing:
+            raise DependencyError(cycles, missing)
+        self.chains = self._chains()
+
+    def _link(self) -> List[Tuple[str, str]]:
+        producers: Dict[str, List[int]] = {}
+        for node in self.nodes:
+            for variable in node.produces:
+                producers.setdefault(variable, []).append(node.index)
+        missing = []
+        for node in self.nodes:
+            for variable in sorted(node.consumes):
+                candidates = [i for i in producers.get(variable, ()) if i != node.index]
+                before = [i for i in candidates if i < node.index]
+                if before:
+                    node.depends.add(before[-1])
+                elif candidates:
+                    node.depends.add(candidates[0])
+                elif variable not in self.initial:
+                    missing.append((node.name, variable))
+        return missing
+
+    def _toposort(self) -> Tuple[List[int], List[List[str]]]:
+        """Kahn算法，同时就绪的用例按原顺序执行；剩余无法排序的节点即处于环中"""
+        remaining = {node.index: len(node.depends) for node in self.nodes}
+        dependents: Dict[int, List[int]] = {node.index: [] for node in self.nodes}
+        for node in self.nodes:
+            for dep in node.depends:
+                dependents[dep].append(node.index)
+        order = []
+        ready = sorted(i for i, count in remaining.items() if count == 0)
+        while ready:
+            index = ready.pop(0)
+            order.append(index)
+            for dependent in dependents[index]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+            ready.sort()
+        blocked = {i for i, count in remaining.items() if count > 0}
+        return order, self._find_cycles(blocked) if blocked else []
+
+    def _find_cycles(self, blocked: Set[int]) -> List[List[str]]:
+        """在无法排序的节点中找出各个环，用于报告"""
+        cycles, seen = [], set()
+        for start in sorted(blocked):
+            if start in seen:
+                continue
+            path, position, index = [], {}, start
+            # 每个阻塞节点至少有一个阻塞的依赖，沿依赖走下去必然回到路径上的某个节点
+            while index not in position and index not in seen:
+                position[index] = len(path)
+                path.append(index)
+                index = min(dep for dep in self.nodes[index].depends if dep in blocked)
+            if index in position:
+                cycles.append([self.nodes[i].name for i in path[position[index]:]])
+            seen.update(path)
+        return cycles
+
+    def _chains(self) -> List[List[int]]:
+        """按依赖关系把用例划分为互不相关的链（弱连通分量）"""
+        parent = list(range(len(self.nodes)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for node in self.nodes:
+            for dep in node.depends:
+                parent[find(dep)] = find(node.index)
+        chains: Dict[int, List[int]] = {}
+        for index in self.order:
+            chains.setdefault(find(index), []).append(index)
+        return sorted(chains.values(), key=lambda chain: chain[0])
+
+    def ordered_cases(self) -> List[Dict[str, Any]]:
+        """按拓扑顺序排列的用例，串行执行时使用"""
+        return [self.cases[i] for i in self.order]
+
+
+def _run_chain(graph: CaseGraph, chain: List[int], context: Dict[str, Any],
+               session: Optional[requests.Session]) -> List[CaseResult]:
+    """在独立上下文中按顺序执行一条用例链，上游失败时跳过依赖它的用例"""
+    client = HTTPClient(session=session, context=dict(context))
+    failed: Set[int] = set()
+    results = []
+    for index in chain:
+        node = graph.nodes[index]
+        upstream = sorted(graph.nodes[dep].name for dep in node.depends if dep in failed)
+        if upstream:
+            failed.add(index)
+            results.append(CaseResult(node.case, error=UpstreamFailed(f"依赖的用例执行失败: {', '.join(upstream)}")))
+            continue
+        snapshot = dict(client.context)
+        start = time.perf_counter()
+        try:
+            response = client.send_request(node.case)
+        except Exception as e:
+            failed.add(index)
+            results.append(CaseResult(node.case, error=e, elapsed=time.perf_counter() - start, context=snapshot))
+            continue
+        if not node.produces.issubset(client.context):
+            # 没有提取到变量时，依赖它的用例无法执行
+            logger.warning(f"用例 {node.name} 未提取到变量: {', '.join(sorted(node.produces - set(client.context)))}")
+            failed.add(index)
+        results.append(CaseResult(node.case, response=response, elapsed=time.perf_counter() - start, context=snapshot))
+    return results
+
+
+def run_graph(graph: CaseGraph, max_concurrency: int = 10, context: Optional[Dict[str, Any]] = None,
+              session: Optional[requests.Session] = None) -> List[CaseResult]:
+    """
+    按依赖图执行用例：互不相关的用例链并行执行，每条链使用独立的上下文，链内按依赖顺序串行
+
+    并行只发生在链（弱连通分量）之间：同一个生产者的多个消费者属于同一条链，
+    即使它们互不依赖也按拓扑顺序串行执行
+
+    Args:
+        graph: 用例依赖图
+        max_concurrency: 同时执行的用例链数
+        context: 初始上下文，每条链各复制一份
+        session: 可选的共享会话
+
+    Returns:
+        List[CaseResult]: 与输入用例顺序一致的执行结果，
+            context属性为该用例执行前的上下文快照
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"并发数必须大于0: {max_concurrency}")
+    context = context or {}
+    workers = min(max_concurrency, len(graph.chains)) or 1
+    # 原地扩容共享连接池以匹配并发数，已预热的连接继续复用
+    grow_pool(workers)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="case-chain") as executor:
+        futures = [executor.submit(_run_chain, graph, chain, context, session) for chain in graph.chains]
+    results: List[Optional[CaseResult]] = [None] * len(graph.nodes)
+    for chain, future in zip(graph.chains, futures):
+        error = future.exception()
+        if error is not None:
+            for index in chain:
+                results[index] = CaseResult(graph.nodes[index].case, error=error)
+            continue
+        for index, result in zip(chain, future.result()):
+            results[index] = result
+    logger.info(f"按依赖图执行 {len(graph.nodes)} 个用例（{len(graph.chains)} 条链）完成，并发数 {workers}，"
+                f"总耗时 {time.perf_counter() - start:.3f}s")
+    return results
@@ -0,0 +1,91 @@
+import ipaddress
+import socket
+import threading
+import time
+from typing import Dict, List, Tuple, Any
+import logging
+
+from urllib3.util.connection import allowed_gai_family
+
+logger = logging.getLogger(__name__)
+
+
+class DNSCache:
+    """
+    带TTL的进程内DNS缓存，线程安全
+
+    共享连接池在建立新连接前通过它解析主机名，
+    并行执行时同一主机在TTL内只解析一次
+
+    属性:
+        ttl (float): 缓存有效期（秒），小于等于0时不缓存
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int, int], Tuple[List[str], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _is_ip(host: str) -> bool:
+        try:
+            ipaddress.ip_address(host.strip('[]'))
+            return True
+        except ValueError:
+            return False
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """
+        解析主机名，返回全部地址，顺序与getaddrinfo一致
+
+        地址族与urllib3一致（allowed_gai_family：本机不支持IPv6时只解析IPv4），
+        建立连接时依次尝试每个地址
+
+        Args:
+            host: 主机名或IP
+            port: 端口
+
+        Returns:
+            List[str]: IP地址列表，host本身是IP或不缓存时为 [host]
+
+        Raises:
+            socket.gaierror: 解析失败
+        """
+        if self.ttl <= 0 or self._is_ip(host):
+            return [host]
+        family = allowed_gai_family()
+        key = (host, port, family)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+        # 解析在锁外进行，避免慢查询阻塞其他主机
+        infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (addresses, now + self.ttl)
+        logger.debug(f"DNS解析: {host} -> {', '.join(addresses)}")
+        return addresses
+
+    def invalidate(self, host: str, port: int = None):
+        """使某个主机的缓存失效，port为空时清除该主机所有端口"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == host and (port is None or k[1] == port)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+dns_cache = DNSCache()
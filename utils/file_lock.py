@@ -0,0 +1,55 @@
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，改用msvcrt.locking
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# 当前平台是否支持跨进程文件锁，不支持时file_lock只是空操作，多进程同时写入时以最后写入为准
+LOCKING_SUPPORTED = fcntl is not None or msvcrt is not None
+
+
+def _lock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        # LK_LOCK重试10次（约10秒）后仍失败时抛出OSError，持有锁的进程可能很慢，继续等待
+        lock_file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                time.sleep(0.05)
+
+
+def _unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    跨进程排他锁，锁文件为 path + '.lock'，POSIX下使用flock，Windows下使用msvcrt.locking
+
+    Args:
+        path: 需要保护的文件路径
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.lock', 'w') as lock_file:
+        _lock(lock_file)
+        try:
+            yield
+        finally:
+            _unlock(lock_file)
@@ -0,0 +1,186 @@
+import ast
+import dataclasses
+import hashlib
+import inspect
+import json
+import os
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional, Set
+import logging
+
+from utils.data_loader import CaseRef, DataLoader
+from utils.file_lock import file_lock
+from utils.parse_cache import cache_root
+
+logger = logging.getLogger(__name__)
+
+_UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 缓存目录下的执行结果记录文件名
+RESULTS_FILE = 'results.json'
+
+# 请求发送和断言的入口模块，它们导入的utils模块都计入http_client_version
+_VERSIONED_MODULES = ('http_client', 'assertion')
+
+
+def _digest(*parts: Any) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _utils_imports(name: str) -> Set[str]:
+    """utils下的模块直接导入的utils模块（包括函数内的延迟导入）"""
+    try:
+        with open(os.path.join(_UTILS_DIR, name + '.py'), 'rb') as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError):
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == 'utils':
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and (node.module or '').startswith('utils.'):
+            names.add(node.module.split('.')[1])
+        elif isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[1] for alias in node.names if alias.name.startswith('utils.'))
+    return {n for n in names if os.path.isfile(os.path.join(_UTILS_DIR, n + '.py'))}
+
+
+@lru_cache(maxsize=None)
+def http_client_version() -> str:
+    """
+    HTTPClient的代码版本
+
+    utils/http_client.py、utils/assertion.py以及它们直接或间接导入的utils模块
+    （模板、响应视图、连接池、磁带、熔断、限流、地址改写等）的内容哈希，任一模块变化版本即变化
+    """
+    modules, pending = set(), list(_VERSIONED_MODULES)
+    while pending:
+        name = pending.pop()
+        if name not in modules:
+            modules.add(name)
+            pending.extend(_utils_imports(name))
+    parts = []
+    for name in sorted(modules):
+        parts.append(name)
+        parts.append(_file_version(os.path.join(_UTILS_DIR, name + '.py')))
+    return _digest(*parts)
+
+
+@lru_cache(maxsize=None)
+def keyword_version(keyword: str) -> str:
+    """utils/keywords.py中关键字实现的源码哈希，关键字不存在时为空字符串"""
+    from utils.keywords import Keywords
+
+    func = getattr(Keywords, keyword, None)
+    if func is None:
+        return ''
+    try:
+        return _digest(inspect.getsource(func))
+    except (OSError, TypeError):
+        return ''
+
+
+@lru_cache(maxsize=None)
+def _function_version(func) -> str:
+    try:
+        return _digest(inspect.getsource(func))
+    except (OSError, TypeError):
+        return ''
+
+
+def _file_version(path: str) -> str:
+    try:
+        with open(path, 'rb') as f:
+            return _digest(f.read())
+    except OSError:
+        return ''
+
+
+def _entry(value: Any) -> Any:
+    """用例条目转换为可序列化的字典，JSONL用例的引用按引用位置的当前内容计算"""
+    if isinstance(value, CaseRef):
+        value = DataLoader.load_case(value.file_path, value.index)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return value
+
+
+def case_fingerprint(item) -> str:
+    """
+    用例指纹
+
+    包含：数据文件中的用例条目、用到的关键字实现、HTTPClient代码版本、
+    测试函数源码，以及期望结果中引用的schema文件内容。任一项变化指纹即变化。
+    setup之后调用时，间接参数化的参数取fixture已经读取的值，不再重复读取用例
+    """
+    parts = [http_client_version(), _function_version(getattr(item, 'function', None))]
+    callspec = getattr(item, 'callspec', None)
+    params = callspec.params if callspec is not None else {}
+    funcargs = getattr(item, 'funcargs', None) or {}
+    for name in sorted(params):
+        entry = _entry(funcargs.get(name, params[name]))
+        parts.append(name)
+        parts.append(json.dumps(entry, sort_keys=True, ensure_ascii=False, default=str))
+        if isinstance(entry, dict):
+            if isinstance(entry.get('keyword'), str):
+                parts.append(keyword_version(entry['keyword']))
+            for key in ('expected', 'expected_response'):
+                expected = entry.get(key)
+                schema = expected.get('schema') if isinstance(expected, dict) else None
+                if isinstance(schema, str):
+                    parts.append(_file_version(schema))
+    return _digest(*parts)
+
+
+class ResultStore:
+    """
+    每个用例最近一次的执行结果和指纹，保存在本地JSON文件中
+
+    多个进程同时保存时通过文件锁串行化读-合并-写
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(cache_root(), RESULTS_FILE)
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取用例执行记录失败，忽略历史数据: {self.path}，{str(e)}")
+            return {}
+
+    def needs_run(self, key: str, fingerprint: str) -> bool:
+        """指纹变化、上次未通过或没有记录时需要执行"""
+        record = self.records.get(key)
+        return record is None or record.get('fingerprint') != fingerprint or record.get('outcome') != 'passed'
+
+    def update(self, results: Dict[str, Dict[str, Any]]):
+        """
+        合并本次执行结果并保存
+
+        Args:
+            results: {用例键: {"fingerprint": ..., "outcome": ...}}
+        """
+        if not results:
+            return
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, file_lock(self.path):
+            records = self._read()
+            for key, result in results.items():
+                records[key] = {**result, 'time': now}
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self.records = records
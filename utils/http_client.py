@@ -2,22 +2,23 @@ import requests
 from typing import Dict, Any
 import logging
 import json
+from urllib.parse import urlsplit
 from utils.ssl_helper import disable_ssl_warnings
-
-try:
-    from jsonpath_ng import parse as jsonpath_parse
-except ImportError:
-    logging.error("jsonpath_ng not found, trying to install...")
-    import subprocess
-    try:
-        subprocess.check_call(["pip", "install", "jsonpath-ng"])
-        from jsonpath_ng import parse as jsonpath_parse
-    except Exception as e:
-        logging.error(f"Failed to install jsonpath_ng: {e}")
-        raise
+from utils.template import render_template, TemplateError
+from utils.response_view import ResponseView
+from utils.connection_pool import create_session
+from utils.timing import RequestTiming, start_timing, stop_timing, endpoint_of, timing_aggregator
+from utils.cassette import active_cassette, normalize_request
+from utils.base_url import rewrite_url
+from utils.circuit_breaker import CONNECTION_ERRORS, NON_RETRYABLE_ERRORS, host_health, http_settings
+from utils import rate_limiter
+import time
 
 logger = logging.getLogger(__name__)
 
+# 按表单发送请求体的Content-Type
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
 class HTTPClient:
     """
     HTTP客户端类，用于处理HTTP请求和响应
@@ -33,15 +34,19 @@ class HTTPClient:
         context (dict): 存储提取的变量，用于参数替换
     """
     
-    def __init__(self):
+    def __init__(self, session: requests.Session = None, context: Dict[str, Any] = None):
         """
         初始化HTTP客户端
-        - 创建会话对象
+        - 创建会话对象，默认挂载进程内共享的连接池
         - 初始化上下文字典
         - 禁用SSL警告
+        
+        Args:
+            session: 可选的会话对象，为空时新建挂载共享连接池的会话
+            context: 可选的初始上下文，为空时新建空字典
         """
-        self.session = requests.Session()
-        self.context = {}
+        self.session = session if session is not None else create_session()
+        self.context = context if context is not None else {}
         disable_ssl_warnings()
     
     def send_request(self, case: Dict[str, Any]) -> requests.Response:
@@ -54,18 +59,21 @@ class HTTPClient:
                 - method: 请求方法（GET, POST等）
                 - headers: 请求头（可选）
                 - params: 查询参数（可选）
-                - body: 请求体（可选）
+                - body: 请求体（可选），请求头Content-Type为application/x-www-form-urlencoded时按表单发送，否则按JSON发送
                 - extract: 需要提取的响应数据（可选）
         
         Returns:
-            requests.Response: 响应对象
+            requests.Response: 响应对象，timing属性为本次请求的耗时分解（RequestTiming）
         
         Raises:
-            requests.exceptions.RequestException: 请求发生错误时抛出
+            requests.exceptions.RequestException: 请求发生错误时抛出，主机熔断时为CircuitOpenError
+            TemplateError: 请求中引用了未定义的变量时抛出
         """
         try:
-            # 处理URL中的动态参数
-            url = self._process_template(case['url'])
+            # 处理URL中的动态参数，并按基础地址替换规则改写（如指向本地httpbin）；
+            # 磁带按改写前的地址记录，不受本地服务临时端口的影响
+            original_url = self._process_template(case['url'])
+            url = rewrite_url(original_url)
             
             # 处理请求参数
             headers = self._process_template(case.get('headers', {}))
@@ -81,15 +89,21 @@ class HTTPClient:
             if body:
                 logger.info(f"请求体: {json.dumps(body, ensure_ascii=False)}")
             
-            # 发送请求
-            response = self.session.request(
-                method=case['method'],
-                url=url,
-                headers=headers,
-                params=params,
-                json=body if body else None,
-                timeout=10  # 添加超时设置
-            )
+            # 回放模式：从磁带中按请求哈希取出录制的响应，不访问网络
+            cassette = active_cassette()
+            if cassette is not None:
+                recorded_request = normalize_request(case['method'], original_url, params, body, headers)
+                if cassette.mode == 'replay':
+                    response = cassette.replay(recorded_request)
+                    response.timing = RequestTiming()
+                    if 'extract' in case:
+                        self._extract_data(response, case['extract'])
+                    return response
+            
+            # 发送请求：主机熔断时直接失败，幂等请求连接失败时按退避策略重试
+            response = self._send_with_retry(case['method'], url, headers, params, body)
+            if cassette is not None:
+                cassette.record(recorded_request, response)
             
             # 提取需要的数据
             if 'extract' in case:
@@ -97,35 +111,114 @@ class HTTPClient:
             
             return response
             
+        except TemplateError as e:
+            logger.error(f"用例 {case.get('case_name', case['url'])} 模板处理失败: {e}")
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"请求发生错误: {str(e)}")
             raise
     
+    def _send_with_retry(self, method: str, url: str, headers: Dict[str, Any], params: Dict[str, Any],
+                         body: Any) -> requests.Response:
+        """
+        按主机熔断状态、限流配置和重试策略发送请求
+        
+        连接失败（建连失败、连接重置、超时）计入所在主机的熔断器；幂等方法在熔断器未打开时
+        按带随机抖动的指数退避重试，非幂等方法不重试。证书和代理错误直接抛出，不重试也不计入熔断。每次实际发出的请求（包括重试）
+        都先从所在主机/路由的令牌桶中取令牌，超出配置的速率时等待
+        
+        Raises:
+            CircuitOpenError: 主机处于熔断状态
+        """
+        breaker = host_health.breaker(urlsplit(url).netloc)
+        attempts = http_settings.attempts(method)
+        for attempt in range(attempts):
+            breaker.before_request()
+            try:
+                rate_limiter.acquire(method, url)
+                response = self._send_once(method, url, headers, params, body)
+            except NON_RETRYABLE_ERRORS:
+                breaker.release()
+                raise
+            except CONNECTION_ERRORS as e:
+                breaker.record_failure(e)
+                if attempt + 1 >= attempts or breaker.is_open:
+                    raise
+                delay = http_settings.backoff_delay(attempt)
+                logger.warning(f"请求连接失败，{delay:.2f}s 后第 {attempt + 1} 次重试: {str(e)}")
+                time.sleep(delay)
+            except BaseException:
+                # 其他异常（响应体解码失败、限流等待被中断等）也要释放半开状态下的探测名额
+                breaker.release()
+                raise
+            else:
+                breaker.record_success()
+                return response
+    
+    def _send_once(self, method: str, url: str, headers: Dict[str, Any], params: Dict[str, Any],
+                   body: Any) -> requests.Response:
+        """发送一次请求，响应头和响应体分开读取以便统计耗时分解"""
+        timing = start_timing()
+        try:
+            start = time.perf_counter()
+            response = self.session.request(
+                method=method,
+                url=url,
+                headers=headers,
+                params=params,
+                **self._body_kwargs(headers, body),
+                timeout=http_settings.timeout,
+                stream=True
+            )
+            headers_received = time.perf_counter()
+            response.content
+            finished = time.perf_counter()
+        finally:
+            stop_timing()
+        timing.ttfb = max(0.0, (headers_received - start) * 1000 - timing.dns - timing.connect - timing.tls)
+        timing.download = (finished - headers_received) * 1000
+        timing.total = (finished - start) * 1000
+        response.timing = timing
+        timing_aggregator.record(endpoint_of(method, url), timing)
+        logger.info(f"请求耗时(ms): {timing.to_dict()}")
+        return response
+    
+    @staticmethod
+    def _body_kwargs(headers: Dict[str, Any], body: Any) -> Dict[str, Any]:
+        """请求头声明为表单编码时按表单发送请求体，否则按JSON发送"""
+        if not body:
+            return {}
+        content_type = next((str(v) for k, v in (headers or {}).items() if k.lower() == 'content-type'), '')
+        if content_type.split(';')[0].strip().lower() == FORM_CONTENT_TYPE and isinstance(body, dict):
+            return {'data': body}
+        return {'json': body}
+    
     def _process_template(self, template: Any) -> Any:
         """
         处理模板中的变量替换
         
         支持在字符串中使用 {variable} 格式的变量，
-        变量值从context中获取
+        变量值从context中获取。模板首次使用时编译并缓存，
+        字典、列表和元组会递归处理
         
         Args:
-            template: 要处理的模板，可以是字符串或字典
+            template: 要处理的模板，可以是字符串、字典、列表或元组
         
         Returns:
             处理后的值，保持原始类型
+        
+        Raises:
+            TemplateError: 模板引用了context中不存在的变量
         """
-        if isinstance(template, str):
-            for key, value in self.context.items():
-                template = template.replace(f"{{{key}}}", str(value))
-            return template
-        elif isinstance(template, dict):
-            return {k: self._process_template(v) for k, v in template.items()}
-        return template
+        return render_template(template, self.context)
     
     def _extract_data(self, response: requests.Response, extract_dict: Dict[str, str]):
         """
         从响应中提取数据并存储到上下文中
         
+        表达式编译结果在进程内缓存；响应体只解析一次，
+        并与断言共用同一个ResponseView，响应头仅在规则用到时才转换
+        
         Args:
             response: 响应对象
             extract_dict: 提取规则字典，格式为 {key: jsonpath表达式}
@@ -136,23 +229,17 @@ class HTTPClient:
                 "user_id": "$.body.user.id"
             }
         """
-        response_data = {
-            'body': response.json(),
-            'headers': dict(response.headers),
-            'status_code': response.status_code
-        }
+        view = ResponseView.of(response)
         
         for key, expr in extract_dict.items():
             if expr.startswith('$.'):
                 try:
-                    jsonpath_expr = jsonpath_parse(expr)
-                    matches = [match.value for match in jsonpath_expr.find(response_data)]
+                    matches = view.find(expr)
                     if matches:
                         self.context[key] = matches[0]
                         logger.info(f"提取数据: {key} = {matches[0]}")
                 except Exception as e:
                     logger.error(f"提取数据失败: {e}")
                     logger.error(f"表达式: {expr}")
-                    logger.error(f"数据: {response_data}")
+                    logger.error(f"响应: {response.status_code} {response.text[:1000]}")
                     raise
-    
\ No newline at end of file
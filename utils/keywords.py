@@ -1,12 +1,27 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import logging
 from utils.http_client import HTTPClient
+from utils.latency import check_latency
+from utils.assertion import compile_expected
 
 logger = logging.getLogger(__name__)
 
+# 发送请求的关键字对应的HTTP方法，压测、契约桩和repeat校验按此确定关键字用例的请求方法
+KEYWORD_METHODS = {'get_request': 'GET', 'post_request': 'POST', 'put_request': 'PUT'}
+
+
+def keyword_method(keyword: str) -> Optional[str]:
+    """关键字发送请求时使用的HTTP方法，不是发送请求的关键字时返回None"""
+    return KEYWORD_METHODS.get(keyword)
+
 class Keywords:
-    def __init__(self):
-        self.http_client = HTTPClient()
+    def __init__(self, http_client: HTTPClient = None):
+        """
+        Args:
+            http_client: 发送请求使用的客户端，为空时新建；发送请求的关键字不提取变量，
+                同一个实例可以在多个线程中共用
+        """
+        self.http_client = http_client if http_client is not None else HTTPClient()
         
     def get_request(self, url: str, params: Dict = None, headers: Dict = None) -> Dict:
         """发送GET请求的关键字"""
@@ -44,7 +59,14 @@ class Keywords:
             f"状态码不匹配，期望 {expected_code}，实际 {response.status_code}"
     
     def verify_response_field(self, response: Dict, field_path: str, expected_value: Any):
-        """验证响应字段的关键字"""
-        actual_value = self.http_client._extract_data(response, {field_path: field_path})
-        assert actual_value == expected_value, \
-            f"字段值不匹配，期望 {expected_value}，实际 {actual_value}" 
\ No newline at end of file
+        """验证响应字段的关键字，字段路径写法同 verify_expected"""
+        compile_expected({field_path: expected_value}).validate(response)
+    
+    def verify_expected(self, response: Dict, expected: Dict, case_name: str = None):
+        """按期望结果一次性验证状态码和所有响应字段，全部不匹配项一并报告"""
+        compile_expected(expected).validate(response, case_name)
+    
+    def verify_latency(self, latencies: List[float], expected: Dict):
+        """验证耗时分布的关键字，支持 max_latency_ms 和 p95_latency_ms"""
+        errors = check_latency(latencies, expected)
+        assert not errors, "耗时不满足要求: " + "；".join(errors)
@@ -0,0 +1,88 @@
+import math
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import requests
+
+from utils.circuit_breaker import IDEMPOTENT_METHODS
+
+# 期望结果中与耗时相关的键，不属于响应字段校验
+LATENCY_KEYS = frozenset({'max_latency_ms', 'p95_latency_ms', 'repeat'})
+
+
+def response_latency_ms(response: requests.Response) -> float:
+    """返回响应的总耗时（毫秒），优先使用HTTPClient记录的耗时分解"""
+    timing = getattr(response, 'timing', None)
+    if timing is not None:
+        return timing.total
+    return response.elapsed.total_seconds() * 1000
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        raise ValueError("没有可计算百分位的数据")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def repeat_count(expected: Dict[str, Any]) -> int:
+    """读取期望结果中的repeat，缺省为1"""
+    repeat = int(expected.get('repeat', 1))
+    if repeat < 1:
+        raise ValueError(f"repeat必须大于0: {repeat}")
+    return repeat
+
+
+def run_repeated(execute: Callable[[], requests.Response], expected: Dict[str, Any],
+                 method: str = 'GET') -> Tuple[requests.Response, List[float]]:
+    """
+    按期望结果中的repeat重复执行用例
+
+    每次执行都会真实发送请求并重新执行extract（以最后一次的结果为准），
+    因此repeat只允许用于幂等方法，POST/PATCH等请求重复发送会产生副作用
+
+    Args:
+        execute: 执行一次用例并返回响应的函数
+        expected: 期望结果
+        method: 用例的请求方法
+
+    Returns:
+        (最后一次的响应, 每次的耗时列表（毫秒）)
+
+    Raises:
+        ValueError: 非幂等方法指定了大于1的repeat
+    """
+    if repeat_count(expected) > 1 and method.upper() not in IDEMPOTENT_METHODS:
+        raise ValueError(f"repeat只能用于幂等方法（{', '.join(sorted(IDEMPOTENT_METHODS))}），当前为 {method}")
+    latencies = []
+    response = None
+    for _ in range(repeat_count(expected)):
+        response = execute()
+        latencies.append(response_latency_ms(response))
+    return response, latencies
+
+
+def check_latency(latencies: Sequence[float], expected: Dict[str, Any]) -> List[str]:
+    """
+    按期望结果校验耗时分布
+
+    支持的键：
+        max_latency_ms: 每次请求的耗时上限
+        p95_latency_ms: 95分位耗时上限，通常与repeat一起使用
+
+    Returns:
+        List[str]: 不满足的项，全部满足时为空列表
+    """
+    errors = []
+    if 'max_latency_ms' in expected:
+        limit = float(expected['max_latency_ms'])
+        worst = max(latencies)
+        if worst > limit:
+            errors.append(f"最大耗时 {worst:.1f}ms 超过上限 {limit:g}ms")
+    if 'p95_latency_ms' in expected:
+        limit = float(expected['p95_latency_ms'])
+        p95 = percentile(latencies, 95)
+        if p95 > limit:
+            errors.append(f"P95耗时 {p95:.1f}ms 超过上限 {limit:g}ms（共 {len(latencies)} 次）")
+    return errors
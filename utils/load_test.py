@@ -0,0 +1,355 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+from utils.data_loader import DataLoader
+from utils.http_client import HTTPClient
+from utils.keywords import Keywords, keyword_method
+from utils.async_http_client import execute_keyword_case
+from utils.dependency import CaseGraph, DependencyError, case_variables
+from utils.prewarm import CASE_FILE_EXTENSIONS
+from utils.connection_pool import create_session, grow_pool
+from utils.template import template_variables
+from utils.timing import endpoint_of
+
+logger = logging.getLogger(__name__)
+
+# 报告中输出的分位数
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    HDR风格的对数-线性直方图，记录单位为微秒
+
+    每个2的幂区间再等分为 2^(precision_bits-1) 个子桶，
+    相对误差不超过 1/2^(precision_bits-1)，内存只与出现过的桶数量相关
+
+    属性:
+        precision_bits (int): 精度位数，默认7位（误差约1.6%）
+        count (int): 记录的样本数
+    """
+
+    def __init__(self, precision_bits: int = 7):
+        self.precision_bits = precision_bits
+        self._half = 1 << (precision_bits - 1)
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.precision_bits
+        if shift <= 0:
+            return value
+        return shift * self._half + (value >> shift)
+
+    def _lower_bound(self, index: int) -> int:
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        return (index - shift * self._half) << shift
+
+    def _upper_bound(self, index: int) -> int:
+        return self._lower_bound(index + 1) - 1
+
+    def record(self, seconds: float):
+        """记录一个耗时（秒）"""
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram'):
+        """合并另一个相同精度的直方图"""
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("只能合并精度相同的直方图")
+        for index, n in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """
+        返回第q百分位的耗时（毫秒），取所在桶的中值
+
+        Args:
+            q: 百分位，0-100
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(q / 100 * self.count + 0.4999)))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                value = (self._lower_bound(index) + self._upper_bound(index)) / 2
+                return min(max(value, self.min), self.max) / 1000
+        return self.max / 1000
+
+    def summary(self) -> Dict[str, float]:
+        """返回常用统计值（毫秒）"""
+        result = {f"p{q:g}": round(self.percentile(q), 3) for q in PERCENTILES}
+        result.update({
+            'min': round((self.min or 0) / 1000, 3),
+            'max': round((self.max or 0) / 1000, 3),
+            'mean': round(self.total / self.count / 1000, 3) if self.count else 0.0,
+        })
+        return result
+
+
+@dataclass
+class LoadStats:
+    """单个用例或接口的压测统计"""
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    requests: int = 0
+    errors: int = 0
+
+    def to_dict(self, duration: float) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / self.requests, 4) if self.requests else 0.0,
+            'throughput': round(self.requests / duration, 2) if duration else 0.0,
+            'latency_ms': self.histogram.summary(),
+        }
+
+
+@dataclass
+class _LoadCase:
+    name: str
+    endpoint: str
+    case: Any
+    keyword: bool
+    expected_status: Any = None
+    # 提取该用例所需变量的上游用例（按依赖顺序），压测开始前执行一次得到context
+    setup: List[Dict[str, Any]] = field(default_factory=list)
+    context: Optional[Dict[str, Any]] = None
+
+
+def parse_duration(text: str) -> float:
+    """
+    解析时长字符串，支持 500ms、60s、2m、1h 以及纯数字（秒）
+
+    Returns:
+        float: 秒数
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*', str(text))
+    if not match:
+        raise ValueError(f"无法解析的时长: {text}")
+    value, unit = float(match.group(1)), match.group(2) or 's'
+    return value * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+
+
+def _upstream(graph: CaseGraph, index: int) -> List[int]:
+    """用例依赖的全部上游用例，按拓扑顺序排列"""
+    closure, pending = set(), list(graph.nodes[index].depends)
+    while pending:
+        dep = pending.pop()
+        if dep not in closure:
+            closure.add(dep)
+            pending.extend(graph.nodes[dep].depends)
+    return [i for i in graph.order if i in closure]
+
+
+def _request_cases(file_name: str, entries: List[Dict[str, Any]]) -> List[_LoadCase]:
+    """
+    直接描述请求的用例（url/method），引用模板变量的用例带上提取这些变量的上游用例；
+    依赖关系无法满足时跳过引用变量的用例
+    """
+    indexed = [(i, entry) for i, entry in enumerate(entries) if 'url' in entry and 'method' in entry]
+    request_entries = [entry for _, entry in indexed]
+    try:
+        graph = CaseGraph(request_entries)
+    except DependencyError as e:
+        logger.warning(f"{file_name} 的用例依赖关系无法满足，跳过引用变量的用例: {e}")
+        graph = None
+    cases = []
+    for position, (i, entry) in enumerate(indexed):
+        name = f"{file_name}::{entry.get('case_name', i)}"
+        if graph is None and case_variables(entry):
+            continue
+        setup = [request_entries[dep] for dep in _upstream(graph, position)] if graph is not None else []
+        expected = entry.get('expected_response', {}).get('status_code')
+        cases.append(_LoadCase(name, endpoint_of(entry['method'], entry['url']), entry, False, expected, setup))
+    return cases
+
+
+def load_cases(paths: Iterable[str]) -> List[_LoadCase]:
+    """
+    从用例文件加载压测用例
+
+    关键字用例（keyword/params）通过Keywords执行，引用模板变量的关键字用例无法提供上下文，跳过；
+    直接描述请求的用例（url/method）通过HTTPClient执行，引用其他用例提取的变量时，
+    压测开始前先按依赖顺序执行一次上游用例，用提取到的变量作为该用例的上下文
+
+    Args:
+        paths: 用例文件或目录
+    """
+    cases = []
+    for path in paths:
+        path = Path(path)
+        files = sorted(p for p in path.rglob('*') if p.suffix.lower() in CASE_FILE_EXTENSIONS) \
+            if path.is_dir() else [path]
+        for file in files:
+            try:
+                entries = DataLoader.load_raw(str(file))
+            except Exception as e:
+                logger.warning(f"加载用例文件失败，跳过: {file}: {e}")
+                continue
+            if not isinstance(entries, list):
+                continue
+            entries = [entry for entry in entries if isinstance(entry, dict)]
+            for i, entry in enumerate(entries):
+                if 'keyword' not in entry:
+                    continue
+                name = f"{file.name}::{entry.get('case_name', i)}"
+                params = entry.get('params', {})
+                if template_variables(params):
+                    logger.warning(f"关键字用例引用了模板变量，无法压测，跳过: {name}")
+                    continue
+                method = keyword_method(entry['keyword'])
+                if method is None:
+                    logger.warning(f"关键字 {entry['keyword']} 不发送请求或请求方法未知，无法压测，跳过: {name}")
+                    continue
+                expected = entry.get('expected', {}).get('status_code')
+                cases.append(_LoadCase(name, endpoint_of(method, params.get('url', '')), entry, True, expected))
+            cases.extend(_request_cases(file.name, entries))
+    return cases
+
+
+class LoadRunner:
+    """
+    开环压测执行器
+
+    按目标RPS固定节奏轮流发出用例请求，不等待上一个请求完成，
+    耗时从计划发出时间开始计算，请求排队造成的延迟也计入结果，避免协同遗漏
+
+    属性:
+        cases: 压测用例
+        rps (float): 目标每秒请求数
+        duration (float): 压测时长（秒）
+        max_workers (int): 同时在途的最大请求数
+    """
+
+    def __init__(self, cases: List[_LoadCase], rps: float, duration: float, max_workers: int = 200):
+        if not cases:
+            raise ValueError("没有可用于压测的用例")
+        if rps <= 0 or duration <= 0:
+            raise ValueError(f"RPS和时长必须大于0: rps={rps}, duration={duration}")
+        self.cases = cases
+        self.rps = rps
+        self.duration = duration
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._by_case: Dict[str, LoadStats] = {}
+        self._by_endpoint: Dict[str, LoadStats] = {}
+        self._total = LoadStats()
+        # 全部请求共用一个会话和Keywords实例，不为每个请求新建
+        self._session = create_session()
+        self._keywords = Keywords(HTTPClient(session=self._session))
+
+    def _record(self, case: _LoadCase, latency: float, error: bool):
+        with self._lock:
+            for stats in (self._by_case.setdefault(case.name, LoadStats()),
+                          self._by_endpoint.setdefault(case.endpoint, LoadStats()),
+                          self._total):
+                stats.requests += 1
+                stats.errors += error
+                stats.histogram.record(latency)
+
+    def _prepare(self):
+        """执行带上游依赖的用例的上游用例，得到这些用例的上下文；上游失败的用例不参与压测"""
+        ready = []
+        for case in self.cases:
+            if case.setup:
+                client = HTTPClient()
+                try:
+                    for upstream in case.setup:
+                        client.send_request(upstream)
+                except Exception as e:
+                    logger.warning(f"上游用例执行失败，{case.name} 不参与压测: {e}")
+                    continue
+                case.context = dict(client.context)
+            ready.append(case)
+        if not ready:
+            raise ValueError("没有可用于压测的用例：全部用例的上游用例执行失败")
+        self.cases = ready
+
+    def _execute(self, case: _LoadCase, scheduled: float):
+        error = False
+        try:
+            if case.keyword:
+                response = execute_keyword_case(case.case, self._keywords)
+            else:
+                response = HTTPClient(session=self._session, context=dict(case.context or {})).send_request(case.case)
+            if case.expected_status is not None:
+                error = response.status_code != case.expected_status
+            else:
+                error = response.status_code >= 400
+        except Exception as e:
+            logger.debug(f"压测请求失败: {case.name}: {e}")
+            error = True
+        self._record(case, time.perf_counter() - scheduled, error)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        执行压测
+
+        Returns:
+            Dict: 压测报告，包含总体、按用例、按接口的请求数、错误率、吞吐量和耗时分位数
+        """
+        self._prepare()
+        interval = 1.0 / self.rps
+        total = int(self.rps * self.duration)
+        # 在途请求数可能达到max_workers，连接池过小会不断丢弃连接重新握手
+        grow_pool(self.max_workers)
+        logger.info(f"开始压测: {len(self.cases)} 个用例，目标 {self.rps:g} RPS，时长 {self.duration:g}s")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="load") as executor:
+            for i in range(total):
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._execute, self.cases[i % len(self.cases)], scheduled)
+        elapsed = time.perf_counter() - start
+        return {
+            'target_rps': self.rps,
+            'duration': round(elapsed, 3),
+            'total': self._total.to_dict(elapsed),
+            'cases': {name: stats.to_dict(elapsed) for name, stats in self._by_case.items()},
+            'endpoints': {name: stats.to_dict(elapsed) for name, stats in self._by_endpoint.items()},
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """将压测报告格式化为文本表格"""
+    header = f"{'名称':<60} {'请求':>8} {'错误率':>8} {'RPS':>8} " + \
+             " ".join(f"{'p' + format(q, 'g'):>9}" for q in PERCENTILES)
+    lines = [f"目标 {report['target_rps']:g} RPS，实际耗时 {report['duration']}s", header]
+
+    def row(name, stats):
+        latency = stats['latency_ms']
+        return f"{name[:60]:<60} {stats['requests']:>8} {stats['error_rate']:>8.2%} {stats['throughput']:>8} " + \
+               " ".join(f"{latency[f'p{q:g}']:>9}" for q in PERCENTILES)
+
+    lines.append(row('总计', report['total']))
+    lines.append('-- 按接口 --')
+    lines.extend(row(name, stats) for name, stats in sorted(report['endpoints'].items()))
+    lines.append('-- 按用例 --')
+    lines.extend(row(name, stats) for name, stats in sorted(report['cases'].items()))
+    return '\n'.join(lines)
@@ -0,0 +1,359 @@
+import asyncio
+import base64
+import inspect
+import json
+import random
+import threading
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 请求头最大长度
+MAX_HEADER_SIZE = 64 * 1024
+
+# /delay 接口的最长延迟（秒），与httpbin一致
+MAX_DELAY = 10
+
+
+class Request:
+    """解析后的HTTP请求"""
+    __slots__ = ('method', 'target', 'path', 'query', 'headers', 'body', 'client')
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes, client: str):
+        self.method = method
+        self.target = target
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query = parts.query
+        self.headers = headers
+        self.body = body
+        self.client = client
+
+    def header(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.headers.get(_title(name), default)
+
+    def args(self) -> Dict[str, Any]:
+        """查询参数，同名参数出现多次时为列表（与httpbin一致）"""
+        return _multi_dict(parse_qsl(self.query, keep_blank_values=True))
+
+
+# 处理函数返回 (状态码, 响应头, 响应体)，可以是普通函数或协程函数
+Response = Tuple[int, Dict[str, str], bytes]
+Handler = Callable[[Request], Union[Response, Awaitable[Response]]]
+
+
+def _title(name: str) -> str:
+    return '-'.join(part.capitalize() for part in name.split('-'))
+
+
+def _multi_dict(pairs: List[Tuple[str, str]]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for key, value in pairs:
+        if key in result:
+            existing = result[key]
+            result[key] = existing + [value] if isinstance(existing, list) else [existing, value]
+        else:
+            result[key] = value
+    return result
+
+
+def json_response(data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    body = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8') + b'\n'
+    return status, {'Content-Type': 'application/json', **(headers or {})}, body
+
+
+class AsyncHTTPServer:
+    """
+    基于asyncio的精简HTTP/1.1服务器
+
+    支持keep-alive和chunked请求体，每个连接上的请求顺序处理。
+    可以在后台线程中运行（start/stop，或作为上下文管理器），也可以在当前线程前台运行（serve）
+    """
+
+    def __init__(self, handler: Handler, host: str = '127.0.0.1', port: int = 0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._writers = set()
+        self._is_coroutine = inspect.iscoroutinefunction(handler) or \
+            inspect.iscoroutinefunction(getattr(handler, '__call__', None))
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _read_request(self, reader: asyncio.StreamReader, client: str) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return None
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                value = value.strip()
+                try:
+                    value = value.encode('latin-1').decode('utf-8')
+                except UnicodeError:
+                    pass
+                headers[_title(name.strip())] = value
+        if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        else:
+            length = int(headers.get('Content-Length') or 0)
+            body = await reader.readexactly(length) if length else b''
+        return Request(method, target, headers, body, client)
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # 跳过trailer直到空行
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername')
+        client = peer[0] if isinstance(peer, tuple) else '127.0.0.1'
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, client)
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                    break
+                if request is None:
+                    break
+                self.requests += 1
+                try:
+                    result = self.handler(request)
+                    status, headers, body = await result if self._is_coroutine else result
+                except Exception as e:
+                    logger.error(f"处理请求失败: {request.method} {request.target}，{e}", exc_info=True)
+                    status, headers, body = json_response({'error': str(e)}, 500)
+                keep_alive = request.header('Connection', '').lower() != 'close'
+                writer.write(self._render(status, headers, body if request.method != 'HEAD' else b'',
+                                          len(body), keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def _render(status: int, headers: Dict[str, str], body: bytes, length: int, keep_alive: bool) -> bytes:
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = 'Unknown'
+        lines = [f"HTTP/1.1 {status} {reason}", f"Content-Length: {length}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + body
+
+    async def _start_server(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_SIZE, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve(self):
+        """在当前事件循环中运行，直到被取消"""
+        await self._start_server()
+        logger.info(f"本地服务已启动: {self.base_url}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self) -> str:
+        """
+        在后台线程中启动，返回基础地址
+
+        Raises:
+            OSError: 监听失败，例如端口已被占用
+        """
+        error: List[BaseException] = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self._start_server())
+            except BaseException as e:
+                # 启动失败时也要通知start()，由调用方线程重新抛出
+                error.append(e)
+                self._loop.close()
+                return
+            finally:
+                self._ready.set()
+            self._loop.run_forever()
+            # 关闭监听和仍保持着的keep-alive连接，等待连接处理协程结束
+            self._server.close()
+            for writer in list(self._writers):
+                writer.transport.abort()
+            tasks = asyncio.all_tasks(self._loop)
+            if tasks:
+                self._loop.run_until_complete(asyncio.wait(tasks, timeout=5))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='loopback-server', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if error:
+            self._thread.join()
+            self._thread = None
+            self._loop = None
+            self._ready.clear()
+            raise error[0]
+        logger.info(f"本地服务已启动: {self.base_url}")
+        return self.base_url
+
+    def stop(self):
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+            logger.info(f"本地服务已停止: {self.base_url}，共处理 {self.requests} 个请求")
+
+    def __enter__(self) -> 'AsyncHTTPServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class HttpbinApp:
+    """
+    httpbin常用接口的本地实现，响应格式与httpbin.org保持一致
+
+    /get /post /put /patch /delete /anything /headers /ip /user-agent
+    /status/{code} /basic-auth/{user}/{passwd} /delay/{n}
+    """
+
+    def __init__(self):
+        self._routes = {
+            '/get': self._get,
+            '/post': self._with_body,
+            '/put': self._with_body,
+            '/patch': self._with_body,
+            '/delete': self._with_body,
+            '/anything': self._with_body,
+            '/headers': lambda request: json_response({'headers': request.headers}),
+            '/ip': lambda request: json_response({'origin': request.client}),
+            '/user-agent': lambda request: json_response({'user-agent': request.header('User-Agent')}),
+        }
+        self._prefixes = {
+            'status': self._status,
+            'basic-auth': self._basic_auth,
+            'anything': self._with_body,
+        }
+
+    async def __call__(self, request: Request) -> Response:
+        handler = self._routes.get(request.path)
+        if handler is not None:
+            return handler(request)
+        parts = request.path.strip('/').split('/')
+        if parts[0] == 'delay' and len(parts) == 2:
+            return await self._delay(request, parts[1])
+        handler = self._prefixes.get(parts[0])
+        if handler is not None and len(parts) > 1:
+            return handler(request, *parts[1:])
+        return json_response({'error': f"not found: {request.path}"}, 404)
+
+    @staticmethod
+    def _url(request: Request) -> str:
+        return f"http://{request.header('Host', '127.0.0.1')}{request.target}"
+
+    def _get(self, request: Request) -> Response:
+        return json_response({
+            'args': request.args(),
+            'headers': request.headers,
+            'origin': request.client,
+            'url': self._url(request),
+        })
+
+    def _with_body(self, request: Request, *_) -> Response:
+        content_type = request.header('Content-Type', '')
+        text = request.body.decode('utf-8', errors='replace')
+        form: Dict[str, Any] = {}
+        data = text
+        if content_type.startswith('application/x-www-form-urlencoded'):
+            form = _multi_dict(parse_qsl(text, keep_blank_values=True))
+            data = ''
+        try:
+            parsed = json.loads(text) if text else None
+        except ValueError:
+            parsed = None
+        return json_response({
+            'args': request.args(),
+            'data': data,
+            'files': {},
+            'form': form,
+            'headers': request.headers,
+            'json': parsed,
+            'method': request.method,
+            'origin': request.client,
+            'url': self._url(request),
+        })
+
+    @staticmethod
+    def _status(request: Request, codes: str, *_) -> Response:
+        """/status/{code}，多个状态码用逗号分隔时随机返回其中一个"""
+        try:
+            code = int(random.choice(codes.split(',')))
+        except ValueError:
+            return json_response({'error': f"invalid status code: {codes}"}, 400)
+        return code, {'Content-Type': 'text/html; charset=utf-8'}, b''
+
+    @staticmethod
+    def _basic_auth(request: Request, user: str = '', passwd: str = '', *_) -> Response:
+        expected = 'Basic ' + base64.b64encode(f"{user}:{passwd}".encode('utf-8')).decode('ascii')
+        if request.header('Authorization') != expected:
+            return 401, {'WWW-Authenticate': 'Basic realm="Fake Realm"'}, b''
+        return json_response({'authenticated': True, 'user': user})
+
+    async def _delay(self, request: Request, seconds: str) -> Response:
+        try:
+            delay = min(float(seconds), MAX_DELAY)
+        except ValueError:
+            return json_response({'error': f"invalid delay: {seconds}"}, 400)
+        await asyncio.sleep(delay)
+        return self._with_body(request)
+
+
+def start_httpbin(host: str = '127.0.0.1', port: int = 0) -> AsyncHTTPServer:
+    """在后台线程中启动本地httpbin服务"""
+    server = AsyncHTTPServer(HttpbinApp(), host, port)
+    server.start()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description="本地httpbin服务，用于离线执行用例和压测客户端")
+    parser.add_argument("--host", default='127.0.0.1', help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    args = parser.parse_args()
+    try:
+        asyncio.run(AsyncHTTPServer(HttpbinApp(), args.host, args.port).serve())
+    except KeyboardInterrupt:
+        logger.info("本地服务已停止")
@@ -0,0 +1,185 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 缓存目录，默认在项目根目录下
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.qa_cache')
+
+
+def cache_root() -> str:
+    """本地缓存根目录，可通过环境变量QA_CACHE_DIR指定"""
+    return os.environ.get('QA_CACHE_DIR') or DEFAULT_CACHE_DIR
+
+
+# 缓存格式版本，解析结果的结构变化时递增，使旧缓存失效
+CACHE_VERSION = 2
+
+
+@dataclass
+class _Entry:
+    size: int
+    mtime_ns: int
+    digest: str
+    # 解析结果的JSON文本，每次读取时解码出新对象，调用方可以随意修改
+    payload: Optional[str]
+    # 无法无损表示为JSON的解析结果（如YAML中的日期、非字符串键），只保存在内存中
+    data: Any = None
+
+    def value(self) -> Any:
+        return json.loads(self.payload) if self.payload is not None else copy.deepcopy(self.data)
+
+
+def _to_json(data: Any) -> Optional[str]:
+    """解析结果可以无损往返JSON时返回JSON文本，否则返回None"""
+    try:
+        payload = json.dumps(data, ensure_ascii=False, allow_nan=False)
+    except (TypeError, ValueError):
+        return None
+    return payload if json.loads(payload) == data else None
+
+
+class ParseCache:
+    """
+    用例数据文件的解析缓存
+
+    以 文件路径 + 解析方式 为键，按 大小、修改时间 判断是否有效；
+    大小或修改时间变化但内容哈希未变时（如touch、重新checkout）直接复用。
+    解析结果以JSON保存在磁盘上，读取缓存不会执行任何代码；
+    同一进程内还会保存在内存中，每个文件在一个进程内最多解析一次。
+    无法无损表示为JSON的解析结果只在进程内缓存
+
+    环境变量：
+        QA_CACHE_DIR: 缓存目录
+        QA_PARSE_CACHE=0: 关闭磁盘缓存（进程内缓存仍然有效）
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, persistent: Optional[bool] = None):
+        base = cache_dir or cache_root()
+        self.cache_dir = os.path.join(base, 'parse')
+        if persistent is None:
+            persistent = os.environ.get('QA_PARSE_CACHE', '1') != '0'
+        self.persistent = persistent
+        self._memory: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _read_entry(self, key: str) -> Optional[_Entry]:
+        """缓存文件第一行为元数据，其余为解析结果的JSON文本"""
+        if not self.persistent:
+            return None
+        try:
+            with open(self._entry_path(key), 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != CACHE_VERSION or header.get('key') != key:
+                    return None
+                payload = f.read()
+            return _Entry(int(header['size']), int(header['mtime_ns']), str(header['digest']), payload)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"读取解析缓存失败，重新解析: {key}，{str(e)}")
+            return None
+
+    def _write_entry(self, key: str, entry: _Entry):
+        if not self.persistent or entry.payload is None:
+            return
+        path = self._entry_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        header = {'version': CACHE_VERSION, 'key': key, 'size': entry.size,
+                  'mtime_ns': entry.mtime_ns, 'digest': entry.digest}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(header, ensure_ascii=False) + '\n')
+                f.write(entry.payload)
+            # 先写临时文件再替换，并发进程不会读到写了一半的缓存
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"写入解析缓存失败: {path}，{str(e)}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def load(self, file_path: str, parse: Callable[[str], Any], kind: str = '') -> Any:
+        """
+        返回文件的解析结果，缓存有效时不再解析
+
+        Args:
+            file_path: 数据文件路径
+            parse: 解析函数，参数为文件文本内容
+            kind: 解析方式标识，同一文件用不同方式解析时互不影响
+        """
+        path = os.path.abspath(file_path)
+        key = f"{kind}:{path}"
+        st = os.stat(path)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None or entry.size != st.st_size or entry.mtime_ns != st.st_mtime_ns:
+            entry = self._read_entry(key)
+            if entry is None or entry.size != st.st_size or entry.mtime_ns != st.st_mtime_ns:
+                entry = self._refresh(key, path, entry, parse)
+            else:
+                self._count_hit()
+            with self._lock:
+                self._memory[key] = entry
+        else:
+            self._count_hit()
+        try:
+            return entry.value()
+        except ValueError as e:
+            # 磁盘上的缓存内容损坏（如被手工修改），丢弃后重新解析
+            logger.warning(f"解析缓存内容无效，重新解析: {key}，{str(e)}")
+            entry = self._refresh(key, path, None, parse)
+            with self._lock:
+                self._memory[key] = entry
+            return entry.value()
+
+    def _refresh(self, key: str, path: str, entry: Optional[_Entry],
+                 parse: Callable[[str], Any]) -> _Entry:
+        """文件元数据变化时按内容哈希判断是否需要重新解析"""
+        with open(path, 'rb') as f:
+            content = f.read()
+        st = os.stat(path)
+        digest = hashlib.sha256(content).hexdigest()
+        if entry is not None and entry.digest == digest:
+            self._count_hit()
+            entry = _Entry(st.st_size, st.st_mtime_ns, digest, entry.payload, entry.data)
+        else:
+            with self._lock:
+                self.misses += 1
+            data = parse(content.decode('utf-8'))
+            payload = _to_json(data)
+            entry = _Entry(st.st_size, st.st_mtime_ns, digest, payload, data if payload is None else None)
+        self._write_entry(key, entry)
+        return entry
+
+    def _count_hit(self):
+        # 预执行等场景会在多个线程中同时加载用例文件
+        with self._lock:
+            self.hits += 1
+
+    def clear(self):
+        """清空内存缓存和磁盘缓存"""
+        with self._lock:
+            self._memory.clear()
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memory)}
+
+
+parse_cache = ParseCache()
@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set
+from urllib.parse import urlsplit
+import logging
+
+from utils.data_loader import DataLoader
+from utils.dns_cache import dns_cache
+from utils.connection_pool import warm_connections
+from utils.base_url import rewrite_url
+
+logger = logging.getLogger(__name__)
+
+# 可以扫描的用例文件格式
+CASE_FILE_EXTENSIONS = ('.yaml', '.yml', '.json', '.jsonl', '.csv')
+
+
+def iter_urls(data: Any) -> Iterable[str]:
+    """递归查找数据中所有url字段的值"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == 'url' and isinstance(value, str):
+                yield value
+            else:
+                yield from iter_urls(value)
+    elif isinstance(data, (list, tuple)):
+        for item in data:
+            yield from iter_urls(item)
+
+
+def origin_of(url: str) -> str:
+    """
+    返回url的协议+主机+端口部分，无法确定主机时返回空字符串
+
+    主机名中含模板变量（如 {host}）的url在执行前无法确定目标，不参与预热；
+    配置了基础地址替换时返回替换后的地址
+    """
+    parts = urlsplit(rewrite_url(url))
+    if parts.scheme not in ('http', 'https') or not parts.hostname or '{' in parts.netloc:
+        return ''
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def collect_origins(paths: Iterable[str]) -> List[str]:
+    """
+    扫描用例文件，收集其中出现的所有目标地址
+
+    同时支持关键字用例（params.url）和直接描述请求的用例（url），
+    目录会递归扫描其中的YAML/JSON/CSV文件
+
+    Args:
+        paths: 用例文件或目录
+
+    Returns:
+        List[str]: 去重后的目标地址，形如 https://httpbin.org
+    """
+    origins: Set[str] = set()
+    for path in paths:
+        path = Path(path)
+        files = sorted(p for p in path.rglob('*') if p.suffix.lower() in CASE_FILE_EXTENSIONS) \
+            if path.is_dir() else [path]
+        for file in files:
+            try:
+                data = DataLoader.load_raw(str(file))
+            except Exception as e:
+                logger.warning(f"扫描用例文件失败，跳过: {file}: {e}")
+                continue
+            origins.update(filter(None, (origin_of(url) for url in iter_urls(data))))
+    return sorted(origins)
+
+
+def prewarm(origins: Iterable[str], connections_per_host: int = 1, max_workers: int = 8) -> Dict[str, Any]:
+    """
+    预解析DNS并建立keep-alive连接放入共享连接池
+
+    失败只记录日志，不影响后续测试执行
+
+    Args:
+        origins: 目标地址列表
+        connections_per_host: 每个主机预先建立的连接数
+        max_workers: 并行预热的线程数
+
+    Returns:
+        Dict: 每个地址的预热结果 {origin: {'connections': n, 'elapsed': s, 'error': str}}
+    """
+    origins = list(origins)
+    if not origins:
+        return {}
+
+    def warm(origin: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        parts = urlsplit(origin)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        try:
+            dns_cache.resolve(parts.hostname, port)
+            opened = warm_connections(origin, connections_per_host)
+            return {'connections': opened, 'elapsed': time.perf_counter() - start}
+        except Exception as e:
+            logger.warning(f"预热连接失败: {origin}: {e}")
+            return {'connections': 0, 'elapsed': time.perf_counter() - start, 'error': str(e)}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(origins))) as executor:
+        results = dict(zip(origins, executor.map(warm, origins)))
+    logger.info(f"连接预热完成: {len(origins)} 个主机，耗时 {time.perf_counter() - start:.3f}s")
+    return results
+
+
+def prewarm_case_files(paths: Iterable[str] = None, extra_urls: Iterable[str] = (),
+                       connections_per_host: int = 1) -> Dict[str, Any]:
+    """
+    扫描用例文件并预热其中的全部目标主机
+
+    Args:
+        paths: 用例文件或目录，默认为 test_cases/test_data
+        extra_urls: 用例文件之外需要预热的url，例如测试参数中的地址
+        connections_per_host: 每个主机预先建立的连接数
+    """
+    if paths is None:
+        paths = [Path(__file__).parent.parent / "test_cases" / "test_data"]
+    origins = set(collect_origins(paths))
+    origins.update(filter(None, (origin_of(url) for url in extra_urls)))
+    return prewarm(sorted(origins), connections_per_host)
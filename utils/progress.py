@@ -0,0 +1,143 @@
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, TextIO, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# pytest -v 输出中每个用例的结果，如 "test_a.py::test_x PASSED  [ 50%]"；
+# 开启log_cli时用例日志会插在中间，结果单独成行
+_RESULT_PATTERN = re.compile(r'(?:::\S*.*\s|^)(PASSED|FAILED|ERROR|SKIPPED|XFAIL|XPASS)(?:\s+\[\s*\d+%\])?\s*$')
+# 收集结果行，如 "collected 10 items / 6 deselected / 4 selected"
+_COLLECTED_PATTERN = re.compile(r'collected (\d+) items?(?: / (\d+) deselected)?(?: / (\d+) selected)?')
+
+_OUTCOMES = {'PASSED': 'passed', 'XPASS': 'passed', 'FAILED': 'failed', 'ERROR': 'error',
+             'SKIPPED': 'skipped', 'XFAIL': 'skipped'}
+
+# 非终端输出时打印进度的间隔（秒）
+LOG_INTERVAL = 10.0
+
+# 执行失败时保留的最后输出行数
+TAIL_LINES = 200
+
+
+class ProgressTracker:
+    """
+    根据pytest -v的输出统计执行进度，线程安全
+
+    终端中在最后一行实时刷新进度（通过/失败/剩余、吞吐量、预计剩余时间），
+    输出被重定向时每隔LOG_INTERVAL秒记录一次进度日志
+    """
+
+    def __init__(self, stream: TextIO = None):
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        self.total = 0
+        self.counts = dict.fromkeys(('passed', 'failed', 'error', 'skipped'), 0)
+        self.start = time.perf_counter()
+        self._last_log = self.start
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> int:
+        return sum(self.counts.values())
+
+    def feed(self, line: str):
+        """处理一行输出：更新统计，原样输出该行并刷新进度"""
+        with self._lock:
+            collected = _COLLECTED_PATTERN.search(line)
+            if collected:
+                total, deselected, selected = (int(g) if g else None for g in collected.groups())
+                self.total += selected if selected is not None else total - (deselected or 0)
+            result = _RESULT_PATTERN.search(line)
+            if result:
+                self.counts[_OUTCOMES[result.group(1)]] += 1
+            if self.tty:
+                # 先清除进度行，再输出内容，最后重绘进度行
+                self.stream.write('\r\033[K' + line.rstrip('\n') + '\n' + self.render())
+                self.stream.flush()
+            else:
+                self.stream.write(line if line.endswith('\n') else line + '\n')
+                now = time.perf_counter()
+                if now - self._last_log >= LOG_INTERVAL:
+                    self._last_log = now
+                    logger.info(self.render())
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.start
+        done = self.done
+        throughput = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - done, 0)
+        return {
+            **self.counts,
+            'total': self.total,
+            'remaining': remaining,
+            'elapsed': round(elapsed, 3),
+            'throughput': round(throughput, 3),
+            'eta': round(remaining / throughput, 1) if throughput > 0 else None,
+        }
+
+    def render(self) -> str:
+        s = self.snapshot()
+        eta = f"{s['eta']:.0f}s" if s['eta'] is not None else '--'
+        return (f"进度 {self.done}/{s['total'] or '?'} | 通过 {s['passed']} 失败 {s['failed']} "
+                f"错误 {s['error']} 跳过 {s['skipped']} | 剩余 {s['remaining']} | "
+                f"{s['throughput']:.1f} 用例/s | 预计剩余 {eta}")
+
+    def finish(self):
+        """结束进度显示"""
+        with self._lock:
+            if self.tty:
+                self.stream.write('\r\033[K' + self.render() + '\n')
+                self.stream.flush()
+            else:
+                logger.info(self.render())
+
+
+def stream_process(cmd: List[str], tracker: ProgressTracker, **popen_kwargs) -> Tuple[int, str]:
+    """
+    启动子进程并逐行转发输出，内存占用与输出总量无关
+
+    标准错误合并到标准输出，只保留最后TAIL_LINES行用于失败时的错误信息
+
+    Returns:
+        (退出码, 最后的输出)
+    """
+    tail: Deque[str] = deque(maxlen=TAIL_LINES)
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                          bufsize=1, **popen_kwargs) as process:
+        for line in process.stdout:
+            tail.append(line)
+            tracker.feed(line)
+        returncode = process.wait()
+    return returncode, ''.join(tail)
+
+
+class EventLog:
+    """
+    JSON Lines格式的执行事件流，每个事件写入后立即刷新，其他工具可以实时tail
+
+    每行为一个JSON对象，包含 event（事件类型）和 time（ISO时间）字段
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        record = {'event': event, 'time': datetime.now().isoformat(timespec='milliseconds'), **fields}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
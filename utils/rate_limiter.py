@@ -0,0 +1,203 @@
+import fnmatch
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+
+import yaml
+
+from utils.file_lock import LOCKING_SUPPORTED, file_lock
+from utils.parse_cache import cache_root
+
+logger = logging.getLogger(__name__)
+
+# 桶状态：当前令牌数、上次更新时间（time.time()）
+_STATE = struct.Struct('<dd')
+
+
+@dataclass(frozen=True)
+class RateRule:
+    host: str
+    rate: float
+    burst: float
+    route: Optional[str] = None
+    methods: Optional[Tuple[str, ...]] = None
+
+    def matches(self, method: str, netloc: str, path: str) -> bool:
+        if self.methods and method not in self.methods:
+            return False
+        # 规则不带端口时只比较主机名
+        target = netloc if ':' in self.host else netloc.rsplit(':', 1)[0]
+        if not fnmatch.fnmatchcase(target, self.host):
+            return False
+        return self.route is None or fnmatch.fnmatchcase(path, self.route)
+
+    @property
+    def rule_id(self) -> str:
+        raw = json.dumps([self.host, self.route, self.methods, self.rate, self.burst])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+class TokenBucket:
+    """
+    状态保存在文件中的令牌桶，同一文件的多个实例（包括其他进程中的实例）共用配额，
+    跨进程共享依赖文件锁（POSIX下flock，Windows下msvcrt.locking）
+
+    取令牌时在文件锁内按经过的时间补充令牌，令牌不足时预约下一个令牌
+    （令牌数记为负数）并在锁外等待，多个等待者按预约顺序依次放行，
+    请求被平滑到配置的速率，同时不浪费任何可用的配额
+    """
+
+    def __init__(self, path: str, rate: float, burst: float):
+        if rate <= 0:
+            raise ValueError(f"限流速率必须大于0: {rate}")
+        self.path = path
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _reserve(self) -> float:
+        """取一个令牌，返回需要等待的秒数"""
+        with self._lock, file_lock(self.path):
+            now = time.time()
+            try:
+                with open(self.path, 'rb') as f:
+                    tokens, updated = _STATE.unpack(f.read(_STATE.size))
+                tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            except (FileNotFoundError, struct.error):
+                tokens = self.burst
+            tokens -= 1
+            with open(self.path, 'wb') as f:
+                f.write(_STATE.pack(tokens, now))
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def acquire(self) -> float:
+        """取一个令牌，必要时等待，返回实际等待的秒数"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """
+    按配置规则为请求选择令牌桶
+
+    配置文件（YAML或JSON）格式::
+
+        rules:
+          - host: api.example.com      # 主机或 主机:端口，支持通配符
+            route: /orders/*           # 可选，路径通配符，不写表示全部路径
+            methods: [POST, PUT]       # 可选，不写表示全部方法
+            rate: 5                    # 每秒令牌数
+            burst: 2                   # 可选，桶容量，默认 max(1, rate)
+          - host: "*.example.com"
+            rate: 50
+
+    规则按顺序匹配，第一条匹配的规则生效，更具体的规则应写在前面；同一条规则对每个主机单独计数。
+    桶的状态保存在缓存目录下，通过文件锁在线程和本机的多个进程（--workers分片、xdist）之间共享；
+    当前平台不支持文件锁时每个进程使用单独的状态目录，限额只在进程内生效
+    """
+
+    def __init__(self, rules: List[RateRule], state_dir: Optional[str] = None):
+        self.rules = rules
+        self.state_dir = state_dir or os.path.join(cache_root(), 'ratelimit')
+        if not LOCKING_SUPPORTED:
+            # 没有文件锁时多个进程并发读写同一个桶文件会互相覆盖，不如各自限流
+            self.state_dir = os.path.join(self.state_dir, f"pid-{os.getpid()}")
+            logger.warning("当前平台不支持文件锁，限流状态不在进程之间共享，多进程运行时总速率可能超过配置")
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.waited = 0.0
+        self.limited = 0
+        self._match = lru_cache(maxsize=4096)(self._find_rule)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], state_dir: Optional[str] = None) -> 'RateLimiter':
+        rules = []
+        for i, item in enumerate(config.get('rules') or ()):
+            if 'host' not in item or 'rate' not in item:
+                raise ValueError(f"限流规则 {i} 缺少host或rate: {item}")
+            rate = float(item['rate'])
+            methods = item.get('methods')
+            rules.append(RateRule(
+                host=str(item['host']).lower(),
+                rate=rate,
+                burst=float(item.get('burst', max(1.0, rate))),
+                route=item.get('route'),
+                methods=tuple(m.upper() for m in methods) if methods else None,
+            ))
+        return cls(rules, state_dir)
+
+    @classmethod
+    def from_file(cls, path: str, state_dir: Optional[str] = None) -> 'RateLimiter':
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+        limiter = cls.from_config(config, state_dir)
+        logger.info(f"已加载限流配置: {path}，共 {len(limiter.rules)} 条规则")
+        return limiter
+
+    def _find_rule(self, method: str, host: str, path: str) -> Optional[RateRule]:
+        for rule in self.rules:
+            if rule.matches(method, host, path):
+                return rule
+        return None
+
+    def bucket_for(self, method: str, url: str) -> Optional[TokenBucket]:
+        parts = urlsplit(url)
+        host = parts.netloc.lower()
+        rule = self._match(method.upper(), host, parts.path or '/')
+        if rule is None:
+            return None
+        key = (rule.rule_id, host)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    name = hashlib.sha1(f"{rule.rule_id}|{host}".encode('utf-8')).hexdigest()[:16]
+                    bucket = self._buckets[key] = TokenBucket(
+                        os.path.join(self.state_dir, name + '.bucket'), rule.rate, rule.burst
+                    )
+        return bucket
+
+    def acquire(self, method: str, url: str) -> float:
+        """请求发出前调用，超出速率时等待，返回等待的秒数"""
+        bucket = self.bucket_for(method, url)
+        if bucket is None:
+            return 0.0
+        wait = bucket.acquire()
+        if wait > 0:
+            with self._lock:
+                self.limited += 1
+                self.waited += wait
+            logger.debug(f"限流等待 {wait * 1000:.1f}ms: {method} {url}")
+        return wait
+
+
+rate_limiter: Optional[RateLimiter] = None
+
+
+def configure(path: Optional[str]):
+    """加载限流配置文件，path为空时关闭限流"""
+    global rate_limiter
+    rate_limiter = RateLimiter.from_file(path) if path else None
+
+
+def acquire(method: str, url: str) -> float:
+    """按当前配置限流，未配置时直接返回"""
+    limiter = rate_limiter
+    return limiter.acquire(method, url) if limiter is not None else 0.0
+
+
+# 环境变量 QA_RATE_LIMITS 指定的配置文件在导入时加载，pytest子进程和分片进程都会读取
+if os.environ.get('QA_RATE_LIMITS'):
+    configure(os.environ['QA_RATE_LIMITS'])
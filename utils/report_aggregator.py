@@ -0,0 +1,337 @@
+import heapq
+import html
+import json
+import os
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESULT_SUFFIX = '-result.json'
+SUMMARY_FILE = 'summary.json'
+INDEX_FILE = 'index.html'
+
+STATUSES = ('passed', 'failed', 'broken', 'skipped', 'unknown')
+
+# 汇总中保留的失败用例数和最慢用例数，超出部分只计数
+MAX_FAILURES = 200
+MAX_SLOWEST = 20
+# 失败信息和堆栈截断长度
+MAX_MESSAGE = 2000
+
+SUMMARY_VERSION = 2
+
+# 结果文件内容不完整且超过该时长（秒）未被修改时视为已损坏，跳过，不再阻塞之后的文件
+INCOMPLETE_GRACE = 60
+
+
+def _empty_summary(result_dir: str) -> Dict[str, Any]:
+    return {
+        'version': SUMMARY_VERSION,
+        'result_dir': result_dir,
+        'total': 0,
+        'statuses': dict.fromkeys(STATUSES, 0),
+        'duration': 0,
+        'start': None,
+        'stop': None,
+        'suites': {},
+        'failures': [],
+        'failures_dropped': 0,
+        'slowest': [],
+        # 已处理结果文件的高水位：最新的修改时间，以及修改时间等于它的文件名
+        'watermark': {'mtime_ns': 0, 'names': []},
+        'updated': None,
+    }
+
+
+def _label(result: Dict[str, Any], *names: str) -> Optional[str]:
+    labels = {label.get('name'): label.get('value') for label in result.get('labels') or ()}
+    for name in names:
+        if labels.get(name):
+            return labels[name]
+    return None
+
+
+def _truncate(text: Optional[str]) -> str:
+    text = text or ''
+    return text if len(text) <= MAX_MESSAGE else text[:MAX_MESSAGE] + '...'
+
+
+class ReportAggregator:
+    """
+    allure结果目录的轻量汇总，不依赖allure命令行和JVM
+
+    逐个读取 *-result.json，只累计计数、耗时和有限条数的失败/最慢用例，
+    内存占用和汇总大小与结果文件数量无关：已处理的文件只记录高水位（最新的修改时间和该时间的文件名）。
+    汇总保存为summary.json，并生成一个静态的index.html。再次调用update时只处理修改时间不早于高水位的新文件
+    """
+
+    def __init__(self, result_dir, output_dir=None):
+        self.result_dir = str(result_dir)
+        self.output_dir = str(output_dir or result_dir)
+        self.summary_path = os.path.join(self.output_dir, SUMMARY_FILE)
+        self.index_path = os.path.join(self.output_dir, INDEX_FILE)
+        self.summary = self._read_summary()
+        watermark = self.summary['watermark']
+        self._watermark = watermark['mtime_ns']
+        self._watermark_names = set(watermark['names'])
+        # 最慢用例用小顶堆维护，堆顶是当前保留的最快的一条
+        self._slowest: List[Tuple[int, str, Dict[str, Any]]] = [
+            (item['duration'], item['file'], item) for item in self.summary['slowest']
+        ]
+        heapq.heapify(self._slowest)
+
+    def _read_summary(self) -> Dict[str, Any]:
+        try:
+            with open(self.summary_path, 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+            if summary.get('version') == SUMMARY_VERSION and summary.get('result_dir') == self.result_dir:
+                return summary
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取报告汇总失败，重新生成: {self.summary_path}，{str(e)}")
+        return _empty_summary(self.result_dir)
+
+    def _pending(self) -> List[Tuple[int, str]]:
+        """高水位之后的结果文件，按 (修改时间, 文件名) 排序"""
+        pending = []
+        try:
+            with os.scandir(self.result_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(RESULT_SUFFIX):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+                    if mtime > self._watermark or (mtime == self._watermark and entry.name not in self._watermark_names):
+                        pending.append((mtime, entry.name))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"结果目录不存在: {self.result_dir}") from None
+        return sorted(pending)
+
+    def _add(self, file_name: str, result: Dict[str, Any]):
+        summary = self.summary
+        status = result.get('status') if result.get('status') in STATUSES else 'unknown'
+        start, stop = result.get('start'), result.get('stop')
+        duration = stop - start if isinstance(start, int) and isinstance(stop, int) else 0
+
+        summary['total'] += 1
+        summary['statuses'][status] += 1
+        summary['duration'] += duration
+        if isinstance(start, int):
+            summary['start'] = start if summary['start'] is None else min(summary['start'], start)
+        if isinstance(stop, int):
+            summary['stop'] = stop if summary['stop'] is None else max(summary['stop'], stop)
+
+        suite = _label(result, 'suite', 'parentSuite', 'feature') or result.get('fullName', '').rsplit('.', 1)[0] or '-'
+        counts = summary['suites'].setdefault(suite, dict.fromkeys(STATUSES, 0))
+        counts[status] += 1
+
+        name = result.get('name') or result.get('fullName') or result.get('uuid', '')
+        if status in ('failed', 'broken'):
+            if len(summary['failures']) < MAX_FAILURES:
+                details = result.get('statusDetails') or {}
+                summary['failures'].append({
+                    'name': name,
+                    'full_name': result.get('fullName'),
+                    'suite': suite,
+                    'status': status,
+                    'message': _truncate(details.get('message')),
+                    'trace': _truncate(details.get('trace')),
+                })
+            else:
+                summary['failures_dropped'] += 1
+
+        item = {'file': file_name, 'name': name, 'suite': suite,
+                'status': status, 'duration': duration}
+        entry = (duration, file_name, item)
+        if len(self._slowest) < MAX_SLOWEST:
+            heapq.heappush(self._slowest, entry)
+        elif entry[:2] > self._slowest[0][:2]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def update(self) -> int:
+        """
+        处理新出现的结果文件，保存汇总并重新生成index.html
+
+        遇到内容不完整（仍在写入）的结果文件时停止，高水位不越过它，下次调用时从它开始重试
+
+        Returns:
+            int: 本次处理的结果文件数
+        """
+        added = skipped = 0
+        for mtime, name in self._pending():
+            try:
+                with open(os.path.join(self.result_dir, name), 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+            except ValueError:
+                if time.time_ns() - mtime < INCOMPLETE_GRACE * 1e9:
+                    logger.debug(f"结果文件不完整，稍后重试: {name}")
+                    break
+                logger.warning(f"结果文件内容无效，已跳过: {name}")
+                result = None
+                skipped += 1
+            except FileNotFoundError:
+                continue
+            if result is not None:
+                self._add(name, result)
+                added += 1
+            if mtime > self._watermark:
+                self._watermark = mtime
+                self._watermark_names = set()
+            self._watermark_names.add(name)
+        if added or skipped or not os.path.exists(self.summary_path):
+            self.save()
+        return added
+
+    def save(self):
+        summary = self.summary
+        summary['slowest'] = [item for _, _, item in sorted(self._slowest, key=lambda e: e[:2], reverse=True)]
+        summary['watermark'] = {'mtime_ns': self._watermark, 'names': sorted(self._watermark_names)}
+        summary['updated'] = datetime.now().isoformat(timespec='seconds')
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._write(self.summary_path, json.dumps(summary, ensure_ascii=False, indent=1))
+        self._write(self.index_path, render_html(summary))
+
+    @staticmethod
+    def _write(path: str, content: str):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+
+def aggregate(result_dir, output_dir=None) -> Dict[str, Any]:
+    """汇总allure结果目录（增量），返回汇总数据"""
+    aggregator = ReportAggregator(result_dir, output_dir)
+    added = aggregator.update()
+    logger.info(f"报告汇总已更新: {aggregator.index_path}，新增 {added} 条，"
+                f"共 {aggregator.summary['total']} 条")
+    return aggregator.summary
+
+
+def start_allure_generate(result_dir, report_dir) -> Optional[subprocess.Popen]:
+    """
+    在后台启动完整的allure generate，不等待结束
+
+    Returns:
+        后台进程；未安装allure时返回None
+    """
+    cmd = ["allure", "generate", str(result_dir), "-o", str(report_dir), "--clean"]
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+    except FileNotFoundError:
+        logger.warning("未找到allure命令，跳过完整Allure报告的生成")
+        return None
+    logger.info(f"已在后台生成完整Allure报告: {report_dir}，pid {process.pid}")
+    return process
+
+
+def _ms(value: int) -> str:
+    return f"{value / 1000:.2f}s"
+
+
+def _time(value: Optional[int]) -> str:
+    return datetime.fromtimestamp(value / 1000).strftime('%Y-%m-%d %H:%M:%S') if value else '-'
+
+
+def render_html(summary: Dict[str, Any]) -> str:
+    """把汇总数据渲染为不依赖外部资源的静态页面"""
+    e = html.escape
+    statuses = summary['statuses']
+    total = summary['total']
+    passed_rate = f"{statuses['passed'] * 100 / total:.1f}%" if total else '-'
+    wall = summary['stop'] - summary['start'] if summary['start'] and summary['stop'] else 0
+
+    status_cells = ''.join(f'<td class="{s}">{statuses[s]}</td>' for s in STATUSES)
+    suite_rows = ''.join(
+        f'<tr><td>{e(suite)}</td>' + ''.join(f'<td class="{s}">{counts[s]}</td>' for s in STATUSES) + '</tr>'
+        for suite, counts in sorted(summary['suites'].items())
+    )
+    failure_rows = ''.join(
+        f'<details><summary class="{f["status"]}">[{e(f["suite"])}] {e(f["name"])}</summary>'
+        f'<pre>{e(f["message"])}</pre><pre>{e(f["trace"])}</pre></details>'
+        for f in summary['failures']
+    )
+    if summary['failures_dropped']:
+        failure_rows += f'<p>另有 {summary["failures_dropped"]} 条失败未列出</p>'
+    slowest_rows = ''.join(
+        f'<tr><td>{e(item["name"])}</td><td>{e(item["suite"])}</td>'
+        f'<td class="{item["status"]}">{item["status"]}</td><td>{_ms(item["duration"])}</td></tr>'
+        for item in summary['slowest']
+    )
+    header = ''.join(f'<th>{s}</th>' for s in STATUSES)
+
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>测试报告汇总</title>
+<style>
+body {{ font-family: -apple-system, "Segoe UI", "Microsoft YaHei", sans-serif; margin: 24px; color: #333; }}
+table {{ border-collapse: collapse; margin-bottom: 24px; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 12px; text-align: left; }}
+th {{ background: #f5f5f5; }}
+pre {{ background: #f8f8f8; padding: 8px; overflow-x: auto; white-space: pre-wrap; }}
+.passed {{ color: #2e7d32; }} .failed {{ color: #c62828; }} .broken {{ color: #ef6c00; }}
+.skipped {{ color: #757575; }} .unknown {{ color: #6a1b9a; }}
+</style>
+</head>
+<body>
+<h1>测试报告汇总</h1>
+<p>结果目录: {e(summary['result_dir'])}<br>
+开始: {_time(summary['start'])} &nbsp; 结束: {_time(summary['stop'])} &nbsp; 更新: {e(summary['updated'] or '-')}</p>
+<table>
+<tr><th>用例总数</th>{header}<th>通过率</th><th>累计耗时</th><th>执行耗时</th></tr>
+<tr><td>{total}</td>{status_cells}<td>{passed_rate}</td><td>{_ms(summary['duration'])}</td><td>{_ms(wall)}</td></tr>
+</table>
+<h2>按套件统计</h2>
+<table>
+<tr><th>套件</th>{header}</tr>
+{suite_rows}
+</table>
+<h2>失败用例</h2>
+{failure_rows or '<p>无</p>'}
+<h2>最慢的 {len(summary['slowest'])} 个用例</h2>
+<table>
+<tr><th>用例</th><th>套件</th><th>状态</th><th>耗时</th></tr>
+{slowest_rows}
+</table>
+</body>
+</html>
+"""
+
+
+def watch(result_dir, output_dir=None, interval: float = 2.0):
+    """持续监视结果目录，有新结果文件时增量更新汇总，Ctrl+C退出"""
+    aggregator = ReportAggregator(result_dir, output_dir)
+    logger.info(f"监视结果目录: {result_dir}，汇总页面: {aggregator.index_path}")
+    try:
+        while True:
+            added = aggregator.update()
+            if added:
+                logger.info(f"新增 {added} 条结果，共 {aggregator.summary['total']} 条")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("已停止监视")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description="汇总allure结果目录，生成summary.json和静态页面")
+    parser.add_argument("result_dir", help="allure结果目录")
+    parser.add_argument("-o", "--output", help="汇总输出目录，默认与结果目录相同")
+    parser.add_argument("--watch", action="store_true", help="持续监视结果目录并增量更新")
+    args = parser.parse_args()
+    if args.watch:
+        watch(args.result_dir, args.output)
+    else:
+        aggregate(args.result_dir, args.output)
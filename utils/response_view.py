@@ -0,0 +1,167 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+import logging
+
+import requests
+
+try:
+    from jsonpath_ng import parse as jsonpath_parse
+except ImportError:
+    logging.error("jsonpath_ng not found, trying to install...")
+    import subprocess
+    try:
+        subprocess.check_call(["pip", "install", "jsonpath-ng"])
+        from jsonpath_ng import parse as jsonpath_parse
+    except Exception as e:
+        logging.error(f"Failed to install jsonpath_ng: {e}")
+        raise
+
+logger = logging.getLogger(__name__)
+
+# 可以直接按键/下标访问的简单路径，例如 $.body.args.name、$.body.items[0].id
+_SIMPLE_PATH = re.compile(r'^\$(?:\.\w+|\[\d+\])+$')
+_SIMPLE_STEP = re.compile(r'\.(\w+)|\[(\d+)\]')
+
+# 响应视图的顶层字段
+VIEW_FIELDS = ('body', 'headers', 'status_code')
+
+_MISSING = object()
+
+
+class _SimplePath:
+    """
+    简单路径的快速实现，不经过jsonpath_ng
+
+    与jsonpath_ng的语义保持一致：字段只在字典上查找，下标只在列表上查找
+    """
+    __slots__ = ('expr', 'steps')
+
+    def __init__(self, expr: str, steps: Tuple[Any, ...]):
+        self.expr = expr
+        self.steps = steps
+
+    @property
+    def root_field(self) -> Any:
+        return self.steps[0]
+
+    def find(self, data: Any) -> List[Any]:
+        for step in self.steps:
+            if isinstance(step, int):
+                if not isinstance(data, list) or step >= len(data):
+                    return []
+            elif not isinstance(data, dict) or step not in data:
+                return []
+            data = data[step]
+        return [data]
+
+
+class _JsonPath:
+    """jsonpath_ng表达式的包装，记录表达式需要用到的响应视图字段"""
+    __slots__ = ('expr', 'parsed', 'fields')
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        self.parsed = jsonpath_parse(expr)
+        # 通配符和递归下降可能匹配任意字段，其余情况只需要表达式中出现的字段
+        if '*' in expr or '..' in expr:
+            self.fields = VIEW_FIELDS
+        else:
+            self.fields = tuple(f for f in VIEW_FIELDS if f in expr) or VIEW_FIELDS
+
+    def find(self, data: Any) -> List[Any]:
+        return [match.value for match in self.parsed.find(data)]
+
+
+@lru_cache(maxsize=1024)
+def compile_jsonpath(expr: str):
+    """
+    编译JSONPath表达式，结果在进程内按LRU缓存
+
+    形如 $.a.b[0].c 的简单路径使用快速实现，其余交给jsonpath_ng
+
+    Args:
+        expr: JSONPath表达式
+
+    Returns:
+        编译后的表达式对象，提供 find(data) -> List[Any]
+    """
+    if _SIMPLE_PATH.match(expr):
+        steps = tuple(int(index) if index else field
+                      for field, index in _SIMPLE_STEP.findall(expr))
+        return _SimplePath(expr, steps)
+    return _JsonPath(expr)
+
+
+class ResponseView:
+    """
+    响应对象的惰性视图，供数据提取和断言共用
+
+    - body: 首次访问时解析JSON，之后复用解析结果
+    - headers: 首次访问时才转换为字典
+    - status_code: 状态码
+
+    同一个响应对象只会创建一个视图，见 ResponseView.of
+    """
+
+    def __init__(self, response: requests.Response):
+        self.response = response
+        self._body = _MISSING
+        self._headers = None
+
+    @classmethod
+    def of(cls, response: requests.Response) -> 'ResponseView':
+        """获取响应对象对应的视图，不存在时创建并缓存在响应对象上"""
+        view = getattr(response, '_qa_view', None)
+        if view is None:
+            view = cls(response)
+            response._qa_view = view
+        return view
+
+    @property
+    def body(self) -> Any:
+        if self._body is _MISSING:
+            self._body = self.response.json()
+        return self._body
+
+    @property
+    def body_loaded(self) -> bool:
+        """响应体是否已经解码"""
+        return self._body is not _MISSING
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self._headers is None:
+            self._headers = dict(self.response.headers)
+        return self._headers
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in VIEW_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def as_dict(self, fields: Tuple[str, ...] = VIEW_FIELDS) -> Dict[str, Any]:
+        """按需物化为字典，只包含指定的字段"""
+        return {field: getattr(self, field) for field in fields}
+
+    def find(self, expr: str) -> List[Any]:
+        """
+        在响应中查找JSONPath表达式的全部匹配值
+
+        Args:
+            expr: 以 $. 开头的JSONPath表达式，根对象包含body/headers/status_code
+
+        Returns:
+            List[Any]: 匹配到的值，没有匹配时为空列表
+        """
+        compiled = compile_jsonpath(expr)
+        if isinstance(compiled, _SimplePath):
+            root = compiled.root_field
+            if root not in VIEW_FIELDS:
+                return []
+            return compiled.find({root: self[root]})
+        return compiled.find(self.as_dict(compiled.fields))
@@ -0,0 +1,350 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_MARK = '-attachment'
+RESULT_SUFFIX = '-result.json'
+MANIFEST = 'attachments.json'
+INDEX_FILE = 'index.json'
+
+_CHUNK = 1024 * 1024
+
+
+def is_attachment(name: str) -> bool:
+    return ATTACHMENT_MARK in name
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArchivedRun:
+    """
+    已打包的一次执行结果，按需从zip中读取单个文件，不解压整个归档
+
+    附件不在zip中，通过清单按内容哈希从附件仓库读取
+    """
+
+    def __init__(self, name: str, zip_path: Path, blobs: 'ResultStore'):
+        self.name = name
+        self.zip_path = zip_path
+        self._store = blobs
+        self._zip = zipfile.ZipFile(zip_path)
+        self.attachments: Dict[str, str] = json.loads(self._zip.read(MANIFEST))
+
+    def names(self) -> List[str]:
+        """归档中的全部文件名（包括附件）"""
+        return sorted(set(self._zip.namelist()) - {MANIFEST} | set(self.attachments))
+
+    def read(self, name: str) -> bytes:
+        digest = self.attachments.get(name)
+        if digest is not None:
+            return self._store.blob_path(digest).read_bytes()
+        return self._zip.read(name)
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """逐个读取 *-result.json"""
+        for name in self._zip.namelist():
+            if name.endswith(RESULT_SUFFIX):
+                yield json.loads(self._zip.read(name))
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultStore:
+    """
+    allure结果目录的存储与保留策略
+
+    - 附件按内容哈希存放在 blobs/ 下，执行目录中的附件替换为指向它的硬链接，
+      相同的响应体只占一份磁盘空间（文件系统不支持硬链接时保留原文件）
+    - 超出保留数量的执行目录打包为 archives/<目录名>.zip（deflate压缩），
+      zip中只保存结果/容器JSON和附件清单，附件仍引用 blobs/ 中的内容
+    - 每个归档的统计信息记录在 index.json 中，列出历史执行时只读索引
+    - 按时间和总大小清理最旧的归档，并回收不再被引用的附件
+
+    目录结构:
+        <store_dir>/blobs/<哈希前2位>/<sha256>
+        <store_dir>/archives/<执行目录名>.zip
+        <store_dir>/index.json
+    """
+
+    def __init__(self, results_dir, store_dir=None):
+        self.results_dir = Path(results_dir)
+        self.store_dir = Path(store_dir) if store_dir else self.results_dir.parent / 'result-store'
+        self.blobs_dir = self.store_dir / 'blobs'
+        self.archives_dir = self.store_dir / 'archives'
+        self.index_path = self.store_dir / INDEX_FILE
+        self._lock = threading.Lock()
+        for path in (self.blobs_dir, self.archives_dir):
+            path.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / digest
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self.index_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取归档索引失败，重新扫描归档: {self.index_path}，{str(e)}")
+            return self._rebuild_index()
+
+    def _write_index(self, index: Dict[str, Dict[str, Any]]):
+        tmp = self.index_path.with_name(f"{INDEX_FILE}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(index, ensure_ascii=False, indent=1, sort_keys=True), encoding='utf-8')
+        os.replace(tmp, self.index_path)
+
+    def _rebuild_index(self) -> Dict[str, Dict[str, Any]]:
+        index = {}
+        for zip_path in self.archives_dir.glob('*.zip'):
+            try:
+                with ArchivedRun(zip_path.stem, zip_path, self) as run:
+                    index[run.name] = self._describe(run.name, zip_path, run.attachments, run.results(),
+                                                    zip_path.stat().st_mtime)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                logger.warning(f"归档损坏，已忽略: {zip_path}，{str(e)}")
+        return index
+
+    @staticmethod
+    def _describe(name: str, zip_path: Path, attachments: Dict[str, str],
+                  results: Iterator[Dict[str, Any]], created: float) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for result in results:
+            status = result.get('status', 'unknown')
+            statuses[status] = statuses.get(status, 0) + 1
+        return {
+            'name': name,
+            'archive': zip_path.name,
+            'size': zip_path.stat().st_size,
+            'created': created,
+            'packed': time.time(),
+            'tests': sum(statuses.values()),
+            'statuses': statuses,
+            'blobs': sorted(set(attachments.values())),
+        }
+
+    def _store_blob(self, path: Path) -> Tuple[str, bool]:
+        """
+        把附件放入附件仓库并替换为硬链接
+
+        Returns:
+            (内容哈希, 是否与已有内容重复)
+        """
+        digest = _sha256(path)
+        blob = self.blob_path(digest)
+        if blob.exists():
+            if os.path.samefile(blob, path):
+                return digest, False
+            tmp = path.with_name(path.name + '.tmp')
+            try:
+                os.link(blob, tmp)
+                os.replace(tmp, path)
+            except OSError:
+                # 跨文件系统等无法建立硬链接的情况，保留原文件
+                return digest, False
+            return digest, True
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, blob)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(path, blob)
+        return digest, False
+
+    def dedup(self, run_dir) -> Dict[str, str]:
+        """
+        对一次执行的附件去重
+
+        Returns:
+            Dict[str, str]: {附件文件名: 内容哈希}
+        """
+        run_dir = Path(run_dir)
+        attachments: Dict[str, str] = {}
+        duplicated = saved = 0
+        for path in run_dir.iterdir():
+            if path.is_file() and is_attachment(path.name):
+                digest, duplicate = self._store_blob(path)
+                attachments[path.name] = digest
+                if duplicate:
+                    duplicated += 1
+                    saved += path.stat().st_size
+        if attachments:
+            logger.info(f"附件去重: {run_dir.name} 共 {len(attachments)} 个附件，"
+                        f"{duplicated} 个与已有内容重复，节省 {saved / 1024:.1f} KB")
+        return attachments
+
+    def pack(self, run_dir) -> Dict[str, Any]:
+        """把执行目录打包为压缩归档并删除原目录，返回归档的索引记录"""
+        run_dir = Path(run_dir)
+        created = run_dir.stat().st_mtime
+        attachments = self.dedup(run_dir)
+        zip_path = self.archives_dir / f"{run_dir.name}.zip"
+        tmp = zip_path.with_name(zip_path.name + '.tmp')
+        with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(MANIFEST, json.dumps(attachments, ensure_ascii=False))
+            for path in sorted(run_dir.iterdir()):
+                if path.is_file() and path.name not in attachments:
+                    zf.write(path, path.name)
+        os.replace(tmp, zip_path)
+
+        with ArchivedRun(run_dir.name, zip_path, self) as run:
+            record = self._describe(run_dir.name, zip_path, attachments, run.results(), created)
+        with self._lock, file_lock(str(self.index_path)):
+            index = self._read_index()
+            index[run_dir.name] = record
+            self._write_index(index)
+        shutil.rmtree(run_dir)
+        logger.info(f"已归档: {run_dir.name} -> {zip_path}，{record['size'] / 1024:.1f} KB")
+        return record
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """全部执行记录（未归档的目录和已归档的zip），按名称（时间戳）倒序"""
+        runs = {name: {**record, 'archived': True} for name, record in self._read_index().items()}
+        if self.results_dir.exists():
+            for path in self.results_dir.iterdir():
+                if path.is_dir():
+                    runs[path.name] = {'name': path.name, 'archived': False}
+        return [runs[name] for name in sorted(runs, reverse=True)]
+
+    def open(self, name: str) -> ArchivedRun:
+        """打开已归档的执行结果"""
+        zip_path = self.archives_dir / f"{name}.zip"
+        if not zip_path.exists():
+            raise FileNotFoundError(f"归档不存在: {name}")
+        return ArchivedRun(name, zip_path, self)
+
+    def restore(self, name: str, dest=None) -> Path:
+        """
+        把归档还原为allure结果目录，附件以硬链接方式还原，可直接用于allure serve/generate
+
+        执行目录仍存在时直接返回该目录
+        """
+        run_dir = self.results_dir / name
+        if dest is None and run_dir.exists():
+            return run_dir
+        dest = Path(dest) if dest else run_dir
+        dest.mkdir(parents=True, exist_ok=True)
+        with self.open(name) as run:
+            for member in run.names():
+                if member not in run.attachments:
+                    (dest / member).write_bytes(run.read(member))
+            for file_name, digest in run.attachments.items():
+                target = dest / file_name
+                try:
+                    os.link(self.blob_path(digest), target)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    shutil.copyfile(self.blob_path(digest), target)
+        logger.info(f"已还原归档: {name} -> {dest}")
+        return dest
+
+    def _remove_archive(self, index: Dict[str, Dict[str, Any]], name: str):
+        record = index.pop(name)
+        try:
+            (self.archives_dir / record['archive']).unlink()
+        except FileNotFoundError:
+            pass
+        logger.info(f"已删除过期归档: {name}")
+
+    def _blob_stats(self) -> Dict[str, Tuple[int, int]]:
+        """附件仓库中每个附件的 (大小, 硬链接数)，只遍历一次"""
+        stats = {}
+        for blob in self.blobs_dir.glob('*/*'):
+            try:
+                st = blob.stat()
+            except FileNotFoundError:
+                continue
+            stats[blob.name] = (st.st_size, st.st_nlink)
+        return stats
+
+    def _expired_by_size(self, index: Dict[str, Dict[str, Any]], limit: float) -> List[str]:
+        """
+        为使占用不超过limit需要删除的归档，从最旧的开始
+
+        占用只计算归档文件，以及只被归档引用的附件；仍被执行目录硬链接的附件（硬链接数大于1）
+        删除归档也无法释放，不计入。附件在引用它的最后一个归档被删除时才释放
+        """
+        blobs = self._blob_stats()
+        refs: Dict[str, int] = {}
+        for record in index.values():
+            for digest in record.get('blobs', ()):
+                refs[digest] = refs.get(digest, 0) + 1
+        freeable = {digest for digest in refs if digest in blobs and blobs[digest][1] <= 1}
+        size = sum(record['size'] for record in index.values()) + sum(blobs[d][0] for d in freeable)
+        expired = []
+        for name in sorted(index):
+            if size <= limit:
+                break
+            expired.append(name)
+            size -= index[name]['size']
+            for digest in index[name].get('blobs', ()):
+                refs[digest] -= 1
+                if refs[digest] == 0 and digest in freeable:
+                    size -= blobs[digest][0]
+        return expired
+
+    def apply_retention(self, keep: int = 5, max_age_days: Optional[float] = None,
+                        max_size_mb: Optional[float] = None):
+        """
+        执行保留策略
+
+        Args:
+            keep: 保留为目录的最近执行数，更早的执行打包归档
+            max_age_days: 删除执行时间早于该天数的归档
+            max_size_mb: 归档及只被归档引用的附件的总大小上限，超出时从最旧的归档开始删除；
+                仍被执行目录引用的附件删除归档也无法释放，不计入
+        """
+        if self.results_dir.exists():
+            run_dirs = sorted((p for p in self.results_dir.iterdir() if p.is_dir()),
+                              key=lambda p: p.name, reverse=True)
+            for run_dir in run_dirs[keep:]:
+                self.pack(run_dir)
+
+        with self._lock, file_lock(str(self.index_path)):
+            index = self._read_index()
+            if max_age_days is not None:
+                deadline = time.time() - max_age_days * 86400
+                for name in [n for n, r in index.items() if r['created'] < deadline]:
+                    self._remove_archive(index, name)
+            if max_size_mb is not None:
+                for name in self._expired_by_size(index, max_size_mb * 1024 * 1024):
+                    self._remove_archive(index, name)
+            self._write_index(index)
+            self._collect_blobs(index)
+
+    def _collect_blobs(self, index: Dict[str, Dict[str, Any]]) -> int:
+        """删除既不被归档引用、也没有被执行目录硬链接的附件"""
+        referenced = {digest for record in index.values() for digest in record.get('blobs', ())}
+        removed = 0
+        for blob in self.blobs_dir.glob('*/*'):
+            if blob.name not in referenced and blob.stat().st_nlink <= 1:
+                blob.unlink()
+                removed += 1
+        if removed:
+            logger.info(f"已回收 {removed} 个未引用的附件")
+        return removed
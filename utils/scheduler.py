@@ -0,0 +1,154 @@
+import heapq
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from utils.file_lock import file_lock
+from utils.parse_cache import cache_root
+
+logger = logging.getLogger(__name__)
+
+# 新耗时在滑动平均中的权重
+SMOOTHING = 0.5
+
+# 没有任何历史记录时的默认预估耗时（秒）
+DEFAULT_ESTIMATE = 1.0
+
+# 缓存目录下的耗时记录文件名
+DURATIONS_FILE = 'durations.json'
+
+
+def case_key(item) -> str:
+    """
+    用例的耗时记录键
+
+    数据驱动用例为 "测试文件::测试函数::case_name"，不受参数化id和用例顺序变化的影响，
+    同一文件中不同测试函数的同名用例（如JSON和CSV中的同名用例）互不干扰；其他测试使用nodeid
+    """
+    callspec = getattr(item, 'callspec', None)
+    if callspec is not None:
+        for name in ('test_data', 'test_case'):
+            data = callspec.params.get(name)
+            case_name = data.get('case_name') if isinstance(data, dict) else getattr(data, 'case_name', None)
+            if case_name:
+                return f"{item.nodeid.split('[', 1)[0]}::{case_name}"
+    return item.nodeid
+
+
+class DurationStore:
+    """
+    用例历史耗时，保存在本地JSON文件中
+
+    每个键记录滑动平均耗时、最近一次耗时和执行次数；多个进程同时保存时
+    通过文件锁串行化读-合并-写
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        base = cache_root()
+        self.path = path or os.path.join(base, DURATIONS_FILE)
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取用例耗时记录失败，忽略历史数据: {self.path}，{str(e)}")
+            return {}
+
+    def estimate(self, key: str) -> Optional[float]:
+        """预估耗时（秒），没有历史记录时返回None"""
+        record = self.records.get(key)
+        return record['avg'] if record else None
+
+    def estimates(self, keys: Sequence[str]) -> List[float]:
+        """
+        批量预估耗时，没有记录的用例取已知用例耗时的中位数
+        """
+        known = [self.estimate(key) for key in keys]
+        values = sorted(v for v in known if v is not None)
+        default = values[len(values) // 2] if values else DEFAULT_ESTIMATE
+        return [default if v is None else v for v in known]
+
+    def update(self, durations: Dict[str, float]):
+        """合并本次执行的耗时并保存"""
+        if not durations:
+            return
+        with self._lock, file_lock(self.path):
+            # 重新读取，合并其他进程在此期间写入的记录
+            records = self._read()
+            for key, seconds in durations.items():
+                record = records.get(key)
+                if record is None:
+                    records[key] = {'avg': seconds, 'last': seconds, 'runs': 1}
+                else:
+                    record['avg'] = record['avg'] * (1 - SMOOTHING) + seconds * SMOOTHING
+                    record['last'] = seconds
+                    record['runs'] += 1
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self.records = records
+
+
+def lpt_schedule(estimates: Sequence[float], workers: int) -> List[List[int]]:
+    """
+    最长处理时间优先(LPT)调度
+
+    按预估耗时从长到短，依次分配给当前总耗时最小的worker。
+    每个worker内的用例按预估耗时从长到短排列，最慢的用例最先开始
+
+    Args:
+        estimates: 每个用例的预估耗时
+        workers: worker数
+
+    Returns:
+        List[List[int]]: 每个worker分到的用例下标
+    """
+    if workers < 1:
+        raise ValueError(f"worker数必须大于0: {workers}")
+    order = sorted(range(len(estimates)), key=lambda i: (-estimates[i], i))
+    heap: List[Tuple[float, int]] = [(0.0, w) for w in range(workers)]
+    assignment: List[List[int]] = [[] for _ in range(workers)]
+    for i in order:
+        load, worker = heapq.heappop(heap)
+        assignment[worker].append(i)
+        heapq.heappush(heap, (load + estimates[i], worker))
+    return assignment
+
+
+def lpt_schedule_units(units: Sequence[Sequence[int]], estimates: Sequence[float],
+                       workers: int) -> List[List[int]]:
+    """
+    以用例组为单位的LPT调度
+
+    同一组的用例（如依赖链）必须在同一个worker中按给定顺序执行，组的预估耗时为组内用例耗时之和；
+    worker内的组按预估耗时从长到短排列，组内保持原顺序
+
+    Args:
+        units: 用例组，每组为用例下标列表，每个用例恰好属于一个组
+        estimates: 每个用例的预估耗时
+        workers: worker数
+
+    Returns:
+        List[List[int]]: 每个worker分到的用例下标
+    """
+    weights = [sum(estimates[i] for i in unit) for unit in units]
+    return [[i for u in assigned for i in units[u]] for assigned in lpt_schedule(weights, workers)]
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """解析 "I/N" 形式的分片参数，I从0开始"""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"分片参数格式应为 I/N: {spec}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片参数超出范围: {spec}")
+    return index, count
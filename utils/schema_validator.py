@@ -0,0 +1,452 @@
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from utils.data_loader import DataLoader
+
+logger = logging.getLogger(__name__)
+
+# 单次校验最多报告的错误数，超过后停止遍历，避免超大数组产生海量错误
+MAX_ERRORS = 20
+
+# 进程内缓存的内联schema编译结果个数上限
+MAX_INLINE_SCHEMAS = 256
+
+# 校验函数：接收实例和JSON指针路径，逐个产出错误信息
+Validator = Callable[[Any, str], Iterator[str]]
+
+# 文件的 (修改时间, 大小)，文件不存在时为None
+Stamp = Optional[Tuple[int, int]]
+
+_JSON_TYPES = {
+    'string': lambda v: isinstance(v, str),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'array': lambda v: isinstance(v, list),
+    'object': lambda v: isinstance(v, dict),
+    'null': lambda v: v is None,
+}
+
+
+# 允许流式校验的顶层数组schema中可以出现的关键字
+_STREAMABLE_KEYWORDS = frozenset({'type', 'items', 'minItems', 'maxItems',
+                                  '$schema', '$id', 'title', 'description', 'definitions', '$defs'})
+
+
+class SchemaError(ValueError):
+    """Schema本身无效或$ref无法解析"""
+
+
+def _json_key(value: Any) -> Any:
+    """
+    按JSON语义比较用的可哈希键
+
+    布尔值与数字是不同的类型（True != 1），整数与浮点数按数值比较（1 == 1.0），
+    数组和对象逐个元素比较
+    """
+    if isinstance(value, bool):
+        return 'boolean', value
+    if isinstance(value, (int, float)):
+        return 'number', value
+    if isinstance(value, list):
+        return 'array', tuple(_json_key(item) for item in value)
+    if isinstance(value, dict):
+        return 'object', frozenset((k, _json_key(v)) for k, v in value.items())
+    if value is None:
+        return 'null', None
+    return type(value).__name__, value
+
+
+def _describe(value: Any) -> str:
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= 100 else text[:97] + '...'
+
+
+class SchemaCompiler:
+    """
+    把JSON Schema编译为嵌套的校验函数
+
+    支持的关键字: type, enum, const, properties, required, additionalProperties,
+    patternProperties, items, minItems, maxItems, uniqueItems, minimum, maximum,
+    exclusiveMinimum, exclusiveMaximum, minLength, maxLength, pattern,
+    allOf, anyOf, oneOf, not, $ref（同文件和跨文件）
+
+    同一个$ref只编译一次，递归引用在首次使用时才解析。编译结果按schema文件及其直接或间接
+    引用的文件的 (修改时间, 大小) 缓存，任何一个文件修改后重新编译，常驻进程中无需重启
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # (文件绝对路径, JSON指针) -> (依赖文件的Stamp, 校验函数)
+        self._compiled: Dict[Tuple[str, str], Tuple[Dict[str, Stamp], Validator]] = {}
+        # (内联schema的JSON文本, 基准目录) -> (依赖文件的Stamp, 校验函数)
+        self._inline: Dict[Tuple[str, str], Tuple[Dict[str, Stamp], Validator]] = {}
+
+    def compile_file(self, path: str, pointer: str = '') -> Validator:
+        """编译schema文件（或其中指针指向的片段）"""
+        path = os.path.abspath(path)
+        key = (path, pointer)
+        with self._lock:
+            entry = self._compiled.get(key)
+            if entry is None or not self._fresh(entry[0]):
+                stamps: Dict[str, Stamp] = {}
+                document = self._load(path, stamps)
+                validator = self._compile(self._resolve_pointer(document, pointer, path), path, document)
+                entry = self._compiled[key] = (stamps, validator)
+            return entry[1]
+
+    def compile_inline(self, schema: Dict[str, Any], base_dir: str = '.') -> Validator:
+        """编译内联schema，跨文件$ref相对于base_dir解析"""
+        path = os.path.join(os.path.abspath(base_dir), '<inline>')
+        key = (json.dumps(schema, sort_keys=True), path)
+        with self._lock:
+            entry = self._inline.get(key)
+            if entry is None or not self._fresh(entry[0]):
+                stamps: Dict[str, Stamp] = {}
+                # 编译结果引用自己的一份schema，调用方之后修改传入的字典不影响缓存
+                schema = json.loads(key[0])
+                self._track_refs(schema, path, stamps)
+                validator = self._compile(schema, path, schema)
+                if key not in self._inline and len(self._inline) >= MAX_INLINE_SCHEMAS:
+                    self._inline.pop(next(iter(self._inline)))
+                entry = self._inline[key] = (stamps, validator)
+            return entry[1]
+
+    @staticmethod
+    def _stamp(path: str) -> Stamp:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _fresh(self, stamps: Dict[str, Stamp]) -> bool:
+        return all(self._stamp(path) == stamp for path, stamp in stamps.items())
+
+    def _load(self, path: str, stamps: Dict[str, Stamp]) -> Any:
+        """读取schema文件，记录它和它引用的文件的Stamp（先记录再读取，读取期间的修改下次会重新编译）"""
+        stamps[path] = self._stamp(path)
+        document = DataLoader.load_schema(path)
+        self._track_refs(document, path, stamps)
+        return document
+
+    def _track_refs(self, node: Any, path: str, stamps: Dict[str, Stamp]):
+        """递归记录schema中跨文件$ref引用的文件"""
+        if isinstance(node, dict):
+            ref = node.get('$ref')
+            if isinstance(ref, str) and ref.partition('#')[0]:
+                target = os.path.normpath(os.path.join(os.path.dirname(path), ref.partition('#')[0]))
+                if target not in stamps:
+                    if os.path.exists(target):
+                        self._load(target, stamps)
+                    else:
+                        stamps[target] = None
+            for value in node.values():
+                self._track_refs(value, path, stamps)
+        elif isinstance(node, list):
+            for value in node:
+                self._track_refs(value, path, stamps)
+
+    @staticmethod
+    def _resolve_pointer(document: Any, pointer: str, path: str) -> Any:
+        node = document
+        for token in filter(None, pointer.lstrip('#').split('/')):
+            token = token.replace('~1', '/').replace('~0', '~')
+            try:
+                node = node[int(token)] if isinstance(node, list) else node[token]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise SchemaError(f"无法解析schema引用: {path}#{pointer}")
+        return node
+
+    def _compile_ref(self, ref: str, path: str, root: Any) -> Validator:
+        file_part, _, pointer = ref.partition('#')
+        if file_part:
+            target = os.path.join(os.path.dirname(path), file_part)
+            if not os.path.exists(target):
+                raise SchemaError(f"schema引用的文件不存在: {target}")
+            compile_target = lambda: self.compile_file(target, pointer)
+        else:
+            compile_target = lambda: self._compile(self._resolve_pointer(root, pointer, path), path, root)
+        # 首次使用时编译；引用的文件修改后，引用方的编译结果随之失效，不会继续使用这里的结果
+        compiled = {}
+
+        def resolve():
+            if 'validator' not in compiled:
+                compiled['validator'] = compile_target()
+            return compiled['validator']
+
+        def validate_ref(instance, where):
+            yield from resolve()(instance, where)
+        return validate_ref
+
+    def _compile(self, schema: Any, path: str, root: Any = None) -> Validator:
+        if schema is True or schema == {}:
+            return lambda instance, where: iter(())
+        if schema is False:
+            return lambda instance, where: iter((f"{where or '/'}: 不允许出现该值",))
+        if not isinstance(schema, dict):
+            raise SchemaError(f"无效的schema: {_describe(schema)}")
+
+        checks: List[Validator] = []
+        if '$ref' in schema:
+            checks.append(self._compile_ref(schema['$ref'], path, root))
+
+        if 'type' in schema:
+            types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+            for t in types:
+                if t not in _JSON_TYPES:
+                    raise SchemaError(f"未知的类型: {t}")
+            predicates = [_JSON_TYPES[t] for t in types]
+
+            def check_type(instance, where, predicates=predicates, types=types):
+                if not any(p(instance) for p in predicates):
+                    yield f"{where or '/'}: 期望类型 {'/'.join(types)}，实际 {_describe(instance)}"
+            checks.append(check_type)
+
+        if 'enum' in schema:
+            options = schema['enum']
+            keys = frozenset(_json_key(option) for option in options)
+
+            def check_enum(instance, where):
+                if _json_key(instance) not in keys:
+                    yield f"{where or '/'}: 取值 {_describe(instance)} 不在 {_describe(options)} 中"
+            checks.append(check_enum)
+
+        if 'const' in schema:
+            const = schema['const']
+            const_key = _json_key(const)
+
+            def check_const(instance, where):
+                if _json_key(instance) != const_key:
+                    yield f"{where or '/'}: 期望 {_describe(const)}，实际 {_describe(instance)}"
+            checks.append(check_const)
+
+        checks.extend(self._compile_object(schema, path, root))
+        checks.extend(self._compile_array(schema, path, root))
+        checks.extend(self._compile_scalar(schema))
+        checks.extend(self._compile_combinators(schema, path, root))
+
+        def validate(instance, where):
+            for check in checks:
+                yield from check(instance, where)
+
+        # 只约束数组元素和元素个数的schema可以边解码边校验，不必先构建整个列表
+        if schema.get('type') == 'array' and not (set(schema) - _STREAMABLE_KEYWORDS):
+            validate.stream = (self._compile(schema.get('items', True), path, root),
+                               schema.get('minItems'), schema.get('maxItems'))
+        return validate
+
+    def _compile_object(self, schema: Dict[str, Any], path: str, root: Any) -> List[Validator]:
+        checks = []
+        properties = {name: self._compile(sub, path, root) for name, sub in schema.get('properties', {}).items()}
+        patterns = [(re.compile(p), self._compile(sub, path, root))
+                    for p, sub in schema.get('patternProperties', {}).items()]
+        required = schema.get('required', [])
+        additional = schema.get('additionalProperties', True)
+        additional_check = None if additional is True else self._compile(additional, path, root)
+
+        if not (properties or patterns or required or additional_check):
+            return checks
+
+        def check_object(instance, where):
+            if not isinstance(instance, dict):
+                return
+            for name in required:
+                if name not in instance:
+                    yield f"{where}/{name}: 缺少必需字段"
+            for name, value in instance.items():
+                matched = False
+                if name in properties:
+                    matched = True
+                    yield from properties[name](value, f"{where}/{name}")
+                for pattern, sub in patterns:
+                    if pattern.search(name):
+                        matched = True
+                        yield from sub(value, f"{where}/{name}")
+                if not matched and additional_check is not None:
+                    yield from additional_check(value, f"{where}/{name}")
+        checks.append(check_object)
+        return checks
+
+    def _compile_array(self, schema: Dict[str, Any], path: str, root: Any) -> List[Validator]:
+        checks = []
+        items = self._compile(schema['items'], path, root) if 'items' in schema else None
+        min_items, max_items = schema.get('minItems'), schema.get('maxItems')
+        unique = schema.get('uniqueItems', False)
+
+        if items is None and min_items is None and max_items is None and not unique:
+            return checks
+
+        def check_array(instance, where):
+            if not isinstance(instance, list):
+                return
+            if min_items is not None and len(instance) < min_items:
+                yield f"{where or '/'}: 元素个数 {len(instance)} 少于 {min_items}"
+            if max_items is not None and len(instance) > max_items:
+                yield f"{where or '/'}: 元素个数 {len(instance)} 多于 {max_items}"
+            if items is not None:
+                # 逐个元素校验，由调用方决定何时停止
+                for index, item in enumerate(instance):
+                    yield from items(item, f"{where}/{index}")
+            if unique:
+                seen = set()
+                for index, item in enumerate(instance):
+                    key = _json_key(item)
+                    if key in seen:
+                        yield f"{where}/{index}: 元素重复"
+                    seen.add(key)
+        checks.append(check_array)
+        return checks
+
+    @staticmethod
+    def _compile_scalar(schema: Dict[str, Any]) -> List[Validator]:
+        checks = []
+        bounds = [(schema[k], k) for k in ('minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum')
+                  if k in schema and not isinstance(schema[k], bool)]
+        if bounds:
+            compare = {
+                'minimum': lambda v, b: v >= b, 'maximum': lambda v, b: v <= b,
+                'exclusiveMinimum': lambda v, b: v > b, 'exclusiveMaximum': lambda v, b: v < b,
+            }
+
+            def check_bounds(instance, where):
+                if isinstance(instance, (int, float)) and not isinstance(instance, bool):
+                    for bound, name in bounds:
+                        if not compare[name](instance, bound):
+                            yield f"{where or '/'}: {instance} 不满足 {name}={bound}"
+            checks.append(check_bounds)
+
+        min_length, max_length = schema.get('minLength'), schema.get('maxLength')
+        pattern = re.compile(schema['pattern']) if 'pattern' in schema else None
+        if min_length is not None or max_length is not None or pattern is not None:
+            def check_string(instance, where):
+                if not isinstance(instance, str):
+                    return
+                if min_length is not None and len(instance) < min_length:
+                    yield f"{where or '/'}: 长度 {len(instance)} 小于 {min_length}"
+                if max_length is not None and len(instance) > max_length:
+                    yield f"{where or '/'}: 长度 {len(instance)} 大于 {max_length}"
+                if pattern is not None and not pattern.search(instance):
+                    yield f"{where or '/'}: {_describe(instance)} 不匹配 {pattern.pattern}"
+            checks.append(check_string)
+        return checks
+
+    def _compile_combinators(self, schema: Dict[str, Any], path: str, root: Any) -> List[Validator]:
+        checks = []
+        for sub in schema.get('allOf', []):
+            checks.append(self._compile(sub, path, root))
+
+        if 'anyOf' in schema:
+            options = [self._compile(sub, path, root) for sub in schema['anyOf']]
+
+            def check_any(instance, where):
+                if not any(next(iter(option(instance, where)), None) is None for option in options):
+                    yield f"{where or '/'}: 不满足anyOf中的任何一个schema"
+            checks.append(check_any)
+
+        if 'oneOf' in schema:
+            options = [self._compile(sub, path, root) for sub in schema['oneOf']]
+
+            def check_one(instance, where):
+                matched = sum(next(iter(option(instance, where)), None) is None for option in options)
+                if matched != 1:
+                    yield f"{where or '/'}: 满足oneOf中的 {matched} 个schema，期望恰好1个"
+            checks.append(check_one)
+
+        if 'not' in schema:
+            negated = self._compile(schema['not'], path, root)
+
+            def check_not(instance, where):
+                if next(iter(negated(instance, where)), None) is None:
+                    yield f"{where or '/'}: 不应满足not中的schema"
+            checks.append(check_not)
+        return checks
+
+
+_compiler = SchemaCompiler()
+
+
+def compile_schema(schema: Any, base_dir: str = '.') -> Validator:
+    """
+    编译schema，结果在进程内缓存，schema文件修改后重新编译
+
+    Args:
+        schema: schema文件路径（可带 #/指针），或内联的schema字典
+        base_dir: 相对路径和内联schema中跨文件$ref的基准目录
+
+    Returns:
+        Validator: 校验函数
+    """
+    if isinstance(schema, str):
+        file_part, _, pointer = schema.partition('#')
+        return _compiler.compile_file(os.path.join(base_dir, file_part), pointer)
+    return _compiler.compile_inline(schema, base_dir)
+
+
+def iter_json_array(text: str) -> Iterator[Any]:
+    """
+    逐个解码顶层JSON数组中的元素，不一次性构建整个列表
+
+    Raises:
+        ValueError: 文本不是JSON数组
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'[ \t\n\r]*')
+    index = whitespace.match(text, 0).end()
+    if text[index:index + 1] != '[':
+        raise ValueError("响应体不是JSON数组")
+    index = whitespace.match(text, index + 1).end()
+    if text[index:index + 1] == ']':
+        return
+    while True:
+        item, index = decoder.raw_decode(text, index)
+        yield item
+        index = whitespace.match(text, index).end()
+        char = text[index:index + 1]
+        if char == ']':
+            return
+        if char != ',':
+            raise ValueError(f"JSON数组格式错误，位置 {index}")
+        index = whitespace.match(text, index + 1).end()
+
+
+def _iter_stream_errors(validator: Validator, text: str) -> Iterator[str]:
+    items, min_items, max_items = validator.stream
+    count = 0
+    for count, item in enumerate(iter_json_array(text), 1):
+        yield from items(item, f"/{count - 1}")
+    if min_items is not None and count < min_items:
+        yield f"/: 元素个数 {count} 少于 {min_items}"
+    if max_items is not None and count > max_items:
+        yield f"/: 元素个数 {count} 多于 {max_items}"
+
+
+def schema_errors(validator: Validator, instance: Any = None, text: str = None,
+                  max_errors: int = MAX_ERRORS) -> List[str]:
+    """
+    执行校验，最多返回max_errors条错误，达到上限后立即停止遍历
+
+    Args:
+        validator: compile_schema返回的校验函数
+        instance: 已解码的数据
+        text: 未解码的JSON文本，schema为顶层数组时逐个元素解码校验，否则整体解码
+        max_errors: 最多返回的错误数
+    """
+    if text is not None:
+        if hasattr(validator, 'stream') and text.lstrip()[:1] == '[':
+            errors_iter = _iter_stream_errors(validator, text)
+        else:
+            errors_iter = validator(json.loads(text), '')
+    else:
+        errors_iter = validator(instance, '')
+    errors = []
+    for error in errors_iter:
+        errors.append(error)
+        if len(errors) >= max_errors:
+            errors.append(f"错误过多，仅显示前 {max_errors} 条")
+            break
+    return errors
@@ -0,0 +1,316 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+import logging
+
+from utils.data_loader import DataLoader
+from utils.keywords import KEYWORD_METHODS
+from utils.loopback_server import AsyncHTTPServer, Request, Response
+from utils.prewarm import CASE_FILE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# 期望结果中不属于响应内容的字段
+_NON_RESPONSE_KEYS = {'status_code', 'body', 'headers', 'schema', 'repeat',
+                      'max_latency_ms', 'p95_latency_ms'}
+
+# 类型校验对应的示例值
+_TYPE_EXAMPLES = {
+    'string': '', 'str': '', 'number': 0, 'float': 0.0, 'integer': 0, 'int': 0,
+    'boolean': False, 'bool': False, 'array': [], 'list': [], 'object': {}, 'dict': {}, 'null': None,
+}
+
+_WILDCARD = '*'
+
+# 查询参数值含模板变量时匹配任意值
+_ANY_VALUE = '\x00*'
+
+# 桩服务按主机区分路由时使用的路径前缀：/_host/<主机>/原路径
+HOST_PREFIX = '/_host/'
+
+QueryKey = Tuple[Tuple[str, str], ...]
+
+
+def _is_template(text: str) -> bool:
+    return '{' in text and '}' in text
+
+
+def _example(expected: Any) -> Any:
+    """把期望值（可能是 {"$op": arg} 形式的校验）转换为满足校验的示例值"""
+    if isinstance(expected, dict):
+        if len(expected) == 1:
+            (op, arg), = expected.items()
+            if op.startswith('$'):
+                if op in ('$eq', '$ge', '$le'):
+                    return arg
+                if op == '$type':
+                    return _TYPE_EXAMPLES.get(arg)
+                if op == '$gt':
+                    return arg + 1
+                if op == '$lt':
+                    return arg - 1
+                if op == '$contains':
+                    return arg if isinstance(arg, str) else [arg]
+                if op == '$len':
+                    return [None] * arg
+                if op == '$in':
+                    return arg[0] if arg else None
+                return None
+        return _expand(expected)
+    if isinstance(expected, list):
+        return [_example(item) for item in expected]
+    return expected
+
+
+def _expand(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """字段路径展开为嵌套字典，如 {"user.name": "a"} -> {"user": {"name": "a"}}"""
+    result: Dict[str, Any] = {}
+    for path, expected in fields.items():
+        if path.startswith('$'):
+            continue
+        keys = path.split('.')
+        node = result
+        for key in keys[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                child = node[key] = {}
+            node = child
+        value = _example(expected)
+        if isinstance(value, dict) and isinstance(node.get(keys[-1]), dict):
+            node[keys[-1]].update(value)
+        else:
+            node[keys[-1]] = value
+    return result
+
+
+def _query_key(pairs: Iterable[Tuple[str, Any]]) -> QueryKey:
+    return tuple(sorted((str(k), str(v)) for k, v in pairs))
+
+
+def _request_of(case: Dict[str, Any]) -> Optional[Tuple[str, str, Dict[str, Any], Dict[str, Any]]]:
+    """从用例中取出 (方法, url, 查询参数, 期望结果)，不是请求用例时返回None"""
+    if 'url' in case and 'method' in case:
+        return case['method'].upper(), case['url'], case.get('params') or {}, case.get('expected_response') or {}
+    keyword = case.get('keyword')
+    params = case.get('params')
+    if keyword in KEYWORD_METHODS and isinstance(params, dict) and 'url' in params:
+        return KEYWORD_METHODS[keyword], params['url'], params.get('params') or {}, case.get('expected') or {}
+    return None
+
+
+def _response_of(expected: Dict[str, Any]) -> Response:
+    """根据期望结果生成响应，响应体预先序列化"""
+    body = _expand(expected.get('body') or {})
+    # 关键字用例的期望结果中，body.xxx / response.xxx 形式的路径也是响应体字段
+    extra = {key.split('.', 1)[1]: value for key, value in expected.items()
+             if key.startswith(('body.', 'response.'))}
+    extra.update({key: value for key, value in expected.items()
+                  if key not in _NON_RESPONSE_KEYS and '.' not in key and not key.startswith('$')})
+    for key, value in _expand(extra).items():
+        if isinstance(value, dict) and isinstance(body.get(key), dict):
+            body[key].update(value)
+        else:
+            body[key] = value
+    headers = {'Content-Type': 'application/json'}
+    headers.update({str(k): str(_example(v)) for k, v in (expected.get('headers') or {}).items()})
+    return int(expected.get('status_code', 200)), headers, json.dumps(body, ensure_ascii=False).encode('utf-8')
+
+
+class _Node:
+    __slots__ = ('children', 'routes')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.routes: Dict[str, Dict[QueryKey, Response]] = {}
+
+
+class _HostRoutes:
+    """同一主机下的路由：不含模板变量的路径放在哈希表中，含 {变量} 的路径放在按段组织的前缀树中"""
+    __slots__ = ('exact', 'tree')
+
+    def __init__(self):
+        self.exact: Dict[Tuple[str, str], Dict[QueryKey, Response]] = {}
+        self.tree = _Node()
+
+    def routes_for(self, method: str, path: str, create: bool = False) -> Optional[Dict[QueryKey, Response]]:
+        if create:
+            if not _is_template(path):
+                return self.exact.setdefault((method, path), {})
+            node = self.tree
+            for segment in path.strip('/').split('/'):
+                node = node.children.setdefault(_WILDCARD if _is_template(segment) else segment, _Node())
+            return node.routes.setdefault(method, {})
+        routes = self.exact.get((method, path))
+        if routes is None and self.tree.children:
+            routes = self._tree_routes(self.tree, path.strip('/').split('/'), method)
+        return routes
+
+    def _tree_routes(self, node: _Node, segments: List[str], method: str) -> Optional[Dict[QueryKey, Response]]:
+        """优先匹配字面段，失败时回退到通配段"""
+        if not segments:
+            return node.routes.get(method)
+        for key in (segments[0], _WILDCARD):
+            child = node.children.get(key)
+            if child is not None:
+                routes = self._tree_routes(child, segments[1:], method)
+                if routes:
+                    return routes
+        return None
+
+
+def _query_matches(spec: QueryKey, query: QueryKey) -> bool:
+    return len(spec) == len(query) and all(
+        name == actual_name and (value == _ANY_VALUE or value == actual_value)
+        for (name, value), (actual_name, actual_value) in zip(spec, query)
+    )
+
+
+class RouteTable:
+    """
+    用例期望结果编译成的路由表
+
+    路由键为 (主机, 方法, 路径, 排序后的查询参数)，每个主机的路由单独存放，匹配耗时只与路径段数有关。
+    请求所属的主机依次取自路径前缀 /_host/<主机>（即 overrides() 给出的替换目标）和Host请求头；
+    两者都不是已知主机时（例如依赖方直接把基础地址替换为桩服务地址），只在唯一一个主机有匹配路由时返回。
+    相对地址或主机含模板变量的用例不区分主机。
+
+    值含模板变量的查询参数匹配任意值，其余查询参数必须完全一致，否则返回404；
+    query_fallback为True时回退到同一方法和路径下的第一条路由
+    """
+
+    def __init__(self, query_fallback: bool = False):
+        self.query_fallback = query_fallback
+        self._routes: Dict[str, _HostRoutes] = {}
+        self.count = 0
+        self.duplicates = 0
+        self.hosts = set()
+
+    def add(self, method: str, url: str, params: Dict[str, Any], response: Response):
+        parts = urlsplit(url)
+        netloc = parts.netloc.lower()
+        if _is_template(netloc):
+            netloc = ''
+        elif parts.scheme and netloc:
+            self.hosts.add(f"{parts.scheme}://{parts.netloc}")
+        pairs = parse_qsl(parts.query, keep_blank_values=True) + list(params.items())
+        query = _query_key((k, _ANY_VALUE if _is_template(str(v)) else v) for k, v in pairs)
+        host_routes = self._routes.get(netloc)
+        if host_routes is None:
+            host_routes = self._routes[netloc] = _HostRoutes()
+        routes = host_routes.routes_for(method, parts.path or '/', create=True)
+        if query in routes:
+            # 同一请求出现在多个用例中时保留第一条，除非第一条的期望结果没有描述响应体
+            self.duplicates += 1
+            if routes[query][2] == b'{}' and response[2] != b'{}':
+                routes[query] = response
+            return
+        routes[query] = response
+        self.count += 1
+
+    def overrides(self, base_url: str) -> Dict[str, str]:
+        """各主机到桩服务的基础地址替换规则，格式与 QA_BASE_URL_OVERRIDES 一致"""
+        base_url = base_url.rstrip('/')
+        return {host: f"{base_url}{HOST_PREFIX}{urlsplit(host).netloc.lower()}" for host in sorted(self.hosts)}
+
+    def _match_host(self, netloc: str, method: str, path: str, query: QueryKey) -> Optional[Response]:
+        host_routes = self._routes.get(netloc)
+        routes = host_routes.routes_for(method, path) if host_routes is not None else None
+        if not routes:
+            return None
+        response = routes.get(query)
+        if response is not None:
+            return response
+        for spec, candidate in routes.items():
+            if _ANY_VALUE in (value for _, value in spec) and _query_matches(spec, query):
+                return candidate
+        return next(iter(routes.values())) if self.query_fallback else None
+
+    def match(self, method: str, path: str, query: str, host: Optional[str] = None) -> Optional[Response]:
+        method = 'GET' if method == 'HEAD' else method
+        path = path or '/'
+        key = _query_key(parse_qsl(query, keep_blank_values=True))
+        if host is not None:
+            response = self._match_host(host.lower(), method, path, key)
+            return response if response is not None else self._match_host('', method, path, key)
+        response = self._match_host('', method, path, key)
+        if response is not None:
+            return response
+        matches = [found for found in (self._match_host(netloc, method, path, key) for netloc in self._routes if netloc)
+                   if found is not None]
+        return matches[0] if len(matches) == 1 else None
+
+    def _host_of(self, request: Request) -> Tuple[Optional[str], str]:
+        """返回 (主机, 去掉主机前缀后的路径)，无法确定主机时主机为None"""
+        if request.path.startswith(HOST_PREFIX):
+            netloc, _, rest = request.path[len(HOST_PREFIX):].partition('/')
+            return netloc, '/' + rest
+        netloc = (request.header('Host') or '').lower()
+        return (netloc if netloc in self._routes else None), request.path
+
+    def __call__(self, request: Request) -> Response:
+        host, path = self._host_of(request)
+        response = self.match(request.method, path, request.query, host)
+        if response is None:
+            body = json.dumps({'error': f"没有匹配的契约: {request.method} {request.target}"}, ensure_ascii=False)
+            return 404, {'Content-Type': 'application/json'}, body.encode('utf-8')
+        return response
+
+
+def iter_case_files(paths: Iterable[str]) -> Iterable[str]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            for file in sorted(path.rglob('*')):
+                if file.suffix.lower() in CASE_FILE_EXTENSIONS and file.is_file():
+                    yield str(file)
+        elif path.is_file():
+            yield str(path)
+
+
+def compile_routes(paths: Iterable[str], query_fallback: bool = False) -> RouteTable:
+    """把用例文件或目录中所有带期望结果的请求用例编译为路由表"""
+    table = RouteTable(query_fallback)
+    for file_path in iter_case_files(paths):
+        try:
+            cases = DataLoader.load_raw(file_path)
+        except Exception as e:
+            logger.warning(f"读取用例文件失败，已跳过: {file_path}，{str(e)}")
+            continue
+        for case in cases if isinstance(cases, list) else ():
+            request = _request_of(case) if isinstance(case, dict) else None
+            if request is not None:
+                method, url, params, expected = request
+                table.add(method, url, params, _response_of(expected))
+    logger.info(f"已编译 {table.count} 条契约路由，忽略重复 {table.duplicates} 条")
+    return table
+
+
+def start_stub(paths: Iterable[str], host: str = '127.0.0.1', port: int = 0,
+               query_fallback: bool = False) -> AsyncHTTPServer:
+    """在后台线程中启动契约桩服务，server.handler为路由表"""
+    server = AsyncHTTPServer(compile_routes(paths, query_fallback), host, port)
+    server.start()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description="根据用例文件的期望结果启动契约桩服务")
+    parser.add_argument("paths", nargs='+', help="用例文件或目录")
+    parser.add_argument("--host", default='127.0.0.1', help="监听地址")
+    parser.add_argument("--port", type=int, default=9000, help="监听端口")
+    parser.add_argument("--query-fallback", action='store_true',
+                        help="查询参数不一致时回退到同一方法和路径下的第一条路由，默认返回404")
+    args = parser.parse_args()
+    table = compile_routes(args.paths, args.query_fallback)
+    if table.hosts:
+        overrides = ','.join(f"{host}={target}" for host, target
+                             in table.overrides(f"http://{args.host}:{args.port}").items())
+        logger.info(f"依赖方可以设置 QA_BASE_URL_OVERRIDES={overrides}")
+    try:
+        asyncio.run(AsyncHTTPServer(table, args.host, args.port).serve())
+    except KeyboardInterrupt:
+        logger.info("契约桩服务已停止")
@@ -0,0 +1,216 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Tuple, Union
+
+# 模板变量格式: {variable}，变量名可以包含 - 和 .（如 {user-id}、{user.name}）
+PLACEHOLDER_PATTERN = re.compile(r'\{([\w.\-]+)\}')
+
+# 结构化模板（字典/列表）的编译缓存上限
+_STRUCT_CACHE_SIZE = 1024
+
+
+class TemplateError(ValueError):
+    """模板渲染失败，例如引用了上下文中不存在的变量"""
+
+    def __init__(self, missing: List[str], template: Any = None):
+        self.missing = missing
+        self.template = template
+        super().__init__(f"模板变量未定义: {', '.join(missing)}，模板: {template!r}")
+
+
+class _StringTemplate:
+    """
+    编译后的字符串模板，由字面量片段和变量片段交替组成
+
+    segments中偶数位置为字面量，奇数位置为变量名，
+    渲染时只访问模板中实际出现的变量
+    """
+    __slots__ = ('source', 'segments', 'variables')
+
+    def __init__(self, source: str, segments: Tuple[str, ...]):
+        self.source = source
+        self.segments = segments
+        self.variables = frozenset(segments[1::2])
+
+    def current(self) -> bool:
+        return True
+
+    def render(self, context: Dict[str, Any]) -> str:
+        segments = self.segments
+        parts = [segments[0]]
+        for i in range(1, len(segments), 2):
+            parts.append(str(context[segments[i]]))
+            parts.append(segments[i + 1])
+        return ''.join(parts)
+
+
+_MISSING = object()
+
+
+def _same(value: Any, compiled_from: Any) -> bool:
+    """字段仍是编译时的值：容器比较对象身份，字符串不可变，内容相同即可"""
+    return value is compiled_from or (type(value) is str and value == compiled_from)
+
+
+class _DictTemplate:
+    """
+    编译后的字典模板，仅记录包含变量的键
+
+    source为原字典本身，渲染时不含变量的字段直接取原字典的当前值
+    """
+    __slots__ = ('source', 'size', 'dynamic', 'variables')
+
+    def __init__(self, source: dict, dynamic: List[Tuple[Any, Any, Any]], variables: FrozenSet[str]):
+        self.source = source
+        self.size = len(source)
+        self.dynamic = dynamic
+        self.variables = variables
+
+    def current(self) -> bool:
+        """只检查含变量的字段和字段数，开销与变量数量相关，与字典大小无关"""
+        source = self.source
+        return len(source) == self.size and all(
+            _same(source.get(key, _MISSING), value) and node.current() for key, value, node in self.dynamic
+        )
+
+    def render(self, context: Dict[str, Any]) -> dict:
+        result = dict(self.source)
+        for key, _, node in self.dynamic:
+            result[key] = node.render(context)
+        return result
+
+
+class _SequenceTemplate:
+    """编译后的列表/元组模板，仅记录包含变量的下标"""
+    __slots__ = ('source', 'size', 'dynamic', 'variables')
+
+    def __init__(self, source: Union[list, tuple], dynamic: List[Tuple[int, Any, Any]], variables: FrozenSet[str]):
+        self.source = source
+        self.size = len(source)
+        self.dynamic = dynamic
+        self.variables = variables
+
+    def current(self) -> bool:
+        source = self.source
+        return len(source) == self.size and all(
+            _same(source[index], value) and node.current() for index, value, node in self.dynamic
+        )
+
+    def render(self, context: Dict[str, Any]) -> Union[list, tuple]:
+        result = list(self.source)
+        for index, _, node in self.dynamic:
+            result[index] = node.render(context)
+        return result if isinstance(self.source, list) else type(self.source)(result)
+
+
+@lru_cache(maxsize=4096)
+def _compile_string(source: str):
+    segments = tuple(PLACEHOLDER_PATTERN.split(source))
+    if len(segments) == 1:
+        return None
+    return _StringTemplate(source, segments)
+
+
+def _compile(template: Any):
+    """编译模板，不含变量时返回None"""
+    if isinstance(template, str):
+        return _compile_string(template)
+    if isinstance(template, dict):
+        dynamic = [(k, v, node) for k, v, node in ((k, v, _compile(v)) for k, v in template.items()) if node]
+        if not dynamic:
+            return None
+        return _DictTemplate(template, dynamic, frozenset().union(*(n.variables for _, _, n in dynamic)))
+    if isinstance(template, (list, tuple)):
+        dynamic = [(i, v, node) for i, (v, node) in enumerate((v, _compile(v)) for v in template) if node]
+        if not dynamic:
+            return None
+        return _SequenceTemplate(template, dynamic, frozenset().union(*(n.variables for _, _, n in dynamic)))
+    return None
+
+
+class _StructCache:
+    """
+    字典/列表模板的编译缓存
+
+    字典和列表不可哈希，按对象身份缓存，缓存项持有模板对象本身，id不会被其他对象复用。
+    编译结果只记录含变量字段的路径，渲染时其余字段直接取模板的当前值，修改不含变量的字段立即生效；
+    命中时只检查含变量的字段是否被替换、各层字段数是否变化，变化时重新编译。
+    把原本不含变量的字段（字段数不变）改为含变量的值不会被发现，这种情况应传入新的对象
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template: Any):
+        key = id(template)
+        with self._lock:
+            entry = self._entries.get(key)
+        if (entry is not None and entry[0] is template and len(template) == entry[1]
+                and (entry[2] is None or entry[2].current())):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            return entry[2]
+        compiled = _compile(template)
+        with self._lock:
+            self._entries[key] = (template, len(template), compiled)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+
+_struct_cache = _StructCache(_STRUCT_CACHE_SIZE)
+
+
+def compile_template(template: Any):
+    """
+    将模板编译为字面量片段和变量片段，结果会被缓存
+
+    Args:
+        template: 字符串、字典、列表或元组，可任意嵌套
+
+    Returns:
+        编译后的模板对象，模板中不含变量时返回None
+    """
+    if isinstance(template, str):
+        return _compile_string(template)
+    if isinstance(template, (dict, list, tuple)):
+        return _struct_cache.get(template)
+    return None
+
+
+def template_variables(template: Any) -> FrozenSet[str]:
+    """返回模板中引用的全部变量名"""
+    compiled = compile_template(template)
+    return compiled.variables if compiled else frozenset()
+
+
+def render_template(template: Any, context: Dict[str, Any]) -> Any:
+    """
+    使用上下文渲染模板
+
+    渲染开销只与模板中实际出现的变量数量相关，与上下文大小无关；
+    不含变量的部分直接复用原对象
+
+    Args:
+        template: 要渲染的模板
+        context: 变量上下文
+
+    Returns:
+        渲染后的值，保持原始类型
+
+    Raises:
+        TemplateError: 模板引用了上下文中不存在的变量
+    """
+    compiled = compile_template(template)
+    if compiled is None:
+        return template
+    missing = compiled.variables.difference(context)
+    if missing:
+        raise TemplateError(sorted(missing), template)
+    return compiled.render(context)
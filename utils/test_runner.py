@@ -1,60 +1,105 @@
 import subprocess
 import os
+import json
+import importlib.util
 from pathlib import Path
 from datetime import datetime
 import logging
 import sys
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.parse_cache import cache_root
+from utils.scheduler import DURATIONS_FILE
+from utils.fingerprint import RESULTS_FILE
+from utils.progress import ProgressTracker, stream_process
+from utils.report_aggregator import ReportAggregator, start_allure_generate
+from utils.result_store import ResultStore
 
 logger = logging.getLogger(__name__)
 
 class TestRunner:
+    # 同一进程内只检查一次运行环境
+    _environment_checked = False
+    # 是否安装了allure命令行，未安装时只生成轻量汇总报告
+    allure_available = True
+    
     def __init__(self):
         self.project_dir = Path(__file__).parent.parent
         self.reports_dir = self.project_dir / "reports"
         self.allure_results = self.reports_dir / "allure-results"
         self.allure_reports = self.reports_dir / "allure-reports"
+        self.events_dir = self.reports_dir / "events"
+        self.summary_dir = self.reports_dir / "summary"
         self.test_dir = self.project_dir / "test_cases"
+        self.result_store = ResultStore(self.allure_results, self.reports_dir / "result-store")
         
         # 创建必要的目录
-        for dir_path in [self.reports_dir, self.allure_results, self.allure_reports]:
+        for dir_path in [self.reports_dir, self.allure_results, self.allure_reports, self.events_dir, self.summary_dir]:
             dir_path.mkdir(parents=True, exist_ok=True)
         
-        # 检查依赖
-        self._check_dependencies()
-        # 检查allure命令
-        self._check_allure_installation()
+        if not TestRunner._environment_checked:
+            # 检查依赖
+            self._check_dependencies()
+            # 检查allure命令
+            self._check_allure_installation()
+            TestRunner._environment_checked = True
     
     def _check_dependencies(self):
-        """检查必要的依赖是否已安装"""
-        try:
-            import pytest
-            import allure
-            from jsonpath_ng import parse
-            logger.info("所有依赖检查通过")
-        except ImportError as e:
-            logger.error(f"缺少必要的依赖: {e}")
+        """检查必要的依赖是否已安装，只查找模块不导入"""
+        missing = [name for name in ("pytest", "allure", "jsonpath_ng") if importlib.util.find_spec(name) is None]
+        if missing:
+            logger.error(f"缺少必要的依赖: {', '.join(missing)}")
             logger.info("请执行: pip install -r requirements.txt")
             sys.exit(1)
+        logger.info("所有依赖检查通过")
     
     def _check_allure_installation(self):
-        """检查allure是否已安装"""
+        """
+        检查allure是否已安装
+        
+        allure --version 需要启动JVM，检查通过后按allure可执行文件的路径和修改时间记录下来，
+        之后不再重复执行
+        """
+        executable = shutil.which("allure")
+        marker = Path(cache_root()) / "allure_check.json"
+        stamp = None
+        if executable:
+            stamp = {"path": executable, "mtime": os.path.getmtime(executable)}
+            try:
+                if json.loads(marker.read_text(encoding="utf-8")) == stamp:
+                    return
+            except (OSError, ValueError):
+                pass
         try:
             subprocess.run(["allure", "--version"], 
                          check=True, 
                          capture_output=True, 
                          text=True)
+            if stamp:
+                marker.parent.mkdir(parents=True, exist_ok=True)
+                marker.write_text(json.dumps(stamp), encoding="utf-8")
         except FileNotFoundError:
-            logger.error("未找到allure命令，请先安装allure。")
+            logger.warning("未找到allure命令，只生成轻量汇总报告。")
             logger.info("Mac上可以使用: brew install allure")
             logger.info("Windows上可以使用: scoop install allure")
-            sys.exit(1)
+            TestRunner.allure_available = False
         except subprocess.CalledProcessError as e:
-            logger.error(f"检查allure安装时出错: {e}")
-            sys.exit(1)
+            logger.warning(f"检查allure安装时出错，只生成轻量汇总报告: {e}")
+            TestRunner.allure_available = False
     
-    def run_tests(self, test_path: str = None, markers: str = None):
-        """运行测试并生成报告"""
+    def run_tests(self, test_path: str = None, markers: str = None, concurrency: int = 0,
+                  workers: int = 0, in_process: bool = False, changed_only: bool = False,
+                  http_mode: str = None):
+        """
+        运行测试并生成报告
+        
+        Args:
+            workers: 大于1时启动多个pytest进程，按历史耗时做LPT分片，使总耗时最短
+            in_process: 在当前进程中通过pytest.main执行，省去解释器启动和模块导入的开销
+            changed_only: 只执行指纹变化或上次未通过的用例
+            http_mode: live/record/replay，录制或回放磁带中的请求
+        """
         # 构建pytest命令
         cmd = ["python", "-m", "pytest", "-v"]
         
@@ -72,6 +117,22 @@ class TestRunner:
         # 添加markers
         if markers:
             cmd.extend(["-m", markers])
+        
+        # 数据驱动用例并发执行
+        if concurrency:
+            cmd.extend(["--concurrency", str(concurrency)])
+        
+        # 增量执行
+        if changed_only:
+            cmd.append("--changed-only")
+        
+        # 录制/回放
+        if http_mode:
+            cmd.extend(["--http-mode", http_mode])
+            if http_mode == "record" and workers and workers > 1:
+                # 每个进程录制时会重写磁带，多进程同时录制会互相覆盖
+                logger.warning("录制模式不支持多进程执行，改为单进程执行")
+                workers = 0
             
         # 添加allure参数
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -79,62 +140,207 @@ class TestRunner:
         result_path.mkdir(parents=True, exist_ok=True)
         cmd.extend(["--alluredir", str(result_path)])
         
-        # 运行测试
-        try:
-            logger.info(f"执行命令: {' '.join(cmd)}")
-            env = os.environ.copy()
-            env["PYTHONPATH"] = str(self.project_dir)
-            process = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True,
-                env=env,
-                cwd=self.project_dir
-            )
-            if process.stdout:
-                logger.info(process.stdout)
-            if process.stderr:
-                logger.warning(process.stderr)
-            logger.info("测试执行完成")
-            return result_path
-        except subprocess.CalledProcessError as e:
+        # 执行事件流（JSON Lines），其他工具可以实时tail；
+        # 多进程执行时每个分片写入 events/<时间戳>/shard-<I>.jsonl，避免多个进程的事件交错写入同一文件
+        sharded = bool(workers and workers > 1 and not in_process)
+        if sharded:
+            self.event_log = self.events_dir / timestamp
+        else:
+            self.event_log = self.events_dir / f"{timestamp}.jsonl"
+            cmd.extend(["--event-log", str(self.event_log)])
+        logger.info(f"执行事件: {self.event_log}")
+        
+        if in_process:
+            return self._run_in_process(cmd[3:], result_path)
+        
+        env = os.environ.copy()
+        env["PYTHONPATH"] = str(self.project_dir)
+        # 子进程输出到管道时默认块缓冲，关闭缓冲以便逐行转发
+        env["PYTHONUNBUFFERED"] = "1"
+        if sharded:
+            return self._run_sharded(cmd, workers, env, result_path)
+        
+        # 运行测试，逐行转发输出并显示进度
+        logger.info(f"执行命令: {' '.join(cmd)}")
+        tracker = ProgressTracker()
+        returncode, tail = stream_process(cmd, tracker, env=env, cwd=self.project_dir)
+        tracker.finish()
+        if returncode not in (0, 5):
+            e = subprocess.CalledProcessError(returncode, cmd, tail)
             logger.error(f"测试执行失败: {e}")
-            if e.stdout:
-                logger.error(f"标准输出: {e.stdout}")
-            if e.stderr:
-                logger.error(f"错误输出: {e.stderr}")
-            raise
+            raise e
+        logger.info("测试执行完成")
+        return result_path
+    
+    def _run_in_process(self, args: list, result_path: Path):
+        """
+        在当前进程中执行pytest
+        
+        已导入的项目模块、解析缓存和共享连接池在多次执行之间保留；
+        测试模块和conftest每次重新导入，修改后无需重启进程
+        """
+        import pytest
+        
+        self._unload_test_modules()
+        if str(self.project_dir) not in sys.path:
+            sys.path.insert(0, str(self.project_dir))
+        cwd = os.getcwd()
+        logger.info(f"进程内执行: pytest {' '.join(args)}")
+        try:
+            os.chdir(self.project_dir)
+            exit_code = int(pytest.main(args))
+        finally:
+            os.chdir(cwd)
+        # 退出码5表示没有收集到用例
+        if exit_code not in (0, 5):
+            logger.error(f"测试执行失败，退出码: {exit_code}")
+            raise subprocess.CalledProcessError(exit_code, ["pytest"] + args)
+        logger.info("测试执行完成")
+        return result_path
+    
+    def _unload_test_modules(self):
+        """从sys.modules中移除测试目录下的模块和conftest"""
+        project = str(self.project_dir.resolve())
+        utils_dir = str((self.project_dir / "utils").resolve())
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None) or ""
+            if name == "conftest" or (path.startswith(project) and not path.startswith(utils_dir)
+                                      and not path.endswith("run_tests.py")):
+                del sys.modules[name]
+    
+    def _snapshot_state(self, name: str) -> Path:
+        """
+        复制一份历史耗时和执行结果记录
+        
+        先结束的分片会在退出时更新这两个文件，各分片都从同一份快照计算LPT分配和--changed-only的选择，
+        分到的用例才能互不重叠且覆盖全部用例
+        """
+        snapshot_dir = Path(cache_root()) / "snapshots" / name
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        for file_name in (DURATIONS_FILE, RESULTS_FILE):
+            source = Path(cache_root()) / file_name
+            # 记录文件通过替换整体更新，直接复制不会读到写了一半的内容
+            if source.exists():
+                shutil.copyfile(source, snapshot_dir / file_name)
+        return snapshot_dir
     
-    def generate_report(self, result_path: Path):
-        """生成HTML报告"""
+    def _run_sharded(self, cmd: list, workers: int, env: dict, result_path: Path):
+        """
+        并行启动多个pytest进程，每个进程执行一个分片，结果写入同一个allure目录，
+        执行事件写入self.event_log目录下各分片自己的文件
+        """
+        snapshot_dir = self._snapshot_state(result_path.name)
+        commands = [cmd + ["--event-log", str(self.event_log / f"shard-{i}.jsonl"),
+                           "--state-snapshot", str(snapshot_dir), "--shard", f"{i}/{workers}"]
+                    for i in range(workers)]
+        for shard_cmd in commands:
+            logger.info(f"执行命令: {' '.join(shard_cmd)}")
+        
+        # 各分片共用一个进度统计，输出逐行转发
+        tracker = ProgressTracker()
+        
+        def run(shard_cmd):
+            return stream_process(shard_cmd, tracker, env=env, cwd=self.project_dir)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                processes = list(executor.map(run, commands))
+        finally:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+        tracker.finish()
+        
+        failed = None
+        for shard_cmd, (returncode, tail) in zip(commands, processes):
+            # 退出码5表示该分片没有分到用例
+            if returncode not in (0, 5):
+                logger.error(f"分片 {shard_cmd[-1]} 执行失败，退出码: {returncode}")
+                failed = failed or subprocess.CalledProcessError(returncode, shard_cmd, tail)
+        if failed is not None:
+            raise failed
+        logger.info("测试执行完成")
+        return result_path
+    
+    def _snapshot(self, watch_dirs: list) -> dict:
+        """监视目录下全部文件的修改时间"""
+        snapshot = {}
+        for watch_dir in watch_dirs:
+            for path in Path(watch_dir).rglob("*"):
+                # 忽略执行过程中自动生成的文件（索引、锁、字节码）
+                if path.is_file() and "__pycache__" not in path.parts \
+                        and not path.name.endswith((".idx", ".lock", ".tmp", ".pyc")):
+                    try:
+                        snapshot[str(path)] = path.stat().st_mtime_ns
+                    except OSError:
+                        continue
+        return snapshot
+    
+    def watch(self, test_path: str = None, markers: str = None, concurrency: int = 0,
+              interval: float = 1.0, watch_dirs: list = None):
+        """
+        监视用例数据目录，文件变化后自动增量执行（--changed-only），Ctrl+C退出
+        
+        Args:
+            interval: 检查间隔（秒）
+            watch_dirs: 监视的目录，默认为 test_cases/test_data
+        """
+        watch_dirs = watch_dirs or [self.test_dir / "test_data"]
+        logger.info(f"监视目录: {', '.join(str(d) for d in watch_dirs)}")
+        snapshot = None
+        try:
+            while True:
+                current = self._snapshot(watch_dirs)
+                if current != snapshot:
+                    if snapshot is not None:
+                        changed = sorted(p for p in set(current) | set(snapshot) if current.get(p) != snapshot.get(p))
+                        logger.info(f"检测到文件变化: {', '.join(changed)}")
+                    snapshot = current
+                    try:
+                        self.run_tests(test_path, markers, concurrency, changed_only=True)
+                    except subprocess.CalledProcessError:
+                        # 失败的用例下次仍会执行，继续监视
+                        pass
+                    # 执行期间的修改以执行结束后的状态为准，下一轮再比较
+                    logger.info("等待文件变化...")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            logger.info("已停止监视")
+    
+    def generate_report(self, result_path: Path, allure_html: bool = False):
+        """
+        生成报告
+        
+        默认用纯Python汇总结果目录，生成 reports/summary/<时间戳>/summary.json 和 index.html，
+        不依赖JVM；同一目录再次生成时只处理新增的结果文件。
+        allure_html为True时另外在后台启动完整的allure generate，不等待其结束
+        
+        Returns:
+            Path: 汇总页面路径
+        """
         if not result_path.exists():
             raise FileNotFoundError(f"结果目录不存在: {result_path}")
-            
-        report_path = self.allure_reports / result_path.name
-        cmd = ["allure", "generate", str(result_path), "-o", str(report_path), "--clean"]
         
-        try:
-            logger.info(f"生成报告: {' '.join(cmd)}")
-            process = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            logger.info(process.stdout)
-            if process.stderr:
-                logger.warning(process.stderr)
-            return report_path
-        except subprocess.CalledProcessError as e:
-            logger.error(f"生成报告失败: {e}")
-            logger.error(f"错误输出: {e.stderr}")
-            raise
+        aggregator = ReportAggregator(result_path, self.summary_dir / result_path.name)
+        added = aggregator.update()
+        statuses = aggregator.summary["statuses"]
+        logger.info(f"报告汇总: 共 {aggregator.summary['total']} 条（新增 {added} 条），"
+                    f"通过 {statuses['passed']}，失败 {statuses['failed']}，异常 {statuses['broken']}，"
+                    f"跳过 {statuses['skipped']}")
+        
+        if allure_html:
+            if TestRunner.allure_available:
+                start_allure_generate(result_path, self.allure_reports / result_path.name)
+            else:
+                logger.warning("未安装allure，跳过完整Allure报告的生成")
+        return Path(aggregator.index_path)
     
     def serve_report(self, result_path: Path, port: int = 8080):
-        """启动本地服务查看报告"""
+        """启动本地服务查看报告，未安装allure时以静态文件服务展示汇总页面"""
         if not result_path.exists():
             raise FileNotFoundError(f"结果目录不存在: {result_path}")
+        
+        if not TestRunner.allure_available:
+            self._serve_summary(self.summary_dir / result_path.name, port)
+            return
             
         cmd = ["allure", "serve", str(result_path), "-p", str(port)]
         
@@ -147,10 +353,33 @@ class TestRunner:
             logger.error(f"启动报告服务失败: {e}")
             raise
     
-    def clean_old_results(self, max_dirs: int = 5):
-        """清理旧的测试结果"""
+    def _serve_summary(self, summary_path: Path, port: int):
+        import functools
+        from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+        
+        handler = functools.partial(SimpleHTTPRequestHandler, directory=str(summary_path))
+        with ThreadingHTTPServer(("127.0.0.1", port), handler) as server:
+            logger.info(f"汇总报告服务已启动: http://127.0.0.1:{port}/")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("报告服务已停止")
+    
+    def clean_old_results(self, max_dirs: int = 5, max_age_days: float = None, max_size_mb: float = None):
+        """
+        清理旧的测试结果
+        
+        超出max_dirs的allure结果目录打包归档而不是删除，归档按执行时间和总大小清理；
+        HTML报告、汇总页面和执行事件超出max_dirs的直接删除
+        
+        Args:
+            max_dirs: 保留的最近执行数
+            max_age_days: 归档的最长保留天数，None表示不限
+            max_size_mb: 归档和附件仓库的总大小上限（MB），None表示不限
+        """
         try:
-            for dir_path in [self.allure_results, self.allure_reports]:
+            self.result_store.apply_retention(max_dirs, max_age_days, max_size_mb)
+            for dir_path in [self.allure_reports, self.events_dir, self.summary_dir]:
                 if not dir_path.exists():
                     continue
                     
@@ -159,6 +388,9 @@ class TestRunner:
                     if old_dir.is_dir():
                         shutil.rmtree(old_dir)
                         logger.info(f"已删除旧报告: {old_dir}")
+                    elif old_dir.suffix == ".jsonl":
+                        old_dir.unlink()
+                        logger.info(f"已删除旧的执行事件: {old_dir}")
         except Exception as e:
             logger.error(f"清理旧报告失败: {e}")
             raise 
\ No newline at end of file
@@ -0,0 +1,159 @@
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 统计的阶段，单位均为毫秒
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download', 'total')
+
+_local = threading.local()
+
+
+@dataclass
+class RequestTiming:
+    """
+    单个请求的耗时分解（毫秒）
+
+    属性:
+        dns: DNS解析耗时，命中缓存或复用连接时为0
+        connect: TCP建连耗时，复用连接时为0
+        tls: TLS握手耗时，HTTP或复用连接时为0
+        ttfb: 发出请求到收到响应头的耗时（不含上述建连阶段）
+        download: 读取响应体的耗时
+        total: 请求总耗时
+        reused: 是否复用了已有连接
+    """
+    dns: float = 0.0
+    connect: float = 0.0
+    tls: float = 0.0
+    ttfb: float = 0.0
+    download: float = 0.0
+    total: float = 0.0
+    reused: bool = True
+
+    def add(self, phase: str, seconds: float):
+        """累加某个阶段的耗时，由连接层调用"""
+        setattr(self, phase, getattr(self, phase) + seconds * 1000)
+        self.reused = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: round(v, 3) if isinstance(v, float) else v for k, v in asdict(self).items()}
+
+
+def start_timing() -> RequestTiming:
+    """在当前线程开始记录一个请求的耗时"""
+    _local.timing = RequestTiming()
+    return _local.timing
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """返回当前线程正在记录的请求耗时，没有时返回None"""
+    return getattr(_local, 'timing', None)
+
+
+def stop_timing():
+    """结束当前线程的耗时记录"""
+    _local.timing = None
+
+
+class timed_phase:
+    """
+    上下文管理器：把代码块的耗时计入当前请求的某个阶段
+
+    当前线程没有在记录请求耗时时不做任何事
+    """
+    __slots__ = ('phase', '_start')
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        timing = current_timing()
+        if timing is not None:
+            timing.add(self.phase, time.perf_counter() - self._start)
+
+
+def endpoint_of(method: str, url: str) -> str:
+    """接口标识：请求方法 + 不含查询参数的url"""
+    parts = urlsplit(url)
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class TimingAggregator:
+    """
+    按接口汇总请求耗时，线程安全
+
+    同时支持按测试捕获：begin_capture 之后当前线程记录的耗时会额外保存到捕获列表中
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, endpoint: str, timing: RequestTiming):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'count': 0, 'reused': 0,
+                    'sum': dict.fromkeys(PHASES, 0.0), 'max': dict.fromkeys(PHASES, 0.0),
+                }
+            stats['count'] += 1
+            stats['reused'] += timing.reused
+            for phase in PHASES:
+                value = getattr(timing, phase)
+                stats['sum'][phase] += value
+                stats['max'][phase] = max(stats['max'][phase], value)
+        captured = getattr(_local, 'captured', None)
+        if captured is not None:
+            captured.append({'endpoint': endpoint, **timing.to_dict()})
+
+    def begin_capture(self) -> List[Dict[str, Any]]:
+        """开始捕获当前线程的请求耗时，返回捕获列表"""
+        _local.captured = []
+        return _local.captured
+
+    def end_capture(self) -> List[Dict[str, Any]]:
+        """结束捕获并返回捕获到的记录"""
+        captured = getattr(_local, 'captured', None) or []
+        _local.captured = None
+        return captured
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """返回按接口汇总的平均值和最大值"""
+        with self._lock:
+            return {
+                endpoint: {
+                    'count': stats['count'],
+                    'reused': stats['reused'],
+                    'avg': {p: round(stats['sum'][p] / stats['count'], 3) for p in PHASES},
+                    'max': {p: round(stats['max'][p], 3) for p in PHASES},
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def format_table(self) -> str:
+        """格式化为文本表格，每列为该阶段的平均值（毫秒）"""
+        summary = self.summary()
+        if not summary:
+            return ''
+        lines = [f"{'接口':<60} {'次数':>6} {'复用':>6} " + " ".join(f"{p:>9}" for p in PHASES)]
+        for endpoint, stats in sorted(summary.items(), key=lambda x: -x[1]['avg']['total']):
+            lines.append(f"{endpoint[:60]:<60} {stats['count']:>6} {stats['reused']:>6} " +
+                         " ".join(f"{stats['avg'][p]:>9.1f}" for p in PHASES))
+        return '\n'.join(lines)
+
+
+timing_aggregator = TimingAggregator()
@@ -0,0 +1,292 @@
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+import logging
+
+from utils.connection_pool import keep_connections
+from utils.parse_cache import cache_root
+
+logger = logging.getLogger(__name__)
+
+# 不支持Unix域套接字的平台上使用的本机端口
+DEFAULT_PORT = 47391
+
+Address = Union[str, Tuple[str, int]]
+
+# 客户端把QA_开头的环境变量随请求转发给守护进程
+ENV_PREFIX = 'QA_'
+
+# 每次执行时才读取的环境变量（conftest在注册命令行参数时读取默认值），在本次执行期间设置为客户端的值；
+# 其他QA_变量在守护进程启动或导入模块时读取，与客户端不一致时拒绝执行
+RUN_ENV = ('QA_LOCAL_HTTPBIN', 'QA_PREWARM', 'QA_RATE_LIMITS')
+
+
+def default_address() -> Address:
+    """守护进程的监听地址：优先使用缓存目录下的Unix域套接字，否则使用本机TCP端口"""
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(cache_root(), 'worker.sock')
+    return ('127.0.0.1', DEFAULT_PORT)
+
+
+def _family(address: Address) -> int:
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+def forwarded_env(environ: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """需要随执行请求转发给守护进程的环境变量"""
+    environ = os.environ if environ is None else environ
+    return {name: value for name, value in environ.items() if name.startswith(ENV_PREFIX)}
+
+
+@contextlib.contextmanager
+def _environ(values: Dict[str, Optional[str]]):
+    """临时设置环境变量，值为None时删除该变量，退出时恢复原值"""
+    saved = {name: os.environ.get(name) for name in values}
+
+    def apply(items):
+        for name, value in items.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    apply(values)
+    try:
+        yield
+    finally:
+        apply(saved)
+
+
+class _OutputStream(io.TextIOBase):
+    """
+    把执行输出按整行转发给客户端，不在内存中累积
+
+    客户端断开后继续执行，丢弃之后的输出
+    """
+
+    def __init__(self, send: Callable[[Dict[str, Any]], None]):
+        self._send = send
+        self._partial = ''
+        self.connected = True
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        lines, newline, self._partial = (self._partial + text).rpartition('\n')
+        if newline:
+            self._emit(lines + newline)
+        return len(text)
+
+    def finish(self):
+        """转发最后一行不完整的输出"""
+        if self._partial:
+            self._emit(self._partial)
+            self._partial = ''
+
+    def _emit(self, text: str):
+        if not self.connected:
+            return
+        try:
+            self._send({'event': 'output', 'text': text})
+        except OSError as e:
+            self.connected = False
+            logger.warning(f"客户端已断开，继续执行但不再转发输出: {e}")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """每个连接读取一行JSON请求，执行期间逐行返回输出事件，最后返回一行JSON响应"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            response = self.server.worker.handle(request, self._send)
+        except Exception as e:
+            logger.error(f"处理请求失败: {e}")
+            response = {'ok': False, 'error': str(e)}
+        try:
+            self._send(response)
+        except OSError as e:
+            logger.warning(f"返回响应失败，客户端已断开: {e}")
+
+    def _send(self, message: Dict[str, Any]):
+        self.wfile.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+class _TCPServer(socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+class WorkerDaemon:
+    """
+    常驻的测试执行进程
+
+    启动时导入项目模块、预先解析用例数据文件，之后通过本地套接字接收执行请求，
+    在进程内用pytest.main执行。项目模块、解析缓存和共享连接池在多次执行之间保留，
+    省去每次启动解释器、检查依赖和导入模块的开销。执行请求逐个处理
+
+    请求（一行JSON）:
+        {"command": "run", "test_path": ..., "markers": ..., "concurrency": 0, "workers": 0,
+         "http_mode": null, "changed_only": false, "env": {"QA_LOCAL_HTTPBIN": "1", ...}}
+        {"command": "ping"}
+        {"command": "shutdown"}
+
+    执行请求在执行期间逐行返回 {"event": "output", "text": ...}，最后返回一行执行结果；
+    守护进程无法满足的请求（多进程执行、启动时读取的环境变量不一致）直接返回错误，不执行
+    """
+
+    def __init__(self, address: Optional[Address] = None):
+        from utils.test_runner import TestRunner
+
+        self.address = address or default_address()
+        self.runner = TestRunner()
+        self.runs = 0
+        self._server = None
+        # 启动时的环境变量，导入模块和创建单例时已经按这些值生效
+        self._startup_env = forwarded_env()
+
+    def preload(self):
+        """预先解析测试目录下的用例数据文件，并导入常用的项目模块"""
+        import pytest  # noqa: F401
+        import utils.assertion  # noqa: F401
+        import utils.dependency  # noqa: F401
+        from utils.data_loader import DataLoader
+        from utils.prewarm import CASE_FILE_EXTENSIONS
+
+        count = 0
+        for path in sorted(Path(self.runner.test_dir).rglob('*')):
+            if path.suffix.lower() in CASE_FILE_EXTENSIONS and path.is_file():
+                try:
+                    DataLoader.load_raw(str(path))
+                    count += 1
+                except Exception as e:
+                    logger.warning(f"预解析用例文件失败: {path}，{str(e)}")
+        logger.info(f"已预解析 {count} 个用例数据文件")
+
+    def handle(self, request: Dict[str, Any],
+               send: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        处理一个请求
+
+        Args:
+            send: 执行期间返回输出事件的函数，为None时丢弃输出
+        """
+        command = request.get('command', 'run')
+        if command == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'runs': self.runs}
+        if command == 'shutdown':
+            # 请求在serve_forever所在线程中处理，需要在其他线程中调用shutdown
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {'ok': True}
+        if command != 'run':
+            raise ValueError(f"不支持的命令: {command}")
+        return self._run(request, send or (lambda message: None))
+
+    def _check(self, request: Dict[str, Any]):
+        """拒绝守护进程无法按请求执行的选项"""
+        if int(request.get('workers') or 0) > 1:
+            raise ValueError("守护进程在进程内执行，不支持多进程（--workers），请直接执行")
+        env = request.get('env') or {}
+        names = (set(env) | set(self._startup_env)) - set(RUN_ENV) - {'QA_HTTP_MODE'}
+        mismatched = sorted(name for name in names if env.get(name) != self._startup_env.get(name))
+        if mismatched:
+            raise ValueError(f"环境变量 {', '.join(mismatched)} 在守护进程启动时读取，与本次执行不一致，"
+                             f"请用相同的环境变量重启守护进程")
+
+    def _run(self, request: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        self._check(request)
+        env = request.get('env') or {}
+        # 磁带模式在多次执行之间保留，每次都按请求显式设置，未指定时与直接执行一致
+        http_mode = request.get('http_mode') or env.get('QA_HTTP_MODE') or 'live'
+        start = time.perf_counter()
+        output = _OutputStream(send)
+        exit_code = 0
+        result_path = None
+        with _environ({name: env.get(name) for name in RUN_ENV}), contextlib.redirect_stdout(output):
+            try:
+                result_path = self.runner.run_tests(
+                    request.get('test_path'), request.get('markers'),
+                    int(request.get('concurrency') or 0), in_process=True,
+                    changed_only=bool(request.get('changed_only')), http_mode=http_mode
+                )
+            except subprocess.CalledProcessError as e:
+                exit_code = e.returncode
+            finally:
+                output.finish()
+        self.runs += 1
+        return {
+            'ok': exit_code == 0,
+            'exit_code': exit_code,
+            'result_path': str(result_path) if result_path else None,
+            'elapsed': round(time.perf_counter() - start, 3),
+        }
+
+    def serve_forever(self):
+        """预热后开始监听，直到收到shutdown请求"""
+        self.preload()
+        if isinstance(self.address, str):
+            os.makedirs(os.path.dirname(self.address), exist_ok=True)
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self._server = socketserver.UnixStreamServer(self.address, _Handler)
+        else:
+            self._server = _TCPServer(self.address, _Handler)
+        self._server.worker = self
+        logger.info(f"测试执行守护进程已启动: {self.address}，pid {os.getpid()}")
+        try:
+            # 每次执行结束时测试会话释放连接，守护进程保留这些连接供下次执行复用
+            with keep_connections():
+                self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.remove(self.address)
+            logger.info("测试执行守护进程已退出")
+
+
+def send_request(request: Dict[str, Any], address: Optional[Address] = None,
+                 timeout: Optional[float] = None,
+                 on_output: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    向守护进程发送请求并等待响应
+
+    Args:
+        on_output: 执行期间每收到一段输出（一行或多行）时调用
+
+    Raises:
+        ConnectionError: 守护进程未启动
+    """
+    address = address or default_address()
+    try:
+        with socket.socket(_family(address), socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as reader:
+                for line in reader:
+                    message = json.loads(line)
+                    if message.get('event') != 'output':
+                        return message
+                    if on_output is not None:
+                        on_output(message['text'])
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ConnectionError(f"测试执行守护进程未启动: {address}") from e
+    raise ConnectionError(f"守护进程未返回响应: {address}")
+
+
+def is_running(address: Optional[Address] = None) -> bool:
+    """守护进程是否已启动"""
+    try:
+        return send_request({'command': 'ping'}, address, timeout=2).get('ok', False)
+    except (ConnectionError, OSError):
+        return False